@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""On-disk cache of the normalized full-graph adjacencies used for evaluation.
+
+The full-graph ``adj_first``/``adj_rest`` only depend on the training graph,
+the year index and the GSMP flags, yet ``evaluate`` rebuilt them at every
+evaluation of every seed. Entries are stored as CSR arrays (int32 indices when
+they fit) under ``<cache_dir>/<fingerprint>/`` and loaded with ``np.load``
+memory maps, so repeated loads share the page cache instead of process memory.
+``adj_rest`` does not depend on the method and is shared by GCN and GSMP runs.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import torch
+
+from data_utils import log, read_json, write_json
+
+
+CSR_FILES = ("crow_indices", "col_indices", "values")
+
+
+def graph_fingerprint(edge_index: torch.Tensor, year_idx: torch.Tensor, num_nodes: int) -> str:
+    digest = hashlib.sha1()
+    digest.update(repr((int(num_nodes), tuple(edge_index.shape), str(edge_index.dtype))).encode())
+    for tensor in (edge_index, year_idx):
+        digest.update(tensor.detach().cpu().contiguous().numpy().data)
+    return digest.hexdigest()[:16]
+
+
+def save_csr(path: Path, adj: torch.Tensor, meta: Optional[Dict] = None) -> None:
+    """Write a sparse adjacency as CSR ``.npy`` files; the directory appears atomically."""
+    csr = adj.to_sparse_csr() if adj.layout != torch.sparse_csr else adj
+    index_dtype = np.int32 if csr.values().numel() < np.iinfo(np.int32).max else np.int64
+    tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    arrays = {
+        "crow_indices": csr.crow_indices().cpu().numpy().astype(index_dtype),
+        "col_indices": csr.col_indices().cpu().numpy().astype(index_dtype),
+        "values": csr.values().cpu().numpy().astype(np.float32),
+    }
+    for name, array in arrays.items():
+        np.save(tmp_path / f"{name}.npy", array)
+    write_json(tmp_path / "meta.json", {"shape": list(csr.shape), **(meta or {})})
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process finished the same entry first.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_csr(path: Path, device: torch.device) -> torch.Tensor:
+    shape = read_json(path / "meta.json")["shape"]
+    # Copy-on-write maps stay writable for torch without touching the files.
+    arrays = [torch.from_numpy(np.load(path / f"{name}.npy", mmap_mode="c")) for name in CSR_FILES]
+    adj = torch.sparse_csr_tensor(*arrays, size=tuple(shape))
+    return adj.to(device) if device.type != "cpu" else adj
+
+
+class SparseAdjCache:
+    """Memoized, disk-backed full-graph adjacencies for one training graph."""
+
+    def __init__(self, cache_dir: Path, edge_index: torch.Tensor, year_idx: torch.Tensor, num_nodes: int) -> None:
+        self.root = Path(cache_dir) / graph_fingerprint(edge_index, year_idx, num_nodes)
+        self._loaded: Dict[Tuple[str, str], torch.Tensor] = {}
+
+    def entry_name(self, method: str, include_self_loops: bool, weighted_degree: bool) -> str:
+        if method != "gcn_gsmp_first":
+            return "adj_rest"
+        return f"adj_first_gsmp_selfloops-{int(include_self_loops)}_weighteddeg-{int(weighted_degree)}"
+
+    def get_or_build(self, name: str, device: torch.device, build) -> torch.Tensor:
+        """Return entry ``name`` on ``device``, calling ``build()`` -> (adj, meta) only on a cache miss."""
+        key = (name, str(device))
+        if key in self._loaded:
+            return self._loaded[key]
+        path = self.root / name
+        if not path.exists():
+            log(f"[adj-cache] building {path}")
+            adj, meta = build()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            save_csr(path, adj, meta)
+        else:
+            log(f"[adj-cache] loading {path}")
+        self._loaded[key] = load_csr(path, device)
+        return self._loaded[key]
@@ -3,11 +3,16 @@
 
 from __future__ import annotations
 
+import sys
+from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 import torch
 from torch import Tensor
 
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from temporal_weights import gsmp_edge_weights  # noqa: E402
+
 
 def compute_gsmp_edge_weights(
     edge_index: Tensor,
@@ -29,44 +34,43 @@ def compute_gsmp_edge_weights(
         raise ValueError("year_idx length must equal num_nodes.")
 
     src, dst = edge_index
-    src_time = year_idx[src].long()
-    is_self_loop = src == dst
-    count_mask = src_time >= 0
+    return gsmp_weights_from_edge_years(
+        dst,
+        year_idx[src].long(),
+        src == dst,
+        num_nodes=num_nodes,
+        num_timestamps=num_timestamps,
+        include_self_loops=include_self_loops,
+    )
+
+
+def gsmp_weights_from_edge_years(
+    dst: Tensor,
+    src_year: Tensor,
+    is_self_loop: Tensor,
+    num_nodes: int,
+    num_timestamps: int,
+    include_self_loops: bool = False,
+) -> Tensor:
+    """GSMP weights from per-edge targets and source years (``-1`` = missing).
+
+    Lets callers gather source years once and reuse them for any edge subset.
+    """
+    count_mask = src_year >= 0
     if not include_self_loops:
         count_mask = count_mask & (~is_self_loop)
 
-    weights = torch.zeros(edge_index.size(1), dtype=torch.float32, device=edge_index.device)
-    if not torch.any(count_mask):
-        if not include_self_loops:
-            weights[is_self_loop] = 1.0
-        return weights
-
-    pair_index = dst[count_mask].long() * int(num_timestamps) + src_time[count_mask]
-    counts = torch.bincount(
-        pair_index,
-        minlength=int(num_nodes) * int(num_timestamps),
-    ).to(torch.float32)
-
-    edge_pair_index = dst.long() * int(num_timestamps) + torch.clamp(src_time, min=0)
-    pair_counts = counts[edge_pair_index].clamp_min(1.0)
-    base = torch.zeros_like(weights)
-    base[count_mask] = 1.0 / pair_counts[count_mask]
-
-    target_sum = torch.zeros(num_nodes, dtype=torch.float32, device=edge_index.device)
-    target_count = torch.zeros(num_nodes, dtype=torch.float32, device=edge_index.device)
-    target_sum.index_add_(0, dst[count_mask].long(), base[count_mask])
-    target_count.index_add_(
-        0,
-        dst[count_mask].long(),
-        torch.ones(int(count_mask.sum().item()), dtype=torch.float32, device=edge_index.device),
+    # Uncounted edges (missing time, excluded self-loops) get 0 and stay out of the target mean.
+    weights = gsmp_edge_weights(
+        dst,
+        src_year,
+        int(num_timestamps),
+        int(num_nodes),
+        normalize="mean_one",
+        edge_mask=count_mask,
+        fill_value=0.0,
     )
 
-    mean_base = torch.zeros_like(target_sum)
-    nonempty_targets = target_count > 0
-    mean_base[nonempty_targets] = target_sum[nonempty_targets] / target_count[nonempty_targets]
-    valid_mean = count_mask & (mean_base[dst.long()] > 0)
-    weights[valid_mean] = base[valid_mean] / mean_base[dst[valid_mean].long()]
-
     if not include_self_loops:
         weights[is_self_loop] = 1.0
 
@@ -289,7 +289,23 @@ def build_split(y: torch.Tensor, x: torch.Tensor, year_raw: torch.Tensor) -> Tup
     return split, split_group, t_max
 
 
-def load_raw_edges(edge_path: Path, num_nodes: int, chunksize: int) -> torch.Tensor:
+def load_raw_edges(
+    edge_path: Path,
+    num_nodes: int,
+    chunksize: int,
+    reader: str = "parallel",
+    num_workers: int = 0,
+    work_dir: Optional[Path] = None,
+) -> torch.Tensor:
+    if reader == "parallel":
+        from relationship_ingest import load_edges_parallel
+
+        work_dir = work_dir or edge_path.parent
+        log(f"[edges] reading {edge_path} with the parallel byte-range reader")
+        edge_index = torch.from_numpy(load_edges_parallel(edge_path, num_nodes, work_dir, num_workers))
+        log(f"[edges] loaded directed edge_index with {edge_index.size(1):,} edges")
+        return edge_index
+
     import pandas as pd
 
     src_chunks = []
@@ -489,6 +505,8 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--feature-source", choices=("auto", "processed"), default="auto")
     parser.add_argument("--allow-raw-profile-features", action="store_true")
     parser.add_argument("--edge-chunksize", type=int, default=2_000_000)
+    parser.add_argument("--edge-reader", choices=("parallel", "pandas"), default="parallel")
+    parser.add_argument("--edge-workers", type=int, default=0, help="Parallel edge reader threads; 0 uses all CPUs.")
     return parser.parse_args()
 
 
@@ -519,7 +537,14 @@ def main() -> None:
     year_idx, years_sorted = build_year_idx(year_raw)
     split, split_group, t_max = build_split(y, x, year_raw)
 
-    edge_index_directed = load_raw_edges(edge_path, num_nodes, args.edge_chunksize)
+    edge_index_directed = load_raw_edges(
+        edge_path,
+        num_nodes,
+        args.edge_chunksize,
+        reader=args.edge_reader,
+        num_workers=args.edge_workers,
+        work_dir=args.out_dir,
+    )
     edge_index_diagnostics(edge_index_directed, num_nodes, "edge_index_directed")
     edge_index_undirected_self_loop = make_undirected_self_loop(edge_index_directed, num_nodes)
     edge_index_diagnostics(edge_index_undirected_self_loop, num_nodes, "edge_index_undirected_self_loop")
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""Parallel byte-range parser for whitespace-separated edge lists.
+
+The (decompressed) file is split into byte ranges that start and end on line
+boundaries. A first pass counts newlines per range to give every range a
+fixed slot in one preallocated ``[2, num_lines]`` int64 memory map; workers
+then parse their range in blocks with numpy (the first two integers per line
+are the 1-based src/dst ids) and write only in-range edges into their slot. The slots are compacted in place, so the result never needs a
+full-size concatenate or mask copy.
+"""
+
+from __future__ import annotations
+
+import gzip
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from data_utils import log
+
+
+BLOCK_BYTES = 32 << 20
+
+
+def decompressed_path(edge_path: Path, work_dir: Path) -> Tuple[Path, bool]:
+    """Return a plain-text path for ``edge_path`` and whether it is a temporary copy."""
+    if not str(edge_path).endswith(".gz"):
+        return edge_path, False
+    work_dir.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=work_dir, prefix=".relationships_", suffix=".txt")
+    log(f"[edges] decompressing {edge_path} -> {tmp}")
+    with gzip.open(edge_path, "rb") as src, os.fdopen(fd, "wb") as dst:
+        shutil.copyfileobj(src, dst, length=16 << 20)
+    return Path(tmp), True
+
+
+def line_aligned_ranges(path: Path, num_ranges: int) -> List[Tuple[int, int]]:
+    """Split the file into ``num_ranges`` byte ranges that begin at line starts."""
+    size = path.stat().st_size
+    cuts = [0]
+    with open(path, "rb") as f:
+        for i in range(1, num_ranges):
+            f.seek(max(size * i // num_ranges, cuts[-1]))
+            f.readline()
+            cuts.append(min(f.tell(), size))
+    cuts.append(size)
+    return [(start, end) for start, end in zip(cuts[:-1], cuts[1:]) if end > start]
+
+
+def _blocks(path: Path, start: int, end: int, block_bytes: int):
+    """Yield line-aligned byte blocks covering ``[start, end)``."""
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+        carry = b""
+        while remaining > 0:
+            data = f.read(min(block_bytes, remaining))
+            remaining -= len(data)
+            data = carry + data
+            cut = data.rfind(b"\n") + 1 if remaining > 0 else len(data)
+            if cut == 0:
+                carry = data
+                continue
+            carry = data[cut:]
+            yield data[:cut]
+
+
+def count_lines(path: Path, start: int, end: int, block_bytes: int = BLOCK_BYTES) -> int:
+    """Upper bound on the edges in a range: its newlines plus an unterminated last line."""
+    lines = 0
+    last = b"\n"
+    for block in _blocks(path, start, end, block_bytes):
+        lines += block.count(b"\n")
+        last = block[-1:]
+    return lines + (last != b"\n")
+
+
+def parse_pairs(block: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """``(src, dst)`` ids of every line in ``block``.
+
+    Blocks whose lines all hold exactly two tokens go through numpy's C
+    whitespace parser; a block with extra columns, blank or malformed lines
+    falls back to the line-aware tokenizer.
+    """
+    lines = block.count(b"\n") + (not block.endswith(b"\n"))
+    if _two_tokens_per_line(block, lines):
+        values = np.fromstring(block, dtype=np.int64, sep=" ")
+        if values.size == 2 * lines:
+            return values[0::2], values[1::2]
+    return _tokenize_pairs(block)
+
+
+def _two_tokens_per_line(block: bytes, lines: int) -> bool:
+    """Whether every line of ``block`` holds exactly two whitespace-separated tokens.
+
+    Token starts and newlines, in byte order, must read start, start, newline
+    for every line (the last line may lack its newline).
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    is_token = (buf != 32) & ((buf - np.uint8(9)) > 4)
+    newline = buf == 10
+    event = newline.copy()
+    event[0] |= is_token[0]
+    event[1:] |= is_token[1:] > is_token[:-1]
+    is_newline = newline[np.flatnonzero(event)]
+    if is_newline.size != 3 * lines - (not block.endswith(b"\n")):
+        return False
+    return not (is_newline[0::3].any() or is_newline[1::3].any()) and bool(is_newline[2::3].all())
+
+
+def _tokenize_pairs(block: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    """First two integers of every line in ``block`` (lines with fewer are skipped).
+
+    A ``-`` right before the digits negates the value, as in the fast path,
+    so negative ids are dropped by the caller's range check either way.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    is_digit = (buf - np.uint8(48)) < 10
+    edges = np.diff(is_digit.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    if starts.size < 2:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    lengths = ends - starts
+    values = np.zeros(starts.size, dtype=np.int64)
+    for k in range(int(lengths.max())):
+        active = lengths > k
+        values[active] = values[active] * 10 + (buf[starts[active] + k] - 48)
+    negative = buf[np.maximum(starts - 1, 0)] == 45
+    negative[0] &= starts[0] > 0
+    values[negative] *= -1
+
+    line = np.searchsorted(np.flatnonzero(buf == 10), starts)
+    first = np.ones(starts.size, dtype=bool)
+    first[1:] = line[1:] != line[:-1]
+    first[-1] = False
+    first_pos = np.flatnonzero(first)
+    first_pos = first_pos[line[first_pos + 1] == line[first_pos]]
+    return values[first_pos], values[first_pos + 1]
+
+
+def load_edges_parallel(
+    edge_path: Path,
+    num_nodes: int,
+    work_dir: Path,
+    num_workers: int = 0,
+    block_bytes: int = BLOCK_BYTES,
+) -> np.ndarray:
+    """Directed 0-based ``[2, E]`` int64 edges with both ends in ``[0, num_nodes)``.
+
+    The array is backed by a memory-mapped file under ``work_dir`` that is
+    unlinked once mapped, so its pages live in the page cache only.
+    """
+    workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+    text_path, temporary = decompressed_path(edge_path, work_dir)
+    try:
+        ranges = line_aligned_ranges(text_path, max(1, workers * 4))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            capacities = list(pool.map(lambda r: count_lines(text_path, r[0], r[1], block_bytes), ranges))
+        offsets = np.concatenate([[0], np.cumsum(capacities)]).astype(np.int64)
+        capacity = int(offsets[-1])
+        log(f"[edges] {len(ranges)} byte ranges, {capacity:,} lines, {workers} worker(s)")
+
+        work_dir.mkdir(parents=True, exist_ok=True)
+        fd, mmap_path = tempfile.mkstemp(dir=work_dir, prefix=".edges_", suffix=".npy")
+        os.close(fd)
+        out = np.lib.format.open_memmap(mmap_path, mode="w+", dtype=np.int64, shape=(2 * max(capacity, 1),))
+        os.remove(mmap_path)
+
+        def parse_range(index: int) -> Tuple[int, int]:
+            start, end = ranges[index]
+            cursor = int(offsets[index])
+            raw = 0
+            for block in _blocks(text_path, start, end, block_bytes):
+                src, dst = parse_pairs(block)
+                raw += int(src.size)
+                src -= 1
+                dst -= 1
+                valid = (src >= 0) & (src < num_nodes) & (dst >= 0) & (dst < num_nodes)
+                kept = int(valid.sum())
+                out[cursor : cursor + kept] = src[valid]
+                out[capacity + cursor : capacity + cursor + kept] = dst[valid]
+                cursor += kept
+            return raw, cursor - int(offsets[index])
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(parse_range, range(len(ranges))))
+    finally:
+        if temporary:
+            os.remove(text_path)
+
+    raw_edges = sum(raw for raw, _ in results)
+    # Close the gaps between range slots, then move the dst row right behind the src row.
+    kept_edges = 0
+    for index, (_, kept) in enumerate(results):
+        start = int(offsets[index])
+        if start != kept_edges:
+            out[kept_edges : kept_edges + kept] = out[start : start + kept]
+            out[capacity + kept_edges : capacity + kept_edges + kept] = out[capacity + start : capacity + start + kept]
+        kept_edges += kept
+    if kept_edges == 0:
+        raise ValueError("No valid relationship edges found.")
+    if kept_edges != capacity:
+        out[kept_edges : 2 * kept_edges] = out[capacity : capacity + kept_edges]
+    log(f"[edges] raw_edges={raw_edges:,}, kept_edges={kept_edges:,}")
+    return out[: 2 * kept_edges].reshape(2, kept_edges)
+
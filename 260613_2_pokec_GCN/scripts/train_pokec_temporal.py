@@ -14,6 +14,7 @@ import pandas as pd
 import torch
 import torch.nn.functional as F
 
+from adj_cache import SparseAdjCache
 from data_utils import (
     add_self_loops_to_directed,
     class_distribution,
@@ -30,6 +31,7 @@ from gsmp import (
     compute_gcn_norm,
     compute_gsmp_edge_weights,
     gsmp_weight_stats,
+    gsmp_weights_from_edge_years,
     make_sparse_adj,
     sanity_check_gsmp_identity,
 )
@@ -79,6 +81,7 @@ def print_quality_checks(
     log(f"  GSMP first-layer-only: {args.method == 'gcn_gsmp_first'}")
     log(f"  GSMP recompute per batch: {args.gsmp_recompute_per_batch}")
     log(f"  GSMP precompute global approximation: {args.gsmp_precompute_global}")
+    log(f"  induced batch builder: {args.batch_builder}")
     if not args.use_directed and metadata.get("main_training_graph") != "undirected_self_loop":
         raise RuntimeError("Main training graph metadata does not say undirected_self_loop.")
     if not args.use_directed and "undirected" not in metadata.get("main_training_graph", ""):
@@ -122,6 +125,85 @@ def iter_induced_batches(
         yield batch_id, nodes.long(), edge_local.long().contiguous(), edge_pos.long()
 
 
+class InducedBatchBuilder:
+    """Induced-subgraph batches whose relabeling and exact GSMP weights come from one pass per epoch.
+
+    Every node belongs to exactly one batch, so a target's in-batch edges are
+    exactly its edges whose source shares its batch. Counting (dst, year(src))
+    pairs over all intra-batch edges at once gives every batch's GSMP counts
+    and target means, identical to recomputing GSMP on each induced subgraph.
+    Per-edge source years and self-loop flags are gathered once per run, and
+    one position-in-batch vector relabels every batch.
+    """
+
+    def __init__(
+        self,
+        edge_index: torch.Tensor,
+        num_nodes: int,
+        year_idx: Optional[torch.Tensor] = None,
+        num_timestamps: int = 0,
+        include_self_loops: bool = False,
+    ) -> None:
+        self.edge_index = edge_index
+        self.num_nodes = int(num_nodes)
+        self.num_timestamps = int(num_timestamps)
+        self.include_self_loops = include_self_loops
+        self.edge_year = year_idx[edge_index[0]].long() if year_idx is not None else None
+        self.is_self_loop = edge_index[0] == edge_index[1] if year_idx is not None else None
+
+    def _epoch_gsmp(self, edge_pos: torch.Tensor, dst_rank: torch.Tensor) -> torch.Tensor:
+        return gsmp_weights_from_edge_years(
+            dst_rank,
+            self.edge_year[edge_pos],
+            self.is_self_loop[edge_pos],
+            num_nodes=self.num_nodes,
+            num_timestamps=self.num_timestamps,
+            include_self_loops=self.include_self_loops,
+        )
+
+    def iter_batches(
+        self,
+        batch_size: int,
+        generator: torch.Generator,
+    ) -> Iterable[Tuple[int, torch.Tensor, torch.Tensor, torch.Tensor, Optional[torch.Tensor]]]:
+        """Same batches as ``iter_induced_batches`` (plus exact GSMP weights when enabled)."""
+        num_nodes = self.num_nodes
+        perm = torch.randperm(num_nodes, generator=generator)
+        num_batches = math.ceil(num_nodes / batch_size)
+        # rank = position in perm, so batch = rank // batch_size and local id = rank % batch_size.
+        # int32 halves the bandwidth of the per-edge gathers and speeds up the sort.
+        rank = torch.empty(num_nodes, dtype=torch.int32)
+        rank[perm] = torch.arange(num_nodes, dtype=torch.int32)
+        group = rank // batch_size
+
+        src_group = group[self.edge_index[0]]
+        same_group = src_group == group[self.edge_index[1]]
+        edge_pos_all = torch.where(same_group)[0]
+        # Stable, so each batch keeps ascending edge order.
+        edge_batch_all, batch_order = torch.sort(src_group[edge_pos_all], stable=True)
+        edge_pos_sorted = edge_pos_all[batch_order]
+        bounds = torch.zeros(num_batches + 1, dtype=torch.long)
+        bounds[1:] = torch.cumsum(torch.bincount(edge_batch_all, minlength=num_batches), dim=0)
+        edge_rank = rank[self.edge_index[:, edge_pos_sorted]]
+        edge_local_sorted = (edge_rank - edge_batch_all * batch_size).long()
+        gsmp_sorted = None
+        if self.edge_year is not None:
+            # Targets keyed by rank keep each batch's counting table contiguous.
+            gsmp_sorted = self._epoch_gsmp(edge_pos_sorted, edge_rank[1].long())
+
+        for batch_id in range(num_batches):
+            nodes = perm[batch_id * batch_size : min((batch_id + 1) * batch_size, num_nodes)]
+            left, right = int(bounds[batch_id]), int(bounds[batch_id + 1])
+            gsmp_weight = gsmp_sorted[left:right] if gsmp_sorted is not None else None
+            yield (
+                batch_id,
+                nodes.long(),
+                edge_local_sorted[:, left:right].contiguous(),
+                edge_pos_sorted[left:right],
+                gsmp_weight,
+            )
+
+
 def build_sparse_adjs(
     edge_index: torch.Tensor,
     year_idx: torch.Tensor,
@@ -263,17 +345,39 @@ def evaluate(
     num_timestamps: int,
     args: argparse.Namespace,
     eval_device: torch.device,
+    adj_cache: Optional[SparseAdjCache] = None,
 ) -> Dict[str, float]:
-    adj_first, adj_rest, _ = build_sparse_adjs(
-        edge_index,
-        year_idx,
-        num_nodes=x.size(0),
-        num_timestamps=num_timestamps,
-        method=args.method,
-        device=eval_device,
-        gsmp_include_self_loops=args.gsmp_include_self_loops,
-        gsmp_weighted_degree=args.gsmp_weighted_degree,
-    )
+    def build(method: str):
+        return build_sparse_adjs(
+            edge_index,
+            year_idx,
+            num_nodes=x.size(0),
+            num_timestamps=num_timestamps,
+            method=method,
+            device=eval_device,
+            gsmp_include_self_loops=args.gsmp_include_self_loops,
+            gsmp_weighted_degree=args.gsmp_weighted_degree,
+        )
+
+    if adj_cache is None:
+        adj_first, adj_rest, _ = build(args.method)
+    else:
+        adj_rest = adj_cache.get_or_build(
+            adj_cache.entry_name("gcn", False, False),
+            eval_device,
+            lambda: (build("gcn")[1], {"method": "gcn"}),
+        )
+        adj_first = adj_rest
+        if args.method == "gcn_gsmp_first":
+            def build_first():
+                adj, _, stats = build(args.method)
+                return adj, {"method": args.method, "gsmp_stats": stats}
+
+            adj_first = adj_cache.get_or_build(
+                adj_cache.entry_name(args.method, args.gsmp_include_self_loops, args.gsmp_weighted_degree),
+                eval_device,
+                build_first,
+            )
     return evaluate_full_graph(
         model,
         x,
@@ -295,6 +399,7 @@ def train_one_seed(
     edge_index: torch.Tensor,
     metadata: Dict,
     args: argparse.Namespace,
+    adj_cache: Optional[SparseAdjCache] = None,
 ) -> Dict:
     set_seed(seed)
     device = parse_device(args.device)
@@ -329,6 +434,20 @@ def train_one_seed(
         )
         log(f"[gsmp] global weight stats: {gsmp_weight_stats(global_gsmp_weight)}")
 
+    epoch_gsmp = (
+        args.method == "gcn_gsmp_first"
+        and args.gsmp_recompute_per_batch
+        and global_gsmp_weight is None
+        and args.batch_builder == "precomputed"
+    )
+    batch_builder = InducedBatchBuilder(
+        edge_index,
+        num_nodes=x.size(0),
+        year_idx=year_idx if epoch_gsmp else None,
+        num_timestamps=num_timestamps,
+        include_self_loops=args.gsmp_include_self_loops,
+    )
+
     start_epoch = 1
     best_valid = -1.0
     test_at_best = -1.0
@@ -358,12 +477,20 @@ def train_one_seed(
         epoch_train_nodes = 0
         generator = torch.Generator().manual_seed(seed * 1_000_003 + epoch)
 
-        for batch_id, nodes, edge_local, edge_pos in iter_induced_batches(
-            edge_index,
-            num_nodes=x.size(0),
-            batch_size=args.batch_size,
-            generator=generator,
-        ):
+        if args.batch_builder == "precomputed":
+            batches = batch_builder.iter_batches(args.batch_size, generator)
+        else:
+            batches = (
+                (*batch, None)
+                for batch in iter_induced_batches(
+                    edge_index,
+                    num_nodes=x.size(0),
+                    batch_size=args.batch_size,
+                    generator=generator,
+                )
+            )
+
+        for batch_id, nodes, edge_local, edge_pos, batch_gsmp_weight in batches:
             train_local = torch.where(split_group[nodes] == 0)[0].long()
             if train_local.numel() == 0:
                 continue
@@ -371,7 +498,7 @@ def train_one_seed(
             x_batch = x[nodes].to(device, non_blocking=True)
             y_batch = y[nodes].to(device, non_blocking=True)
             year_batch = year_idx[nodes].to(device, non_blocking=True)
-            precomputed = None
+            precomputed = batch_gsmp_weight
             if global_gsmp_weight is not None:
                 precomputed = global_gsmp_weight[edge_pos]
 
@@ -425,6 +552,7 @@ def train_one_seed(
                 num_timestamps,
                 args,
                 eval_device,
+                adj_cache=adj_cache,
             )
             final_metrics = metrics
             if metrics["valid"] > best_valid + args.early_stop_min_delta:
@@ -620,9 +748,23 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--run-gsmp-sanity-check", action="store_true")
     parser.add_argument("--gsmp-recompute-per-batch", action="store_true", default=True)
     parser.add_argument("--gsmp-precompute-global", action="store_true")
+    parser.add_argument(
+        "--batch-builder",
+        choices=("precomputed", "legacy"),
+        default="precomputed",
+        help="precomputed: relabel maps and exact per-batch GSMP weights in one pass per epoch; "
+        "legacy: relabel and recompute GSMP inside every batch.",
+    )
     parser.add_argument("--gsmp-include-self-loops", action="store_true")
     parser.add_argument("--gsmp-weighted-degree", action="store_true")
     parser.add_argument("--print-gsmp-batches", type=int, default=3)
+    parser.add_argument(
+        "--adj-cache-dir",
+        type=Path,
+        default=None,
+        help="Cache the normalized full-graph evaluation adjacencies here (memory-mapped CSR), "
+        "shared across seeds, methods and runs on the same graph.",
+    )
     return parser.parse_args()
 
 
@@ -653,6 +795,10 @@ def main() -> None:
     edge_index_diagnostics(edge_index, x.size(0), "training_edge_index")
 
     print_quality_checks(metadata, y, split, edge_index, args)
+    adj_cache = None
+    if args.adj_cache_dir is not None:
+        adj_cache = SparseAdjCache(args.adj_cache_dir, edge_index, year_idx, x.size(0))
+        log(f"[adj-cache] full-graph adjacencies under {adj_cache.root}")
     seeds = resolve_seeds(args)
     all_rows = []
     for seed in seeds:
@@ -666,6 +812,7 @@ def main() -> None:
             edge_index,
             metadata,
             args,
+            adj_cache=adj_cache,
         )
         all_rows.append(row)
         append_results(args.results_dir / "pokec_temporal_results.csv", [row])
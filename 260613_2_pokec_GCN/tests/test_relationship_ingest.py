@@ -0,0 +1,45 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from relationship_ingest import _tokenize_pairs, load_edges_parallel, parse_pairs  # noqa: E402
+
+
+def assert_pairs(actual, expected, name):
+    src, dst = actual
+    if not (np.array_equal(src, expected[0]) and np.array_equal(dst, expected[1])):
+        raise AssertionError(f"{name}: actual={src.tolist()},{dst.tolist()} expected={expected}")
+
+
+def test_irregular_lines_are_not_paired_across_lines():
+    assert_pairs(parse_pairs(b"1 2 3\n4\n"), ([1], [2]), "extra column then short line")
+    assert_pairs(parse_pairs(b"1\n2 3 4\n"), ([2], [3]), "short line then extra column")
+    assert_pairs(parse_pairs(b"1 2\n\n3 4"), ([1, 3], [2, 4]), "blank line")
+
+
+def test_fast_path_and_tokenizer_agree_on_signs():
+    for block in (b"1 2\n-3 4\n", b"-1 2\n3\t-4\r\n", b"5 6\n7 8"):
+        assert_pairs(parse_pairs(block), _tokenize_pairs(block), repr(block))
+    assert_pairs(parse_pairs(b"-1 2\n3 4 5\n"), ([-1, 3], [2, 4]), "negative id in an irregular block")
+
+
+def test_load_edges_drops_negative_and_out_of_range_ids():
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "relationships.txt"
+        path.write_bytes(b"1 2\n-2 3\n3 -1\n2 3 9\n4\n3 1\n9 1\n")
+        edges = load_edges_parallel(path, num_nodes=3, work_dir=Path(tmpdir), num_workers=2, block_bytes=8)
+        assert edges.tolist() == [[0, 1, 2], [1, 2, 0]], edges.tolist()
+
+
+if __name__ == "__main__":
+    test_irregular_lines_are_not_paired_across_lines()
+    test_fast_path_and_tokenizer_agree_on_signs()
+    test_load_edges_drops_negative_and_out_of_range_ids()
+    print("relationship ingest tests passed")
@@ -36,6 +36,12 @@ from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 import numpy as np
 import pandas as pd
 
+REPO_ROOT = Path(__file__).resolve().parents[1]
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+from pokec_raw_cache import load_profile_columns, load_relationship_array, registration_years  # noqa: E402
+
 
 PROFILE_URL = "https://snap.stanford.edu/data/soc-pokec-profiles.txt.gz"
 EDGE_URL = "https://snap.stanford.edu/data/soc-pokec-relationships.txt.gz"
@@ -138,17 +144,36 @@ def year_dtype_for(years: np.ndarray) -> np.dtype:
     return np.dtype(np.int32)
 
 
-def load_registration_years(
+def read_registration_rows_cached(
     profile_path: Path,
-    min_year: Optional[int] = None,
-    max_year: Optional[int] = None,
-    progress_interval: int = 500_000,
-) -> ProfileData:
-    if not profile_path.exists():
-        raise FileNotFoundError(
-            f"Profile file not found: {profile_path}. Pass --download to fetch it."
-        )
+    cache_dir: Optional[Path],
+    min_year: Optional[int],
+    max_year: Optional[int],
+) -> Tuple[int, int, int, np.ndarray, np.ndarray]:
+    log(f"[profiles] loading {profile_path} through the binary cache")
+    columns = load_profile_columns(str(profile_path), cache_dir=str(cache_dir) if cache_dir else None)
+    years = registration_years(columns["registered_ns"])
+    valid = years >= 0
+    keep = valid.copy()
+    if min_year is not None:
+        keep &= years >= min_year
+    if max_year is not None:
+        keep &= years <= max_year
+    return (
+        int(columns["user_id"].size),
+        int(valid.sum()),
+        int(valid.sum() - keep.sum()),
+        columns["user_id"][keep],
+        years[keep].astype(np.int32),
+    )
+
 
+def read_registration_rows_text(
+    profile_path: Path,
+    min_year: Optional[int],
+    max_year: Optional[int],
+    progress_interval: int,
+) -> Tuple[int, int, int, np.ndarray, np.ndarray]:
     profile_rows = 0
     valid_registration_rows = 0
     filtered_registration_rows = 0
@@ -184,11 +209,37 @@ def load_registration_years(
                     f"kept={len(user_ids):,}"
                 )
 
-    if not user_ids:
+    return (
+        profile_rows,
+        valid_registration_rows,
+        filtered_registration_rows,
+        np.asarray(user_ids, dtype=np.int64),
+        np.asarray(years, dtype=np.int32),
+    )
+
+
+def load_registration_years(
+    profile_path: Path,
+    min_year: Optional[int] = None,
+    max_year: Optional[int] = None,
+    progress_interval: int = 500_000,
+    use_cache: bool = False,
+    cache_dir: Optional[Path] = None,
+) -> ProfileData:
+    if not profile_path.exists():
+        raise FileNotFoundError(
+            f"Profile file not found: {profile_path}. Pass --download to fetch it."
+        )
+
+    if use_cache:
+        rows = read_registration_rows_cached(profile_path, cache_dir, min_year, max_year)
+    else:
+        rows = read_registration_rows_text(profile_path, min_year, max_year, progress_interval)
+    profile_rows, valid_registration_rows, filtered_registration_rows, user_ids_arr, years = rows
+    if user_ids_arr.size == 0:
         raise ValueError("No users with parseable registration years after filtering.")
 
-    user_ids_arr = np.asarray(user_ids, dtype=np.int64)
-    years_arr = np.asarray(years, dtype=year_dtype_for(np.asarray(years, dtype=np.int32)))
+    years_arr = years.astype(year_dtype_for(years))
 
     unique_ids, first_indices = np.unique(user_ids_arr, return_index=True)
     duplicate_user_rows = int(user_ids_arr.size - unique_ids.size)
@@ -435,11 +486,25 @@ def make_year_index_lookup(years_sorted: np.ndarray) -> Tuple[np.ndarray, int]:
     return lookup, year_min
 
 
-def edge_chunk_iterator(edge_path: Path, chunksize: int) -> Iterable[pd.DataFrame]:
+def cached_edge_chunks(edges: np.ndarray, chunksize: int) -> Iterable[pd.DataFrame]:
+    for start in range(0, edges.shape[1], chunksize):
+        block = np.asarray(edges[:, start : start + chunksize], dtype=np.int64)
+        yield pd.DataFrame({"src": block[0], "dst": block[1]})
+
+
+def edge_chunk_iterator(
+    edge_path: Path,
+    chunksize: int,
+    use_cache: bool = False,
+    cache_dir: Optional[Path] = None,
+) -> Iterable[pd.DataFrame]:
     if not edge_path.exists():
         raise FileNotFoundError(
             f"Edge file not found: {edge_path}. Pass --download to fetch it."
         )
+    if use_cache:
+        edges = load_relationship_array(str(edge_path), cache_dir=str(cache_dir) if cache_dir else None)
+        return cached_edge_chunks(edges, chunksize)
     return pd.read_csv(
         edge_path,
         sep=r"\s+",
@@ -474,6 +539,8 @@ def compute_edge_year_matrix(
     duplicate_check: str = "partition",
     duplicate_partitions: int = 64,
     use_tqdm: bool = True,
+    use_cache: bool = False,
+    cache_dir: Optional[Path] = None,
 ) -> EdgeStats:
     n_years = int(years_sorted.size)
     year_index_lookup, year_min = make_year_index_lookup(years_sorted)
@@ -487,7 +554,7 @@ def compute_edge_year_matrix(
     duplicate_tracker = DuplicateTracker(duplicate_check, duplicate_partitions, out_dir)
 
     log(f"[edges] reading {edge_path} in chunks of {chunksize:,}")
-    reader = edge_chunk_iterator(edge_path, chunksize)
+    reader = edge_chunk_iterator(edge_path, chunksize, use_cache=use_cache, cache_dir=cache_dir)
     for chunk_idx, chunk in enumerate(maybe_tqdm(reader, use_tqdm), start=1):
         src = chunk["src"].to_numpy(dtype=np.int64, copy=False)
         dst = chunk["dst"].to_numpy(dtype=np.int64, copy=False)
@@ -1043,6 +1110,17 @@ def parse_args() -> argparse.Namespace:
         default=64,
         help="Number of disk partitions used for exact duplicate counting.",
     )
+    parser.add_argument(
+        "--raw-cache-dir",
+        type=Path,
+        default=None,
+        help="Directory for the binary profile/edge cache (default: next to the raw files).",
+    )
+    parser.add_argument(
+        "--no-raw-cache",
+        action="store_true",
+        help="Stream the text files every run instead of using the binary cache.",
+    )
     parser.add_argument(
         "--no-tqdm",
         action="store_true",
@@ -1070,6 +1148,8 @@ def main() -> None:
         args.profile_path,
         min_year=args.min_year,
         max_year=args.max_year,
+        use_cache=not args.no_raw_cache,
+        cache_dir=args.raw_cache_dir,
     )
     profile.node_counts_by_year.to_csv(
         args.out_dir / "pokec_node_counts_by_registration_year.csv",
@@ -1094,6 +1174,8 @@ def main() -> None:
         duplicate_check=args.duplicate_check,
         duplicate_partitions=args.duplicate_partitions,
         use_tqdm=not args.no_tqdm,
+        use_cache=not args.no_raw_cache,
+        cache_dir=args.raw_cache_dir,
     )
 
     save_matrices(
@@ -1,11 +1,17 @@
 import datetime
 import os
+import sys
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Dict, Optional, Tuple
 
 import torch
 
+from metapath_diag import cached_metapath_diag, edges_to_csr, metapath_diag
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from temporal_weights import gsmp_edge_weights, smp_single_mask  # noqa: E402
+
 try:
     import dgl.function as fn
 except ModuleNotFoundError:
@@ -24,6 +30,7 @@ class ImpactConfig:
     t_min: Optional[int] = None
     t_max: Optional[int] = None
     edge_weight_cache: Dict[Tuple[str, str, str, str], torch.Tensor] = field(default_factory=dict)
+    pxp_batch_bytes: int = 0
 
 
 def normalize_method(method: str) -> str:
@@ -36,9 +43,12 @@ def build_impact_config(args, paper_year: Optional[torch.Tensor]) -> ImpactConfi
     method = normalize_method(getattr(args, "impact_method", "none"))
     apply_to = getattr(args, "impact_apply_to", "both")
     first_only = bool(getattr(args, "impact_gsmp_first_layer_only", True))
+    pxp_batch_bytes = int(getattr(args, "impact_pxp_batch_mb", 0)) << 20
 
     if method == "none":
-        return ImpactConfig(method="none", apply_to=apply_to, gsmp_first_layer_only=first_only)
+        return ImpactConfig(
+            method="none", apply_to=apply_to, gsmp_first_layer_only=first_only, pxp_batch_bytes=pxp_batch_bytes
+        )
 
     if paper_year is None:
         raise ValueError("SMP/GSMP requires ogbn-mag paper year timestamps, but none were found.")
@@ -55,6 +65,7 @@ def build_impact_config(args, paper_year: Optional[torch.Tensor]) -> ImpactConfi
         paper_year=paper_year,
         t_min=int(paper_year[valid].min().item()),
         t_max=int(paper_year[valid].max().item()),
+        pxp_batch_bytes=pxp_batch_bytes,
     )
 
 
@@ -88,9 +99,7 @@ def should_apply_impact(
 
 
 def compute_smp_raw_weights(src_time: torch.Tensor, dst_time: torch.Tensor, t_min: int, t_max: int) -> torch.Tensor:
-    delta = torch.abs(src_time - dst_time)
-    radius = torch.minimum(dst_time - float(t_min), float(t_max) - dst_time)
-    single = (delta == 0) | (delta > radius)
+    single = smp_single_mask(src_time, dst_time, float(t_min), float(t_max), single_on_equal=True)
     return torch.where(
         single,
         torch.full_like(src_time, 2.0, dtype=torch.float32),
@@ -105,9 +114,8 @@ def compute_gsmp_raw_weights(dst: torch.Tensor, src_time: torch.Tensor) -> torch
     src_time = src_time.long()
     year_min = int(src_time.min().item())
     year_span = int(src_time.max().item() - year_min + 1)
-    keys = dst.long() * year_span + (src_time - year_min)
-    _, inverse, counts = torch.unique(keys, sorted=False, return_inverse=True, return_counts=True)
-    return 1.0 / counts[inverse].to(torch.float32)
+    num_dst = int(dst.max().item()) + 1
+    return gsmp_edge_weights(dst, src_time - year_min, year_span, num_dst)
 
 
 def _edge_cache_key(etype, method: str, scope: str, hop: int) -> Tuple[str, str, str, str]:
@@ -179,6 +187,76 @@ def _effective_path_raw_weight(config: ImpactConfig, target_time: torch.Tensor,
     raise ValueError(f"Unsupported impact method: {config.method}")
 
 
+def _pxp_etypes(middle_type: str):
+    return ("P", f"P-{middle_type}", middle_type), (middle_type, f"{middle_type}-P", "P")
+
+
+PXP_EDGE_CHUNK = 1 << 18
+
+
+def _pxp_path_sums(g, middle_type: str, values: torch.Tensor, slot: torch.Tensor, num_slots: int) -> torch.Tensor:
+    """``[P, num_slots, width]`` sums of ``values`` over every P-X-P path, split by the source's ``slot``.
+
+    Sources with ``slot < 0`` are skipped.  The first hop scatters each source
+    row straight into its slot of the middle-node sums, so it touches every
+    P-X edge once however many slots there are; only the second hop (one
+    update_all) carries all slots as channels.
+    """
+    forward_etype, backward_etype = _pxp_etypes(middle_type)
+    tmp_mid = "_impact_pxp_mid"
+    tmp_out = "_impact_pxp_out"
+    width = values.shape[1]
+    src, mid = g.edges(etype=forward_etype)
+    src, mid = src.to(values.device).long(), mid.to(values.device).long()
+    slot = slot.to(values.device)
+    mid_sums = torch.zeros((g.num_nodes(middle_type) * num_slots, width), dtype=values.dtype, device=values.device)
+    for start in range(0, src.numel(), PXP_EDGE_CHUNK):
+        chunk_src = src[start : start + PXP_EDGE_CHUNK]
+        chunk_slot = slot[chunk_src]
+        keep = chunk_slot >= 0
+        chunk_src, chunk_slot = chunk_src[keep], chunk_slot[keep]
+        chunk_mid = mid[start : start + PXP_EDGE_CHUNK][keep]
+        mid_sums.index_add_(0, chunk_mid * num_slots + chunk_slot, values[chunk_src])
+    g.nodes[middle_type].data[tmp_mid] = mid_sums.view(-1, num_slots * width)
+    del mid_sums
+    g[backward_etype].update_all(fn.copy_u(tmp_mid, "m"), fn.sum("m", tmp_out), etype=backward_etype)
+    g.nodes[middle_type].data.pop(tmp_mid, None)
+    return g.nodes["P"].data.pop(tmp_out).view(-1, num_slots, width)
+
+
+def _year_slots(paper_year: torch.Tensor, years) -> torch.Tensor:
+    """Position of every paper's year in ``years`` (sorted), ``-1`` when absent."""
+    years = torch.tensor(years, dtype=paper_year.dtype, device=paper_year.device)
+    pos = torch.searchsorted(years, paper_year).clamp_max(years.numel() - 1)
+    return torch.where(years[pos] == paper_year, pos, torch.full_like(pos, -1))
+
+
+def _available_bytes(device: torch.device) -> int:
+    if device.type == "cuda":
+        return int(torch.cuda.mem_get_info(device)[0])
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) << 10
+    except OSError:
+        pass
+    return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+
+
+def _pxp_year_batch(g, middle_type: str, config: ImpactConfig, channels: int, itemsize: int, num_years: int,
+                    device: torch.device) -> int:
+    # Middle-node sums and target sums each hold `channels` per year bucket.
+    rows = g.num_nodes("P") + g.num_nodes(middle_type)
+    per_year = max(1, rows * channels * itemsize)
+    budget = config.pxp_batch_bytes if config.pxp_batch_bytes > 0 else _available_bytes(device) // 2
+    batch = max(1, min(num_years, budget // per_year))
+    passes = -(-num_years // batch)
+    print(f"[impact] P-{middle_type}-P: {num_years} source years, {batch} per pass, {passes} passes "
+          f"(budget {budget >> 20} MiB)", flush=True)
+    return batch
+
+
 def weighted_effective_pxp(g, middle_type: str, source_key: str, out_key: str, config: ImpactConfig):
     if fn is None:
         raise ModuleNotFoundError("DGL is required for weighted HGAMLP propagation.")
@@ -187,42 +265,38 @@ def weighted_effective_pxp(g, middle_type: str, source_key: str, out_key: str, c
     if source_key not in g.nodes["P"].data:
         return
 
-    forward_etype = ("P", f"P-{middle_type}", middle_type)
-    backward_etype = (middle_type, f"{middle_type}-P", "P")
     feat = g.nodes["P"].data[source_key]
     device = feat.device
     paper_year = config.paper_year.to(device)
-    valid_years = torch.unique(paper_year[paper_year >= 0]).detach().cpu().tolist()
+    years = sorted(int(y) for y in torch.unique(paper_year[paper_year >= 0]).detach().cpu().tolist())
     target_time = paper_year.to(torch.float32)
 
     numerator = torch.zeros_like(feat)
     denom = torch.zeros((feat.shape[0], 1), dtype=torch.float32, device=device)
-    tmp_src = "_impact_pxp_src"
-    tmp_mid = "_impact_pxp_mid"
-    tmp_out = "_impact_pxp_out"
-
-    for year in sorted(int(y) for y in valid_years):
-        year_mask = (paper_year == year).to(feat.dtype).view(-1, 1)
-        payload = torch.cat([feat * year_mask, year_mask], dim=1)
-        g.nodes["P"].data[tmp_src] = payload
-        g[forward_etype].update_all(fn.copy_u(tmp_src, "m"), fn.sum("m", tmp_mid), etype=forward_etype)
-        g[backward_etype].update_all(fn.copy_u(tmp_mid, "m"), fn.sum("m", tmp_out), etype=backward_etype)
-
-        path_payload = g.nodes["P"].data.pop(tmp_out)
-        path_sum = path_payload[:, :-1]
-        path_count = path_payload[:, -1:].to(torch.float32)
-        raw_weight = _effective_path_raw_weight(config, target_time, year).view(-1, 1).to(device)
-        active = path_count > 0
-
-        if config.method == "gsmp":
-            numerator += torch.where(active, path_sum / path_count.clamp_min(1e-12), torch.zeros_like(path_sum))
-            denom += active.to(torch.float32)
-        else:
-            numerator += raw_weight * path_sum
-            denom += raw_weight * path_count
-
-        g.nodes[middle_type].data.pop(tmp_mid, None)
-        g.nodes["P"].data.pop(tmp_src, None)
+    width = feat.shape[1] + 1
+    batch = _pxp_year_batch(g, middle_type, config, width, feat.element_size(), len(years), device)
+    values = torch.cat([feat, torch.ones((feat.shape[0], 1), dtype=feat.dtype, device=device)], dim=1)
+
+    # Each pass carries `batch` source-year buckets as extra channels of the
+    # second hop, so the number of graph sweeps drops from 2 * years to
+    # 2 * ceil(years / batch).
+    for start in range(0, len(years), batch):
+        chunk = years[start : start + batch]
+        path_payload = _pxp_path_sums(g, middle_type, values, _year_slots(paper_year, chunk), len(chunk))
+
+        for offset, year in enumerate(chunk):
+            path_sum = path_payload[:, offset, :-1]
+            path_count = path_payload[:, offset, -1:].to(torch.float32)
+            raw_weight = _effective_path_raw_weight(config, target_time, year).view(-1, 1).to(device)
+            active = path_count > 0
+
+            if config.method == "gsmp":
+                numerator += torch.where(active, path_sum / path_count.clamp_min(1e-12), torch.zeros_like(path_sum))
+                denom += active.to(torch.float32)
+            else:
+                numerator += raw_weight * path_sum
+                denom += raw_weight * path_count
+        del path_payload
 
     g.nodes["P"].data[out_key] = numerator / denom.clamp_min(1e-12)
 
@@ -245,8 +319,7 @@ def effective_pxp_diag(g, middle_type: str, config: ImpactConfig) -> torch.Tenso
     if config.paper_year is None:
         raise ValueError("effective P-X-P diagonal needs paper years.")
 
-    forward_etype = ("P", f"P-{middle_type}", middle_type)
-    backward_etype = (middle_type, f"{middle_type}-P", "P")
+    forward_etype, _ = _pxp_etypes(middle_type)
     num_papers = g.num_nodes("P")
     src, _ = g.edges(etype=forward_etype)
     src = src.detach().cpu().long()
@@ -255,50 +328,47 @@ def effective_pxp_diag(g, middle_type: str, config: ImpactConfig) -> torch.Tenso
         self_path_count.scatter_add_(0, src, torch.ones(src.numel(), dtype=torch.float32))
 
     paper_year = config.paper_year.detach().cpu().long()
-    valid_years = torch.unique(paper_year[paper_year >= 0]).detach().cpu().tolist()
+    years = sorted(int(y) for y in torch.unique(paper_year[paper_year >= 0]).tolist())
     target_time = paper_year.to(torch.float32)
     denom = torch.zeros(num_papers, dtype=torch.float32)
     diag_num = torch.zeros(num_papers, dtype=torch.float32)
-
-    tmp_src = "_impact_pxp_diag_src"
-    tmp_mid = "_impact_pxp_diag_mid"
-    tmp_out = "_impact_pxp_diag_out"
-
-    for year in sorted(int(y) for y in valid_years):
-        year_mask = (paper_year == year).to(torch.float32).view(-1, 1)
-        g.nodes["P"].data[tmp_src] = year_mask
-        g[forward_etype].update_all(fn.copy_u(tmp_src, "m"), fn.sum("m", tmp_mid), etype=forward_etype)
-        g[backward_etype].update_all(fn.copy_u(tmp_mid, "m"), fn.sum("m", tmp_out), etype=backward_etype)
-
-        path_count = g.nodes["P"].data.pop(tmp_out).view(-1).detach().cpu().to(torch.float32)
-        active = path_count > 0
-        same_year_target = paper_year == year
-
-        if config.method == "gsmp":
-            denom += active.to(torch.float32)
-            same_year_active = same_year_target & active
-            diag_num[same_year_active] = (
-                self_path_count[same_year_active] / path_count[same_year_active].clamp_min(1e-12)
-            )
-        elif config.method == "smp":
-            raw_weight = _effective_path_raw_weight(config, target_time, year).detach().cpu().view(-1)
-            denom += raw_weight * path_count
-            same_year_active = same_year_target & active
-            diag_num[same_year_active] = raw_weight[same_year_active] * self_path_count[same_year_active]
-        else:
-            raise ValueError(f"Unsupported impact method: {config.method}")
-
-        g.nodes[middle_type].data.pop(tmp_mid, None)
-        g.nodes["P"].data.pop(tmp_src, None)
+    graph_device = g.device
+    batch = _pxp_year_batch(g, middle_type, config, 1, 4, len(years), graph_device)
+    ones = torch.ones((num_papers, 1), dtype=torch.float32, device=graph_device)
+
+    # Only path counts are carried, so a single pass usually covers every year.
+    for start in range(0, len(years), batch):
+        chunk = years[start : start + batch]
+        slots = _year_slots(paper_year, chunk).to(graph_device)
+        path_counts = _pxp_path_sums(g, middle_type, ones, slots, len(chunk)).squeeze(-1).detach().cpu()
+
+        for offset, year in enumerate(chunk):
+            path_count = path_counts[:, offset].contiguous()
+            active = path_count > 0
+            same_year_target = paper_year == year
+
+            if config.method == "gsmp":
+                denom += active.to(torch.float32)
+                same_year_active = same_year_target & active
+                diag_num[same_year_active] = (
+                    self_path_count[same_year_active] / path_count[same_year_active].clamp_min(1e-12)
+                )
+            elif config.method == "smp":
+                raw_weight = _effective_path_raw_weight(config, target_time, year).detach().cpu().view(-1)
+                denom += raw_weight * path_count
+                same_year_active = same_year_target & active
+                diag_num[same_year_active] = raw_weight[same_year_active] * self_path_count[same_year_active]
+            else:
+                raise ValueError(f"Unsupported impact method: {config.method}")
 
     return diag_num / denom.clamp_min(1e-12)
 
 
 def ensure_impact_pxp_diag(g, args, config: ImpactConfig, middle_type: str, out_key: str) -> Path:
-    emb_path = Path(getattr(args, "emb_path", "./dataset/ogbn_mag/"))
-    emb_path.mkdir(parents=True, exist_ok=True)
+    cache_dir = Path(getattr(args, "impact_cache_dir", "./impact_cache")) / "metapath_diag"
+    cache_dir.mkdir(parents=True, exist_ok=True)
     variant = impact_variant_tag(config)
-    path = emb_path / f"{args.dataset}_{variant}_{IMPACT_CACHE_VERSION}_{out_key}_diag.pt"
+    path = cache_dir / f"{args.dataset}_{variant}_{IMPACT_CACHE_VERSION}_{out_key}_diag.pt"
     if path.exists():
         return path
 
@@ -307,77 +377,49 @@ def ensure_impact_pxp_diag(g, args, config: ImpactConfig, middle_type: str, out_
     return path
 
 
-def row_normalized_pp_edges(g, method: str, config: Optional[ImpactConfig]) -> Tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
-    etype = ("P", "P-P", "P")
-    src, dst = g.edges(etype=etype)
-    src = src.detach().cpu().long()
-    dst = dst.detach().cpu().long()
-    if method == "none":
-        raw = torch.ones(src.numel(), dtype=torch.float32)
-    else:
-        local = ImpactConfig(
-            method=method,
-            apply_to="label",
-            gsmp_first_layer_only=False,
-            paper_year=config.paper_year,
-            t_min=config.t_min,
-            t_max=config.t_max,
-        )
-        raw = get_raw_edge_weights(g, etype, local, "label", 1)
-
-    denom = torch.zeros(g.num_nodes("P"), dtype=torch.float32)
-    denom.scatter_add_(0, dst, raw)
-    norm = raw / denom[dst].clamp_min(1e-12)
-    return dst, src, norm
-
-
-def diag_of_sparse_product(
-    left_row: torch.Tensor,
-    left_col: torch.Tensor,
-    left_val: torch.Tensor,
-    right_row: torch.Tensor,
-    right_col: torch.Tensor,
-    right_val: torch.Tensor,
-    n: int,
-) -> torch.Tensor:
-    left_key = left_col * n + left_row
-    right_key = right_row * n + right_col
-    order = torch.argsort(right_key)
-    sorted_key = right_key[order]
-    sorted_val = right_val[order]
-    diag = torch.zeros(n, dtype=torch.float32)
-    if sorted_key.numel() == 0:
-        return diag
-    pos = torch.searchsorted(sorted_key, left_key)
-    safe_pos = pos.clamp_max(sorted_key.numel() - 1)
-    match = (pos < sorted_key.numel()) & (sorted_key[safe_pos] == left_key)
-    if match.any():
-        diag.scatter_add_(0, left_row[match], left_val[match] * sorted_val[safe_pos[match]])
-    return diag
-
-
-def ensure_impact_ppp_diag(g, args, config: ImpactConfig) -> Path:
-    emb_path = Path(getattr(args, "emb_path", "./dataset/ogbn_mag/"))
-    emb_path.mkdir(parents=True, exist_ok=True)
-    variant = impact_variant_tag(config)
-    path = emb_path / f"{args.dataset}_{variant}_{IMPACT_CACHE_VERSION}_PPP_diag.pt"
-    if path.exists():
-        return path
-
-    if config.method == "gsmp" and config.gsmp_first_layer_only:
-        first_method = "gsmp"
-        second_method = "none"
-    else:
-        first_method = config.method
-        second_method = config.method
-
-    right_row, right_col, right_val = row_normalized_pp_edges(g, first_method, config)
-    left_row, left_col, left_val = row_normalized_pp_edges(g, second_method, config)
-    diag = diag_of_sparse_product(
-        left_row, left_col, left_val, right_row, right_col, right_val, g.num_nodes("P")
+def _etype_between(g, stype: str, dtype: str):
+    for etype in g.canonical_etypes:
+        if etype[0] == stype and etype[2] == dtype:
+            return etype
+    raise KeyError(f"No edge type from {stype} to {dtype}")
+
+
+def metapath_factors(g, key: str, config: Optional[ImpactConfig], scope: str = "label"):
+    """Per-hop target-normalized operators whose product is what ``hg_propagate`` applies for ``key``.
+
+    ``key[0]`` is the target type; factor ``i`` aggregates ``key[i + 1] -> key[i]``
+    at hop ``len(key) - 1 - i`` with the same SMP/GSMP weights as propagation.
+    """
+    factors = []
+    num_hops = len(key) - 1
+    for pos in range(num_hops):
+        dtype, stype = key[pos], key[pos + 1]
+        hop = num_hops - pos
+        etype = _etype_between(g, stype, dtype)
+        src, dst = g.edges(etype=etype)
+        src = src.detach().cpu().long()
+        dst = dst.detach().cpu().long()
+        if should_apply_impact(config, scope, hop, stype, dtype):
+            raw = get_raw_edge_weights(g, etype, config, scope, hop)
+        else:
+            raw = torch.ones(src.numel(), dtype=torch.float32)
+        denom = torch.zeros(g.num_nodes(dtype), dtype=torch.float32)
+        denom.scatter_add_(0, dst, raw)
+        norm = raw / denom[dst].clamp_min(1e-12)
+        factors.append(edges_to_csr(dst, src, norm, (g.num_nodes(dtype), g.num_nodes(stype))))
+    return factors
+
+
+def ensure_metapath_diag(g, args, config: Optional[ImpactConfig], key: str) -> Path:
+    """Self-effect diagonal of the ``key`` label propagation, cached next to the propagation cache."""
+    variant = impact_variant_tag(config) if impact_active_for_scope(config, "label") else "none"
+    factors = metapath_factors(g, key, config, "label")
+    return cached_metapath_diag(
+        factors,
+        getattr(args, "impact_cache_dir", "./impact_cache"),
+        f"{args.dataset}_{variant}_{key}",
+        num_threads=int(getattr(args, "impact_diag_threads", 0)),
     )
-    torch.save(diag, path)
-    return path
 
 
 def propagation_cache_path(args, scope: str, num_hops: int, max_hops: int, extra_metapath) -> Optional[Path]:
@@ -484,6 +526,12 @@ def run_debug_impact_toy_tests() -> None:
     expected_agg = torch.tensor([24.0])
     assert torch.allclose(agg, expected_agg, atol=1e-6), (agg, expected_agg)
 
+    left = edges_to_csr(torch.tensor([0, 0, 1, 2]), torch.tensor([0, 1, 1, 0]), torch.tensor([0.5, 0.5, 1.0, 1.0]), (3, 2))
+    right = edges_to_csr(torch.tensor([0, 1, 1]), torch.tensor([0, 1, 2]), torch.tensor([1.0, 0.25, 0.75]), (2, 3))
+    diag = metapath_diag([left, right], num_threads=2, block_rows=2)
+    expected_diag = torch.from_numpy((left @ right).diagonal()).to(torch.float32)
+    assert torch.allclose(diag, expected_diag), (diag, expected_diag)
+
     none_config = ImpactConfig(method="none")
     assert not should_apply_impact(none_config, "feature", 1, "P", "P")
     print("impact toy tests passed", flush=True)
@@ -16,8 +16,8 @@ from impact import (
     append_live_progress,
     apply_effective_pxp_impact,
     build_impact_config,
-    ensure_impact_ppp_diag,
     ensure_impact_pxp_diag,
+    ensure_metapath_diag,
     format_result_line,
     impact_active_for_scope,
     normalize_method,
@@ -42,13 +42,15 @@ def load_diag_tensor(args, diag_name):
 
 def load_label_self_effect_diag(g, args, impact_config, key):
     if impact_active_for_scope(impact_config, 'label'):
-        if key == 'PPP':
-            return torch.load(ensure_impact_ppp_diag(g, args, impact_config))
-        if key == 'PAP':
-            return torch.load(ensure_impact_pxp_diag(g, args, impact_config, 'A', 'PAP'))
-        if key == 'PFP':
-            return torch.load(ensure_impact_pxp_diag(g, args, impact_config, 'F', 'PFP'))
-    return load_diag_tensor(args, f'{args.dataset}_{key}_diag.pt')
+        # PAP/PFP use the year-bucketed effective operator, not a plain product.
+        if key in ('PAP', 'PFP'):
+            return torch.load(ensure_impact_pxp_diag(g, args, impact_config, key[1], key))
+    else:
+        try:
+            return load_diag_tensor(args, f'{args.dataset}_{key}_diag.pt')
+        except FileNotFoundError:
+            pass
+    return torch.load(ensure_metapath_diag(g, args, impact_config, key))
 
 
 def remove_label_self_effect(label_feat, label_onehot, diag, key):
@@ -143,7 +145,8 @@ def prepare_mag_feature_tensors(
         restore_node_data(g, initial_node_data)
         g = hg_propagate(
             g, tgt_type, args.num_hops, max_hops, extra_metapath, echo=False,
-            impact_config=active_config, impact_scope='feature')
+            impact_config=active_config, impact_scope='feature',
+            spill_dir=args.prop_spill_dir, report_memory=args.prop_memory_report)
         apply_effective_pxp_impact(g, active_config, 'feature', source_key='P')
 
         feats = {}
@@ -354,7 +357,8 @@ def main(args):
 
                 g = hg_propagate(
                     g, tgt_type, args.num_label_hops, max_hops, extra_metapath, echo=False,
-                    impact_config=label_impact_config, impact_scope='label')
+                    impact_config=label_impact_config, impact_scope='label',
+                    spill_dir=args.prop_spill_dir, report_memory=args.prop_memory_report)
                 apply_effective_pxp_impact(g, label_impact_config, 'label', source_key='P')
 
                 keys = list(g.nodes[tgt_type].data.keys())
@@ -619,10 +623,19 @@ def parse_args(args=None):
                         help="debug/ablation: apply GSMP to every eligible paper-paper step")
     parser.add_argument("--impact-cache-dir", type=str, default="./impact_cache",
                         help="where to cache propagated feature tensors")
+    parser.add_argument("--impact-pxp-batch-mb", type=int, default=0,
+                        help="memory budget for the source-year buckets carried per PAP/PFP sweep "
+                             "(0 = half of the currently available memory)")
+    parser.add_argument("--impact-diag-threads", type=int, default=0,
+                        help="threads for label self-effect diagonals (0 = all cores)")
     parser.add_argument("--cache-propagation", action='store_true', default=True,
                         help="cache expensive propagated feature tensors")
     parser.add_argument("--no-cache-propagation", dest="cache_propagation", action='store_false',
                         help="disable propagated feature tensor cache")
+    parser.add_argument("--prop-spill-dir", type=str, default=None,
+                        help="spill finished metapath features to memory-mapped files under this directory")
+    parser.add_argument("--prop-memory-report", action='store_true', default=False,
+                        help="print peak resident node data per propagation hop")
     parser.add_argument("--progress-file", type=str, default="./results/live_progress.tsv",
                         help="append-only TSV used for real-time monitoring")
     parser.add_argument("--debug-impact-toy-test", action='store_true', default=False,
@@ -0,0 +1,123 @@
+"""Memory-bounded scheduling helpers for ``utils.hg_propagate``.
+
+The original loop runs ``for etype: for key`` and only drops intermediate keys
+when the hop ends, so every length-``hop`` tensor of every node type is alive
+together with all the tensors it produces.  ``hop_schedule`` groups the same
+updates by source key, so a key can be popped as soon as its last outgoing
+etype has run.  ``FeatureSpill`` moves finished target-type metapath features
+into memory-mapped ``.npy`` files: the file is unlinked as soon as it is
+mapped, so the pages are evictable page cache and nothing is left on disk.
+``HopMemoryTracker`` prints the peak resident node data per hop.
+"""
+import os
+import resource
+import tempfile
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import torch
+
+
+Update = Tuple[str, str, str]  # (etype, dtype, dst_key)
+
+
+def hop_schedule(g, hop: int, num_hops: int, tgt_type: str, reserve_heads) -> Tuple[List[Tuple[Tuple[str, str], List[Update]]], List[Tuple[str, str]]]:
+    """Updates of one hop grouped by ``(stype, key)``, plus ``(dtype, dst_key)`` in the original loop order."""
+    by_source: Dict[Tuple[str, str], List[Update]] = {}
+    created = []
+    for etype in g.etypes:
+        stype, _, dtype = g.to_canonical_etype(etype)
+        for k in list(g.nodes[stype].data.keys()):
+            if len(k) != hop:
+                continue
+            if (hop == num_hops and dtype != tgt_type and k not in reserve_heads) \
+              or (hop > num_hops and k not in reserve_heads):
+                continue
+            dst_key = f'{dtype}{k}'
+            by_source.setdefault((stype, k), []).append((etype, dtype, dst_key))
+            created.append((dtype, dst_key))
+    return list(by_source.items()), created
+
+
+class FeatureSpill:
+    """Swap CPU tensors for copies backed by unlinked memory-mapped files; disabled when ``spill_dir`` is None."""
+
+    def __init__(self, spill_dir: Optional[str] = None) -> None:
+        self.dir = None
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.dir = tempfile.mkdtemp(prefix="hg_propagate_", dir=spill_dir)
+        self.spilled_bytes = 0
+        self._ptrs: Set[int] = set()
+        self._count = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.dir is not None
+
+    def is_spilled(self, tensor: torch.Tensor) -> bool:
+        return tensor.data_ptr() in self._ptrs
+
+    def offload(self, tensor: torch.Tensor) -> torch.Tensor:
+        # numpy has no bfloat16, and CUDA tensors would be copied straight back.
+        if not self.enabled or tensor.device.type != "cpu" or tensor.dtype == torch.bfloat16:
+            return tensor
+        if tensor.numel() == 0 or self.is_spilled(tensor):
+            return tensor
+        values = tensor.detach().contiguous().numpy()
+        path = os.path.join(self.dir, f"{self._count}.npy")
+        self._count += 1
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=values.dtype, shape=values.shape)
+        out[...] = values
+        out.flush()
+        del out
+        # Copy-on-write keeps the mapping writable without touching the file.
+        mapped = torch.from_numpy(np.load(path, mmap_mode="c"))
+        os.remove(path)
+        self._ptrs.add(mapped.data_ptr())
+        self.spilled_bytes += values.nbytes
+        return mapped
+
+    def offload_key(self, g, ntype: str, key: str) -> None:
+        data = g.nodes[ntype].data
+        data[key] = self.offload(data[key])
+
+    def close(self) -> None:
+        if self.dir is not None:
+            os.rmdir(self.dir)
+            self.dir = None
+
+
+class HopMemoryTracker:
+    """Peak bytes of node data that is still in RAM (not spilled) during each hop."""
+
+    def __init__(self, spill: FeatureSpill) -> None:
+        self.spill = spill
+        self.peak = 0
+
+    def live_bytes(self, g) -> int:
+        total = 0
+        for ntype in g.ntypes:
+            for value in g.nodes[ntype].data.values():
+                if not self.spill.is_spilled(value):
+                    total += value.numel() * value.element_size()
+        return total
+
+    def update(self, g) -> None:
+        self.peak = max(self.peak, self.live_bytes(g))
+
+    def report(self, hop: int) -> None:
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1 << 20)
+        print(
+            f'[hg_propagate] hop={hop} peak_node_data={self.peak / (1 << 30):.2f}GB '
+            f'spilled={self.spill.spilled_bytes / (1 << 30):.2f}GB max_rss={max_rss:.2f}GB',
+            flush=True,
+        )
+        self.peak = 0
+
+
+def restore_key_order(g, ntype: str, order: List[str]) -> None:
+    """Re-insert ``ntype`` keys in ``order`` so callers see the original creation order."""
+    data = g.nodes[ntype].data
+    for key in [k for k in order if k in data]:
+        data[key] = data.pop(key)
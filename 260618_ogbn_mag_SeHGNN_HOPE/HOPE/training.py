@@ -166,7 +166,8 @@ def main(args):
                 gsmp_scope=args.gsmp_scope,
                 is_label_propagation=False,
                 args=args,
-                temporal_first_layer_method=args.temporal_first_layer_method)
+                temporal_first_layer_method=args.temporal_first_layer_method,
+                spill_dir=args.prop_spill_dir, report_memory=args.prop_memory_report)
 
             feats = {}
             keys = [k for k in list(g.nodes[tgt_type].data.keys()) if is_metapath_key(k)]
@@ -287,7 +288,8 @@ def main(args):
                     is_label_propagation=True,
                     gsmp_apply_label_prop=args.gsmp_apply_label_prop,
                     args=args,
-                    temporal_first_layer_method=args.temporal_first_layer_method)
+                    temporal_first_layer_method=args.temporal_first_layer_method,
+                    spill_dir=args.prop_spill_dir, report_memory=args.prop_memory_report)
 
                 keys = [k for k in list(g.nodes[tgt_type].data.keys()) if is_metapath_key(k)]
                 print(f'Involved label keys {keys}')
@@ -561,6 +563,10 @@ def parse_args(args=None):
                         help="cache seed-independent feature propagation tensors")
     parser.add_argument("--no-cache-propagation", dest="cache_propagation", action='store_false',
                         help="disable feature propagation cache")
+    parser.add_argument("--prop-spill-dir", type=str, default=None,
+                        help="spill finished metapath features to memory-mapped files under this directory")
+    parser.add_argument("--prop-memory-report", action='store_true', default=False,
+                        help="print peak resident node data per propagation hop")
     parser.add_argument("--progress-file", type=str, default="./results/live_progress.tsv",
                         help="append-only TSV with validation/test progress")
     parser.add_argument("--method-name", type=str, default=None,
@@ -1,5 +1,6 @@
 import os
 import gc
+import sys
 import random
 import hashlib
 from pathlib import Path
@@ -18,6 +19,11 @@ from tqdm import tqdm
 from ogb.nodeproppred import DglNodePropPredDataset, Evaluator
 from tqdm import tqdm
 
+from hop_memory import FeatureSpill, HopMemoryTracker, hop_schedule, restore_key_order
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from temporal_weights import group_counts, temporal_edge_weights, time_groups  # noqa: E402
+
 GSMP_UNKNOWN_TIME = -1
 
 
@@ -205,27 +211,20 @@ def compute_gsmp_edge_weights(new_g, etype, src_time, normalizer="nonempty",
     src, dst = new_g.edges(etype=etype, order="eid")
     src = src.cpu().long()
     dst = dst.cpu().long()
-    edge_time = src_time.cpu().long()[src]
+    src_time = src_time.cpu().long()
 
-    if edge_time.numel() == 0:
+    if src.numel() == 0:
         weights = torch.empty((0,), dtype=torch.float32)
+    elif normalizer == "nonempty":
+        # Every time value, including GSMP_UNKNOWN_TIME, is its own bin.
+        weights = temporal_edge_weights(
+            torch.stack([src, dst]), src_time=src_time, group_by="dst", normalize="row",
+            num_nodes=new_g.num_nodes(dst_type), missing="group")
     else:
-        global_num_bins = max(1, int(torch.unique(src_time.cpu().long()).numel()))
-        unique_time, edge_time_inverse = torch.unique(edge_time, sorted=True, return_inverse=True)
-        num_bins = int(unique_time.numel())
-        pair_code = dst * num_bins + edge_time_inverse.long()
-        unique_pairs, pair_inverse, pair_counts = torch.unique(
-            pair_code, sorted=False, return_inverse=True, return_counts=True)
-
-        count_per_edge = pair_counts[pair_inverse].float()
-        if normalizer == "nonempty":
-            pair_dst = unique_pairs // num_bins
-            nonempty_bins = torch.bincount(
-                pair_dst.long(), minlength=new_g.num_nodes(dst_type)).float()
-            bin_norm = nonempty_bins[dst].clamp_min(1.0)
-        else:
-            bin_norm = torch.full_like(count_per_edge, float(global_num_bins))
-        weights = (1.0 / (bin_norm * count_per_edge)).float()
+        node_bin, num_bins = time_groups(src_time, missing="group")
+        key_range = new_g.num_nodes(dst_type) * num_bins
+        count_per_edge, _ = group_counts(dst * num_bins + node_bin[src], key_range)
+        weights = 1.0 / (float(num_bins) * count_per_edge.float())
 
     if use_cache and cache_path is not None:
         cache_path.parent.mkdir(parents=True, exist_ok=True)
@@ -248,36 +247,14 @@ def compute_smp_edge_weights(new_g, etype, src_time, dst_time, cache_dir=None,
     src, dst = new_g.edges(etype=etype, order="eid")
     src = src.cpu().long()
     dst = dst.cpu().long()
-    src_edge_time = src_time.cpu().long()[src]
-    dst_edge_time = dst_time.cpu().long()[dst]
-
-    if src_edge_time.numel() == 0:
+    if src.numel() == 0:
         weights = torch.empty((0,), dtype=torch.float32)
     else:
-        all_time = torch.cat([src_time.cpu().long(), dst_time.cpu().long()])
-        known_time = all_time[all_time != GSMP_UNKNOWN_TIME]
-        if known_time.numel() == 0:
-            raw = torch.ones(src_edge_time.numel(), dtype=torch.float32)
-        else:
-            t_min = int(known_time.min().item())
-            t_max = int(known_time.max().item())
-            valid = (src_edge_time != GSMP_UNKNOWN_TIME) & (dst_edge_time != GSMP_UNKNOWN_TIME)
-            raw = torch.ones(src_edge_time.numel(), dtype=torch.float32)
-            if int(valid.sum().item()) > 0:
-                src_valid = src_edge_time[valid].float()
-                dst_valid = dst_edge_time[valid].float()
-                delta = torch.abs(src_valid - dst_valid)
-                radius = torch.minimum(dst_valid - float(t_min), float(t_max) - dst_valid)
-                single = (delta == 0) | (delta > radius)
-                raw[valid] = torch.where(
-                    single,
-                    torch.full_like(src_valid, 2.0, dtype=torch.float32),
-                    torch.ones_like(src_valid, dtype=torch.float32),
-                )
-
-        denom = torch.zeros(new_g.num_nodes(dst_type), dtype=torch.float32)
-        denom.scatter_add_(0, dst.long(), raw)
-        weights = raw / denom[dst].clamp_min(1e-12)
+        # GSMP_UNKNOWN_TIME (-1) counts as missing, so those edges keep raw weight 1.
+        weights = temporal_edge_weights(
+            torch.stack([src, dst]), scheme="smp", group_by="dst", normalize="row",
+            src_time=src_time.cpu().long(), dst_time=dst_time.cpu().long(),
+            num_nodes=new_g.num_nodes(dst_type), missing="unit", single_on_equal=True)
 
     if use_cache and cache_path is not None:
         cache_path.parent.mkdir(parents=True, exist_ok=True)
@@ -338,53 +315,62 @@ def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False
                  gsmp_first_layer=False, gsmp_time_dict=None,
                  gsmp_normalizer="nonempty", gsmp_scope="paper-stack",
                  is_label_propagation=False, gsmp_apply_label_prop=False, args=None,
-                 temporal_first_layer_method="gsmp"):
+                 temporal_first_layer_method="gsmp", spill_dir=None, report_memory=False):
+    # Updates run grouped by source key so each key is dropped right after its
+    # last etype; with spill_dir, finished target features move to memmaps.
+    spill = FeatureSpill(spill_dir)
+    memory = HopMemoryTracker(spill) if report_memory else None
+    tgt_order = list(new_g.nodes[tgt_type].data.keys())
     for hop in range(1, max_hops):
         reserve_heads = [ele[:hop] for ele in extra_metapath if len(ele) > hop]
-        for etype in new_g.etypes:
-            stype, _, dtype = new_g.to_canonical_etype(etype)
-
-            for k in list(new_g.nodes[stype].data.keys()):
-                if len(k) == hop:
-                    current_dst_name = f'{dtype}{k}'
-                    if (hop == num_hops and dtype != tgt_type and k not in reserve_heads) \
-                      or (hop > num_hops and k not in reserve_heads):
-                        continue
-                    if echo: print(k, etype, current_dst_name)
-                    use_gsmp = should_use_gsmp_update(
-                        gsmp_first_layer, gsmp_scope, hop, tgt_type, stype, dtype,
-                        is_label_propagation=is_label_propagation,
-                        gsmp_apply_label_prop=gsmp_apply_label_prop)
-                    if use_gsmp:
-                        if gsmp_time_dict is None or stype not in gsmp_time_dict:
-                            raise RuntimeError(f"Missing GSMP time tensor for source node type {stype}.")
-                        if temporal_first_layer_method == "smp" and dtype not in gsmp_time_dict:
-                            raise RuntimeError(f"Missing SMP time tensor for destination node type {dtype}.")
-                        if args is None:
-                            class _Args:
-                                pass
-                            args = _Args()
-                            args.gsmp_normalizer = gsmp_normalizer
-                            args.temporal_first_layer_method = temporal_first_layer_method
-                        else:
-                            args.temporal_first_layer_method = temporal_first_layer_method
-                        method_name = temporal_first_layer_method.upper()
-                        print(
-                            f"{method_name} {gsmp_scope} update etype={etype} src={stype} dst={dtype} "
-                            f"key={k} out={current_dst_name} normalizer={gsmp_normalizer}",
-                            flush=True,
-                        )
-                        temporal_update_all(
-                            new_g, etype, k, current_dst_name, gsmp_time_dict[stype], args,
-                            dst_time=gsmp_time_dict.get(dtype))
+        schedule, created = hop_schedule(new_g, hop, num_hops, tgt_type, reserve_heads)
+        tgt_order += [k for dtype, k in created if dtype == tgt_type]
+        for (stype, k), updates in schedule:
+            for etype, dtype, current_dst_name in updates:
+                if echo: print(k, etype, current_dst_name)
+                use_gsmp = should_use_gsmp_update(
+                    gsmp_first_layer, gsmp_scope, hop, tgt_type, stype, dtype,
+                    is_label_propagation=is_label_propagation,
+                    gsmp_apply_label_prop=gsmp_apply_label_prop)
+                if use_gsmp:
+                    if gsmp_time_dict is None or stype not in gsmp_time_dict:
+                        raise RuntimeError(f"Missing GSMP time tensor for source node type {stype}.")
+                    if temporal_first_layer_method == "smp" and dtype not in gsmp_time_dict:
+                        raise RuntimeError(f"Missing SMP time tensor for destination node type {dtype}.")
+                    if args is None:
+                        class _Args:
+                            pass
+                        args = _Args()
+                        args.gsmp_normalizer = gsmp_normalizer
+                        args.temporal_first_layer_method = temporal_first_layer_method
                     else:
-                        new_g[etype].update_all(
-                            fn.copy_u(k, 'm'),
-                            fn.mean('m', current_dst_name), etype=etype)
+                        args.temporal_first_layer_method = temporal_first_layer_method
+                    method_name = temporal_first_layer_method.upper()
+                    print(
+                        f"{method_name} {gsmp_scope} update etype={etype} src={stype} dst={dtype} "
+                        f"key={k} out={current_dst_name} normalizer={gsmp_normalizer}",
+                        flush=True,
+                    )
+                    temporal_update_all(
+                        new_g, etype, k, current_dst_name, gsmp_time_dict[stype], args,
+                        dst_time=gsmp_time_dict.get(dtype))
+                else:
+                    new_g[etype].update_all(
+                        fn.copy_u(k, 'm'),
+                        fn.mean('m', current_dst_name), etype=etype)
+                if dtype == tgt_type and hop + 1 == max_hops:
+                    spill.offload_key(new_g, dtype, current_dst_name)
+                if memory is not None: memory.update(new_g)
+            if stype != tgt_type:
+                new_g.nodes[stype].data.pop(k)
 
         # remove no-use items
         for ntype in new_g.ntypes:
-            if ntype == tgt_type: continue
+            if ntype == tgt_type:
+                for k in list(new_g.nodes[ntype].data.keys()):
+                    if is_metapath_key(k) and 1 < len(k) <= hop:
+                        spill.offload_key(new_g, ntype, k)
+                continue
             removes = []
             for k in new_g.nodes[ntype].data.keys():
                 if len(k) <= hop:
@@ -393,6 +379,7 @@ def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False
                 new_g.nodes[ntype].data.pop(k)
             if echo and len(removes): print('remove', removes)
         gc.collect()
+        if memory is not None: memory.report(hop)
 
         if echo: print(f'-- hop={hop} ---')
         for ntype in new_g.ntypes:
@@ -400,6 +387,8 @@ def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False
                 if echo: print(f'{ntype} {k} {v.shape}')
         if echo: print(f'------\n')
 
+    restore_key_order(new_g, tgt_type, tgt_order)
+    spill.close()
     return new_g
 
 
@@ -16,6 +16,7 @@ from tqdm import tqdm
 from ogb.nodeproppred import DglNodePropPredDataset, Evaluator
 from tqdm import tqdm
 
+from hop_memory import FeatureSpill, HopMemoryTracker, hop_schedule, restore_key_order
 from impact import should_apply_impact, weighted_mean_update_all
 
 
@@ -39,31 +40,40 @@ def get_n_params(model):
 
 
 def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False,
-                 impact_config=None, impact_scope='feature'):
+                 impact_config=None, impact_scope='feature', spill_dir=None, report_memory=False):
+    # Updates run grouped by source key so each key is dropped right after its
+    # last etype; with spill_dir, finished target features move to memmaps.
+    spill = FeatureSpill(spill_dir)
+    memory = HopMemoryTracker(spill) if report_memory else None
+    tgt_order = list(new_g.nodes[tgt_type].data.keys())
     for hop in range(1, max_hops):
         reserve_heads = [ele[:hop] for ele in extra_metapath if len(ele) > hop]
-        for etype in new_g.etypes:
-            stype, _, dtype = new_g.to_canonical_etype(etype)
-
-            for k in list(new_g.nodes[stype].data.keys()):
-                if len(k) == hop:
-                    current_dst_name = f'{dtype}{k}'
-                    if (hop == num_hops and dtype != tgt_type and k not in reserve_heads) \
-                      or (hop > num_hops and k not in reserve_heads):
-                        continue
-                    if echo: print(k, etype, current_dst_name)
-                    if should_apply_impact(impact_config, impact_scope, hop, stype, dtype):
-                        weighted_mean_update_all(
-                            new_g, etype, k, current_dst_name,
-                            impact_config, impact_scope, hop)
-                    else:
-                        new_g[etype].update_all(
-                            fn.copy_u(k, 'm'),
-                            fn.mean('m', current_dst_name), etype=etype)
+        schedule, created = hop_schedule(new_g, hop, num_hops, tgt_type, reserve_heads)
+        tgt_order += [k for dtype, k in created if dtype == tgt_type]
+        for (stype, k), updates in schedule:
+            for etype, dtype, current_dst_name in updates:
+                if echo: print(k, etype, current_dst_name)
+                if should_apply_impact(impact_config, impact_scope, hop, stype, dtype):
+                    weighted_mean_update_all(
+                        new_g, etype, k, current_dst_name,
+                        impact_config, impact_scope, hop)
+                else:
+                    new_g[etype].update_all(
+                        fn.copy_u(k, 'm'),
+                        fn.mean('m', current_dst_name), etype=etype)
+                if dtype == tgt_type and hop + 1 == max_hops:
+                    spill.offload_key(new_g, dtype, current_dst_name)
+                if memory is not None: memory.update(new_g)
+            if stype != tgt_type:
+                new_g.nodes[stype].data.pop(k)
 
         # remove no-use items
         for ntype in new_g.ntypes:
-            if ntype == tgt_type: continue
+            if ntype == tgt_type:
+                for k in list(new_g.nodes[ntype].data.keys()):
+                    if 1 < len(k) <= hop:
+                        spill.offload_key(new_g, ntype, k)
+                continue
             removes = []
             for k in new_g.nodes[ntype].data.keys():
                 if len(k) <= hop:
@@ -72,6 +82,7 @@ def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False
                 new_g.nodes[ntype].data.pop(k)
             if echo and len(removes): print('remove', removes)
         gc.collect()
+        if memory is not None: memory.report(hop)
 
         if echo: print(f'-- hop={hop} ---')
         for ntype in new_g.ntypes:
@@ -79,6 +90,8 @@ def hg_propagate(new_g, tgt_type, num_hops, max_hops, extra_metapath, echo=False
                 if echo: print(f'{ntype} {k} {v.shape}')
         if echo: print(f'------\n')
 
+    restore_key_order(new_g, tgt_type, tgt_order)
+    spill.close()
     return new_g
 
 
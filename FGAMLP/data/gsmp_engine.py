@@ -0,0 +1,191 @@
+"""Out-of-core GSMP edge weights for ogbn-papers100M.
+
+The per-source loop in ``preprocess_GSMP_papers100m.py`` scanned ``row == src``
+for every node, which is O(N * E) per worker.  This module computes the same
+weights as ``gsmp.compute_gsmp_edge_weights`` from a CSR ordering of the edge
+list instead: edges are grouped by their anchor node (source for the forward
+variant, target for the ``rev`` variant), and contiguous node blocks holding at
+most ``chunk_edges`` edges are processed one at a time.  The edge arrays may be
+``np.memmap`` views, so peak memory is bounded by the block size plus a few
+``num_nodes``-sized vectors.
+"""
+import os
+from typing import Optional, Tuple
+
+import numpy as np
+import torch
+from torch import Tensor
+
+
+DEFAULT_CHUNK_EDGES = 50_000_000
+
+
+def _valid_time_mask(time: Tensor) -> Tensor:
+    if time.is_floating_point():
+        return torch.isfinite(time) & (time >= 0)
+    return time >= 0
+
+
+def save_edge_memmap(row, col, prefix: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Write ``row``/``col`` to ``{prefix}_row.npy``/``{prefix}_col.npy`` and reopen them memory-mapped.
+
+    Existing files are reused only when their shape and dtype match ``row``/``col``;
+    a file left behind by another graph or index dtype is rewritten.
+    """
+    paths = (f"{prefix}_row.npy", f"{prefix}_col.npy")
+    for path, values in zip(paths, (row, col)):
+        if isinstance(values, Tensor):
+            values = values.numpy()
+        values = np.asarray(values)
+        if os.path.isfile(path):
+            stored = np.load(path, mmap_mode="r")
+            if stored.shape == values.shape and stored.dtype == values.dtype:
+                continue
+            del stored
+        np.save(path, values)
+    return tuple(np.load(path, mmap_mode="r") for path in paths)
+
+
+def _iter_slices(num_edges: int, chunk_edges: int):
+    for start in range(0, num_edges, chunk_edges):
+        yield start, min(start + chunk_edges, num_edges)
+
+
+def build_indptr(keys, num_nodes: int, chunk_edges: int = DEFAULT_CHUNK_EDGES) -> Tuple[np.ndarray, bool]:
+    """Return the CSR ``indptr`` of ``keys`` and whether ``keys`` is already non-decreasing."""
+    counts = np.zeros(num_nodes, dtype=np.int64)
+    is_sorted = True
+    last = None
+    for start, end in _iter_slices(len(keys), chunk_edges):
+        block = np.asarray(keys[start:end], dtype=np.int64)
+        counts += np.bincount(block, minlength=num_nodes)
+        if is_sorted and block.size > 0:
+            if (last is not None and block[0] < last) or np.any(block[1:] < block[:-1]):
+                is_sorted = False
+            last = block[-1]
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    return indptr, is_sorted
+
+
+def counting_sort_perm(
+    keys,
+    indptr: np.ndarray,
+    chunk_edges: int = DEFAULT_CHUNK_EDGES,
+    out: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Stable counting sort of ``keys`` in bounded chunks.
+
+    ``perm[indptr[v]:indptr[v + 1]]`` lists the edge ids anchored at ``v`` in
+    their original order, which keeps the per-node summation order identical to
+    ``gsmp.compute_gsmp_edge_weights``.  ``out`` may be a writable memmap.
+    """
+    num_edges = len(keys)
+    perm = np.empty(num_edges, dtype=np.int64) if out is None else out
+    fill = indptr[:-1].copy()
+    for start, end in _iter_slices(num_edges, chunk_edges):
+        block = np.asarray(keys[start:end], dtype=np.int64)
+        order = np.argsort(block, kind="stable")
+        sorted_keys = block[order]
+        first = np.searchsorted(sorted_keys, sorted_keys, side="left")
+        rank = np.arange(sorted_keys.size, dtype=np.int64) - first
+        perm[fill[sorted_keys] + rank] = order + start
+        fill += np.bincount(block, minlength=fill.size)
+    return perm
+
+
+def _node_blocks(indptr: np.ndarray, chunk_edges: int):
+    num_nodes = indptr.size - 1
+    node_start = 0
+    while node_start < num_nodes:
+        limit = indptr[node_start] + chunk_edges
+        node_end = int(np.searchsorted(indptr, limit, side="right")) - 1
+        node_end = min(max(node_end, node_start + 1), num_nodes)
+        yield node_start, node_end
+        node_start = node_end
+
+
+def _block_weights(anchor: Tensor, other_time: Tensor, num_block_nodes: int) -> Tensor:
+    # Same arithmetic, in the same order, as gsmp.compute_gsmp_edge_weights.
+    edge_b = torch.ones(anchor.numel(), dtype=torch.float32)
+    valid = _valid_time_mask(other_time)
+    if valid.any():
+        valid_pos = torch.where(valid)[0]
+        _, time_group = torch.unique(other_time[valid_pos], sorted=True, return_inverse=True)
+        num_time_groups = int(time_group.max().item()) + 1
+        pair_key = anchor[valid_pos] * num_time_groups + time_group
+        _, inverse, counts = torch.unique(pair_key, sorted=False, return_inverse=True, return_counts=True)
+        edge_b[valid_pos] = 1.0 / counts[inverse].to(torch.float32).clamp(min=1)
+
+    outgoing_count = torch.bincount(anchor, minlength=num_block_nodes).to(torch.float32)
+    b_sum = torch.zeros(num_block_nodes, dtype=torch.float32)
+    b_sum.scatter_add_(0, anchor, edge_b)
+    mu = torch.zeros_like(b_sum)
+    has_outgoing = outgoing_count > 0
+    mu[has_outgoing] = b_sum[has_outgoing] / outgoing_count[has_outgoing]
+    return edge_b / mu[anchor].clamp(min=1e-12)
+
+
+def compute_gsmp_edge_weights_ooc(
+    row,
+    col,
+    node_time: Tensor,
+    num_nodes: int,
+    group_by: str = "src",
+    chunk_edges: int = DEFAULT_CHUNK_EDGES,
+    out: Optional[np.ndarray] = None,
+    perm_path: Optional[str] = None,
+) -> np.ndarray:
+    """Compute GSMP edge weights block by block over a (memory-mapped) edge list.
+
+    Args:
+        row, col: 1-D integer arrays (``np.ndarray``/``np.memmap``) holding the
+            source and target of every edge.
+        node_time: Tensor [num_nodes] with the timestamp of every node.
+        num_nodes: Number of nodes.
+        group_by: ``"src"`` groups the edges of each source by target time,
+            exactly like ``gsmp.compute_gsmp_edge_weights``; ``"dst"`` groups
+            the edges of each target by source time (the ``rev`` variant).
+        chunk_edges: Upper bound on the edges held in memory per block.  A
+            single node with more edges than this forms its own block.
+        out: Optional float32 array/memmap of length ``num_edges`` to fill.
+        perm_path: If the anchor column is not sorted, the counting-sort
+            permutation is written to this ``.npy`` memmap instead of RAM.
+
+    Returns:
+        float32 array [num_edges] with GSMP weights in the input edge order.
+    """
+    if group_by not in {"src", "dst"}:
+        raise ValueError(f"group_by must be 'src' or 'dst', got {group_by!r}")
+    anchor_arr, other_arr = (row, col) if group_by == "src" else (col, row)
+    num_edges = len(anchor_arr)
+    if out is None:
+        out = np.empty(num_edges, dtype=np.float32)
+    if num_edges == 0:
+        return out
+
+    node_time = node_time.view(-1).cpu()
+    indptr, is_sorted = build_indptr(anchor_arr, num_nodes, chunk_edges)
+    perm = None
+    if not is_sorted:
+        perm_out = None
+        if perm_path is not None:
+            perm_out = np.lib.format.open_memmap(perm_path, mode="w+", dtype=np.int64, shape=(num_edges,))
+        perm = counting_sort_perm(anchor_arr, indptr, chunk_edges, out=perm_out)
+
+    for node_start, node_end in _node_blocks(indptr, chunk_edges):
+        edge_start, edge_end = int(indptr[node_start]), int(indptr[node_end])
+        if edge_start == edge_end:
+            continue
+        if perm is None:
+            edge_ids = slice(edge_start, edge_end)
+            anchor = np.asarray(anchor_arr[edge_ids], dtype=np.int64)
+            other = np.asarray(other_arr[edge_ids], dtype=np.int64)
+        else:
+            edge_ids = np.asarray(perm[edge_start:edge_end])
+            anchor = np.asarray(anchor_arr[edge_ids], dtype=np.int64)
+            other = np.asarray(other_arr[edge_ids], dtype=np.int64)
+        anchor = torch.from_numpy(anchor) - node_start
+        other_time = node_time[torch.from_numpy(other)]
+        out[edge_ids] = _block_weights(anchor, other_time, node_end - node_start).numpy()
+    return out
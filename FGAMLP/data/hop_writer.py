@@ -0,0 +1,116 @@
+"""Row-block streaming propagation for ogbn-papers100M.
+
+``x = adj @ x`` on the full 111M-row matrix plus ``np.concatenate`` of the
+train/valid/test rows keeps several N x D copies alive per hop.  Here every hop
+is written block by block into a preallocated ``.npy`` memmap and the next hop
+reads the previous one back from disk.  Within a block, the previous hop's
+neighbor rows are gathered at most ``gather_rows`` at a time, so the resident
+set is bounded by ``(block_rows + gather_rows) x D`` floats (plus the rows
+gathered for the split), not by N x D x hops.
+
+Typical use inside a preprocess script::
+
+    rows = split_rows(train_idx, valid_idx, test_idx)
+    for hop, saved in iter_propagated_hops(adj, x, args.num_hops, rows, args.hop_work_dir):
+        torch.save(torch.from_numpy(saved).to(torch.float), f'{prefix}_{hop}.pt')
+"""
+import os
+import os.path as osp
+import time
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+import scipy.sparse as sp
+
+
+DEFAULT_BLOCK_ROWS = 1_000_000
+DEFAULT_GATHER_ROWS = 1_000_000
+
+
+def split_rows(*indices) -> np.ndarray:
+    """Concatenate split index tensors/arrays in the order the training scripts expect."""
+    return np.concatenate([np.asarray(idx, dtype=np.int64).reshape(-1) for idx in indices])
+
+
+def _hop_path(work_dir: str, hop: int) -> str:
+    return osp.join(work_dir, f"hop_{hop}.npy")
+
+
+def _propagate_block(adj_block: sp.csr_matrix, prev: np.ndarray, gather_rows: int = DEFAULT_GATHER_ROWS) -> np.ndarray:
+    # Gather only the neighbor rows this block touches; works for float16 memmaps too.
+    # A block can touch up to every row of ``prev``, so the distinct neighbors are
+    # gathered in chunks of at most ``gather_rows`` rows and their products summed.
+    cols, local = np.unique(adj_block.indices, return_inverse=True)
+    local_adj = sp.csr_matrix(
+        (adj_block.data.astype(np.float32, copy=False), local.reshape(-1), adj_block.indptr),
+        shape=(adj_block.shape[0], cols.size),
+    )
+    if cols.size <= gather_rows:
+        return local_adj @ np.asarray(prev[cols], dtype=np.float32)
+    local_adj = local_adj.tocsc()
+    out = np.zeros((adj_block.shape[0], prev.shape[1]), dtype=np.float32)
+    for lo in range(0, cols.size, gather_rows):
+        hi = min(lo + gather_rows, cols.size)
+        out += local_adj[:, lo:hi] @ np.asarray(prev[cols[lo:hi]], dtype=np.float32)
+    return out
+
+
+def propagate_hop_to_memmap(
+    adj: sp.csr_matrix,
+    prev: np.ndarray,
+    out_path: str,
+    dtype=np.float32,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    gather_rows: int = DEFAULT_GATHER_ROWS,
+) -> np.ndarray:
+    """Write ``adj @ prev`` into a new ``.npy`` memmap one row block at a time."""
+    num_rows = adj.shape[0]
+    out = np.lib.format.open_memmap(out_path, mode="w+", dtype=dtype, shape=(num_rows, prev.shape[1]))
+    for start in range(0, num_rows, block_rows):
+        end = min(start + block_rows, num_rows)
+        out[start:end] = _propagate_block(adj[start:end], prev, gather_rows)
+    out.flush()
+    return out
+
+
+def iter_propagated_hops(
+    adj,
+    x: np.ndarray,
+    num_hops: int,
+    rows: np.ndarray,
+    work_dir: str,
+    dtype=np.float32,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    keep_full_hops: bool = False,
+    gather_rows: int = DEFAULT_GATHER_ROWS,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Yield ``(hop, float32 x_hop[rows])`` for hops ``0..num_hops``.
+
+    ``adj`` may be a scipy CSR matrix or a ``compact_graph.CompactCSR``
+    (both are sliced into row blocks as is); other formats go through ``tocsr()``.
+    ``x`` may itself be a memmap (``np.load(path, mmap_mode='r')``).  Full hop
+    matrices live in ``work_dir/hop_{k}.npy``; only the previous hop is kept
+    unless ``keep_full_hops`` is set.  Each block holds at most ``block_rows``
+    output rows and ``gather_rows`` gathered neighbor rows in memory.
+    """
+    if getattr(adj, "format", None) != "csr":
+        adj = adj.tocsr()
+    os.makedirs(work_dir, exist_ok=True)
+    rows = np.asarray(rows, dtype=np.int64)
+    yield 0, np.asarray(x[rows], dtype=np.float32)
+
+    prev: Optional[np.ndarray] = x
+    for hop in range(1, num_hops + 1):
+        t0 = time.time()
+        out = propagate_hop_to_memmap(
+            adj, prev, _hop_path(work_dir, hop), dtype=dtype, block_rows=block_rows, gather_rows=gather_rows,
+        )
+        if hop > 1 and not keep_full_hops:
+            del prev
+            os.remove(_hop_path(work_dir, hop - 1))
+        prev = out
+        print(f"hop {hop} written to {_hop_path(work_dir, hop)} in {time.time() - t0:.1f}s", flush=True)
+        yield hop, np.asarray(out[rows], dtype=np.float32)
+    del prev
+    if num_hops > 0 and not keep_full_hops:
+        os.remove(_hop_path(work_dir, num_hops))
@@ -7,57 +7,13 @@ from torch_sparse import SparseTensor
 from torch_geometric.utils import to_undirected, dropout_adj
 import os
 import os.path as osp
+import sys
 import time
 from ogb.nodeproppred import PygNodePropPredDataset
-from multiprocessing import Pool, Array, Manager
-import multiprocessing
-
-core_num=multiprocessing.cpu_count()
-
-
-
-def compute_edge_weights_chunk(args):
-    paper_year, row, col, dst_start, dst_end, num_nodes = args
-    import numpy as np
-    # Build CSC index for the chunk
-    edge_weights = np.zeros(np.sum((col >= dst_start) & (col < dst_end)), dtype=np.float32)
-    offset = 0
-    for dst in range(dst_start, dst_end):
-        mask = (col == dst)
-        srcs = row[mask]
-        if len(srcs) == 0:
-            continue
-        src_years = paper_year[srcs]
-        year_counts = np.bincount(src_years, minlength=2024)
-        local_weights = np.zeros(len(srcs), dtype=np.float32)
-        for idx, src in enumerate(srcs):
-            year = paper_year[src].item()
-            local_weights[idx] = 1.0 / (year_counts[year] if year_counts[year] > 0 else 1)
-        mean_val = np.mean(local_weights)
-        if mean_val > 0:
-            local_weights = local_weights / mean_val
-        edge_weights[offset:offset+len(srcs)] = local_weights
-        offset += len(srcs)
-    return edge_weights
-
-def parallel_compute(edge_weight, paper_year, row, col, num_nodes, num_workers=48):
-    import numpy as np
-    import multiprocessing
-    chunk_size = (num_nodes + num_workers - 1) // num_workers
-    args_list = []
-    for i in range(num_workers):
-        dst_start = i * chunk_size
-        dst_end = min((i + 1) * chunk_size, num_nodes)
-        if dst_start >= dst_end:
-            continue
-        args_list.append((paper_year, row, col, dst_start, dst_end, num_nodes))
-    with multiprocessing.Pool(processes=num_workers) as pool:
-        results = pool.map(compute_edge_weights_chunk, args_list)
-    edge_weights = np.concatenate(results)
-    edge_weight[:] = torch.from_numpy(edge_weights)
-
-
-
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), '..', '..'))
+from hop_writer import iter_propagated_hops, split_rows
+from hop_cache import file_source, open_hop_cache
+from gsmp_engine import compute_gsmp_edge_weights_ooc, save_edge_memmap
 
 
 
@@ -69,7 +25,13 @@ parser = argparse.ArgumentParser()
 parser.add_argument('--num_hops', type=int, default=6)
 parser.add_argument('--root', type=str, default='./')
 parser.add_argument('--pretrained_emb_path', type=str, default=None)
+parser.add_argument('--gsmp_chunk_edges', type=int, default=50_000_000)
 parser.add_argument('--output_emb_prefix', type=str, default='./ogbn-papers100M-gsmp_rev.node-emb')
+parser.add_argument('--hop_work_dir', type=str, default=None)
+parser.add_argument('--hop_block_rows', type=int, default=1_000_000)
+parser.add_argument('--hop_dtype', type=str, default='float32', choices=['float32', 'float16'])
+parser.add_argument('--hop_cache_dir', type=str, default=None)
+parser.add_argument('--hop_cache_max_gb', type=float, default=0.0)
 args = parser.parse_args()
 print(args)
 
@@ -88,7 +50,7 @@ x = None
 print(f"pretrained_emb_path : {args.pretrained_emb_path}")
 
 if len(args.pretrained_emb_path)>4: 
-    x = np.load(args.pretrained_emb_path)
+    x = np.load(args.pretrained_emb_path, mmap_mode='r')
 else:
     x = data.x.numpy()
 N = data.num_nodes
@@ -107,26 +69,33 @@ row, col = data.edge_index
 print('Computing adj...')
 
 if not os.path.isfile("./gsmp_rev_edge_weight.pt"):
-    edge_weight=torch.zeros(len(row))
-    print(f"len edge_weight: {edge_weight.shape}")
-    print(f"edge_weight.dtype: {edge_weight.dtype}")
-
-    nums=torch.load("./num_year.pt")
-    # delta_matrix=[[0]*2024 for _ in range(2024)]
-    # for i in range(2024):
-    #     for j in range(2024):
-    #         delta_matrix[i][abs(j-i)]+=nums[j]
-
-    test_time=2019
-    # 4:37 AM begin (minimum 270G required)
-    parallel_compute(edge_weight, paper_year, row, col, N, num_workers=48)
-    # 5:23 AM finish
+    # Sort/CSR engine over a memory-mapped edge list (replaces the 48-process per-source scan, ~270G).
+    row_mm, col_mm = save_edge_memmap(row, col, './graph/undirected_edges')
+    t0=time.time()
+    edge_weight = compute_gsmp_edge_weights_ooc(
+        row_mm, col_mm, paper_year, N, group_by='dst',
+        chunk_edges=args.gsmp_chunk_edges, perm_path='./graph/gsmp_rev_perm.npy')
+    edge_weight = torch.from_numpy(edge_weight)
+    print(f"len edge_weight: {edge_weight.shape}, {time.time()-t0:.1f}s")
 
     torch.save(edge_weight,"./gsmp_rev_edge_weight.pt")
 else:
     edge_weight=torch.load("./gsmp_rev_edge_weight.pt")
 
 
+# Shared content-addressed hop cache: skip propagation for an already seen configuration.
+hop_cache = open_hop_cache(args.hop_cache_dir, args.hop_cache_max_gb)
+if hop_cache is not None:
+    cache_key = hop_cache.key(graph=(row, col), edge_weight=edge_weight, norm='sym',
+                              features=file_source(args.pretrained_emb_path) if len(args.pretrained_emb_path)>4 else 'ogbn-papers100M:x',
+                              rows=(train_idx, valid_idx, test_idx), hop_dtype=args.hop_dtype)
+    cached = hop_cache.load(cache_key, range(args.num_hops + 1))
+    if cached is not None:
+        for i, hop_x in enumerate(cached):
+            torch.save(hop_x.to(torch.float), f'{args.output_emb_prefix}_{i}.pt')
+        print(f'Loaded {args.num_hops} hops from hop cache entry {cache_key}')
+        sys.exit(0)
+
 adj = SparseTensor(row=row, col=col, value=edge_weight, sparse_sizes=(N, N))
 adj = adj.set_diag()
 deg = adj.sum(dim=1).to(torch.float)
@@ -140,15 +109,12 @@ adj = adj.to_scipy(layout='csr')
 
 print('Start processing')
 
-saved = np.concatenate((x[train_idx], x[valid_idx], x[test_idx]), axis=0)
-torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_0.pt')
-
-edge_weight=torch.load("gsmp_rev_edge_weight.pt")
-
-
-for i in tqdm(range(args.num_hops)):
-    t0=time.time()
-    x = adj @ x
-    saved = np.concatenate((x[train_idx], x[valid_idx], x[test_idx]), axis=0)
-    torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_{i+1}.pt')
-    print(f"{i}th propagation finished... {time.time()-t0}")
+# Row-block streaming: each hop goes to a memmap under --hop_work_dir and is read back for the next hop.
+rows = split_rows(train_idx, valid_idx, test_idx)
+hop_work_dir = args.hop_work_dir or f'{args.output_emb_prefix}_work'
+hop_iter = iter_propagated_hops(adj, x, args.num_hops, rows, hop_work_dir,
+                                dtype=np.dtype(args.hop_dtype), block_rows=args.hop_block_rows)
+for i, saved in tqdm(hop_iter, total=args.num_hops + 1):
+    torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_{i}.pt')
+    if hop_cache is not None:
+        hop_cache.save_hop(cache_key, i, saved)
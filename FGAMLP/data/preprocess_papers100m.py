@@ -7,8 +7,12 @@ from torch_sparse import SparseTensor
 from torch_geometric.utils import to_undirected, dropout_adj
 import os
 import os.path as osp
+import sys
 
 from ogb.nodeproppred import PygNodePropPredDataset
+sys.path.insert(0, osp.join(osp.dirname(osp.abspath(__file__)), '..', '..'))
+from hop_writer import iter_propagated_hops, split_rows
+from hop_cache import open_hop_cache
 
 
 parser = argparse.ArgumentParser()
@@ -16,6 +20,11 @@ parser.add_argument('--num_hops', type=int, default=6)
 parser.add_argument('--root', type=str, default='./')
 parser.add_argument('--pretrained_emb_path', type=str, default=None)
 parser.add_argument('--output_emb_prefix', type=str, default='./ogbn-papers100M_node-emb_w2v')
+parser.add_argument('--hop_work_dir', type=str, default=None)
+parser.add_argument('--hop_block_rows', type=int, default=1_000_000)
+parser.add_argument('--hop_dtype', type=str, default='float32', choices=['float32', 'float16'])
+parser.add_argument('--hop_cache_dir', type=str, default=None)
+parser.add_argument('--hop_cache_max_gb', type=float, default=0.0)
 args = parser.parse_args()
 print(args)
 
@@ -29,7 +38,7 @@ x = None
 print(f"pretrained_emb_path : {args.pretrained_emb_path}")
 
 if args.pretrained_emb_path is not None:
-    x = np.load(args.pretrained_emb_path)
+    x = np.load(args.pretrained_emb_path, mmap_mode='r')
 else:
     x = data.x.numpy()
 x = data.x.numpy()
@@ -50,6 +59,19 @@ row, col = data.edge_index
 
 print('Computing adj...')
 
+# Shared content-addressed hop cache: skip propagation for an already seen configuration.
+hop_cache = open_hop_cache(args.hop_cache_dir, args.hop_cache_max_gb)
+if hop_cache is not None:
+    cache_key = hop_cache.key(graph=(row, col), edge_weight=None, norm='sym',
+                              features='ogbn-papers100M:x',
+                              rows=(train_idx, valid_idx, test_idx), hop_dtype=args.hop_dtype)
+    cached = hop_cache.load(cache_key, range(args.num_hops + 1))
+    if cached is not None:
+        for i, hop_x in enumerate(cached):
+            torch.save(hop_x.to(torch.float), f'{args.output_emb_prefix}_{i}.pt')
+        print(f'Loaded {args.num_hops} hops from hop cache entry {cache_key}')
+        sys.exit(0)
+
 adj = SparseTensor(row=row, col=col, sparse_sizes=(N, N))
 adj = adj.set_diag()
 deg = adj.sum(dim=1).to(torch.float)
@@ -63,10 +85,12 @@ adj = adj.to_scipy(layout='csr')
 
 print('Start processing')
 
-saved = np.concatenate((x[train_idx], x[valid_idx], x[test_idx]), axis=0)
-torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_0.pt')
-
-for i in tqdm(range(args.num_hops)):
-    x = adj @ x
-    saved = np.concatenate((x[train_idx], x[valid_idx], x[test_idx]), axis=0)
-    torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_{i+1}.pt')
+# Row-block streaming: each hop goes to a memmap under --hop_work_dir and is read back for the next hop.
+rows = split_rows(train_idx, valid_idx, test_idx)
+hop_work_dir = args.hop_work_dir or f'{args.output_emb_prefix}_work'
+hop_iter = iter_propagated_hops(adj, x, args.num_hops, rows, hop_work_dir,
+                                dtype=np.dtype(args.hop_dtype), block_rows=args.hop_block_rows)
+for i, saved in tqdm(hop_iter, total=args.num_hops + 1):
+    torch.save(torch.from_numpy(saved).to(torch.float), f'{args.output_emb_prefix}_{i}.pt')
+    if hop_cache is not None:
+        hop_cache.save_hop(cache_key, i, saved)
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "FGAMLP" / "data"))
+
+from gsmp import compute_gsmp_edge_weights, gsmp_toy_example  # noqa: E402
+from gsmp_engine import compute_gsmp_edge_weights_ooc, save_edge_memmap  # noqa: E402
+
+
+def assert_equal(actual, expected, name):
+    if not torch.equal(actual, expected):
+        raise AssertionError(f"{name}: actual={actual.tolist()} expected={expected.tolist()}")
+
+
+def random_graph(num_nodes=200, num_edges=3000, seed=0):
+    gen = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=gen)
+    node_time = torch.randint(2000, 2010, (num_nodes,), generator=gen)
+    node_time[:5] = -1
+    return edge_index, node_time
+
+
+def test_toy_example_bit_exact():
+    reference, _ = gsmp_toy_example()
+    edge_index = torch.tensor([[0, 0, 0, 0, 0], [1, 2, 3, 4, 5]])
+    node_time = torch.tensor([-1, 2020, 2020, 2020, 2021, 2022])
+    weights = compute_gsmp_edge_weights_ooc(edge_index[0].numpy(), edge_index[1].numpy(), node_time, num_nodes=6)
+    assert_equal(torch.from_numpy(weights), reference, "toy example")
+
+
+def test_unsorted_small_chunks_bit_exact():
+    edge_index, node_time = random_graph()
+    reference = compute_gsmp_edge_weights(edge_index, node_time, num_nodes=200)
+    row, col = edge_index.numpy()
+    weights = compute_gsmp_edge_weights_ooc(row, col, node_time, num_nodes=200, chunk_edges=97)
+    assert_equal(torch.from_numpy(weights), reference, "unsorted src grouping")
+
+
+def test_memmap_dst_grouping_matches_flipped_reference():
+    edge_index, node_time = random_graph(seed=1)
+    reference = compute_gsmp_edge_weights(edge_index.flip(0), node_time, num_nodes=200)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        row, col = save_edge_memmap(edge_index[0], edge_index[1], str(Path(tmpdir) / "edges"))
+        weights = compute_gsmp_edge_weights_ooc(
+            row, col, node_time, num_nodes=200, group_by="dst", chunk_edges=128,
+            perm_path=str(Path(tmpdir) / "perm.npy"),
+        )
+        assert isinstance(row, np.memmap)
+        assert_equal(torch.from_numpy(np.array(weights)), reference, "memmap dst grouping")
+
+
+def test_save_edge_memmap_rewrites_stale_files():
+    edge_index, _ = random_graph(seed=2)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        prefix = str(Path(tmpdir) / "edges")
+        save_edge_memmap(edge_index[0, :10], edge_index[1, :10], prefix)
+        row, col = save_edge_memmap(edge_index[0], edge_index[1], prefix)
+        assert np.array_equal(row, edge_index[0].numpy()) and np.array_equal(col, edge_index[1].numpy())
+        del row, col
+        row32, _ = save_edge_memmap(edge_index[0].int(), edge_index[1].int(), prefix)
+        assert row32.dtype == np.int32 and np.array_equal(row32, edge_index[0].numpy())
+
+
+if __name__ == "__main__":
+    test_toy_example_bit_exact()
+    test_unsorted_small_chunks_bit_exact()
+    test_memmap_dst_grouping_matches_flipped_reference()
+    test_save_edge_memmap_rewrites_stale_files()
+    print("GSMP engine tests passed")
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import scipy.sparse as sp
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "data"))
+
+from hop_writer import _propagate_block, iter_propagated_hops  # noqa: E402
+
+
+def random_adj(num_nodes=300, num_edges=5000, seed=0):
+    rng = np.random.default_rng(seed)
+    src = rng.integers(0, num_nodes, num_edges)
+    dst = rng.integers(0, num_nodes, num_edges)
+    # Duplicate edges are kept so the summed entries are exercised too.
+    return sp.csr_matrix((rng.random(num_edges, dtype=np.float32), (dst, src)), shape=(num_nodes, num_nodes))
+
+
+def test_chunked_gather_matches_full_gather():
+    adj = random_adj()
+    x = np.random.default_rng(1).standard_normal((300, 6)).astype(np.float32)
+    expected = adj @ x
+    for gather_rows in (1, 7, 64, 299, 300, 10_000):
+        got = _propagate_block(adj, x, gather_rows)
+        assert np.allclose(got, expected, atol=1e-5), gather_rows
+    block = adj[40:90]
+    assert np.allclose(_propagate_block(block, x.astype(np.float16), 13), block @ x.astype(np.float16).astype(np.float32), atol=1e-4)
+
+
+def test_iter_propagated_hops_with_small_gather():
+    adj = random_adj(seed=2)
+    x = np.random.default_rng(3).standard_normal((300, 4)).astype(np.float32)
+    rows = np.arange(0, 300, 11)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hops = dict(iter_propagated_hops(adj, x, 2, rows, str(Path(tmpdir) / "hops"), block_rows=50, gather_rows=17))
+    assert np.allclose(hops[2], (adj @ (adj @ x))[rows], atol=1e-4)
+
+
+if __name__ == "__main__":
+    test_chunked_gather_matches_full_gather()
+    test_iter_propagated_hops_with_small_gather()
+    print("hop writer tests passed")
@@ -0,0 +1,67 @@
+# Feature stores for MPLP fold training.
+#
+# ``TensorFeatureStore`` holds every feature group as one float32 tensor on
+# the training device, as ``load_data`` always did.  ``MmapFeatureStore`` keeps
+# each ``.npy`` memory-mapped in its on-disk dtype (the metapath features may
+# be float16) and gathers the rows of a mini-batch on demand: indices are
+# sorted before reading so every batch touches the file pages in order, rows
+# are cast to float32 straight into pinned buffers, and a few threads prepare
+# the next batches while the current one trains.  Fold processes running at
+# the same time then share one copy of the features in the page cache.
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+
+
+class TensorFeatureStore:
+    def __init__(self, tensors):
+        self.tensors = tensors
+
+    def __len__(self):
+        return self.tensors[0].shape[0]
+
+    def batches(self, loader, device=None):
+        """Yield ``(idx, [x[idx] for every feature group])`` for each ``idx`` of ``loader``."""
+        for idx in loader:
+            yield idx, [x[idx].to(torch.float32) for x in self.tensors]
+
+
+class MmapFeatureStore:
+    def __init__(self, paths, num_threads=4, prefetch=4):
+        self.arrays = [np.load(path, mmap_mode='r') for path in paths]
+        self.num_threads = num_threads
+        self.prefetch = prefetch
+
+    def __len__(self):
+        return self.arrays[0].shape[0]
+
+    def gather(self, idx, pin_memory=False):
+        """float32 CPU tensors holding the rows ``idx`` of every feature group."""
+        idx = np.asarray(idx)
+        order = np.argsort(idx, kind='stable')
+        rows = idx[order]
+        out = []
+        for array in self.arrays:
+            x = torch.empty((len(idx),) + array.shape[1:], dtype=torch.float32, pin_memory=pin_memory)
+            x.numpy()[order] = array[rows]
+            out.append(x)
+        return out
+
+    def batches(self, loader, device=None):
+        """Like ``TensorFeatureStore.batches``, with up to ``prefetch`` batches
+        gathered ahead by ``num_threads`` threads and copied to ``device``.
+        """
+        device = torch.device(device or 'cpu')
+        pin_memory = device.type == 'cuda'
+        batches = iter(loader)
+        with ThreadPoolExecutor(self.num_threads) as pool:
+            pending = deque((idx, pool.submit(self.gather, idx, pin_memory))
+                            for idx in itertools.islice(batches, self.prefetch))
+            while pending:
+                idx, future = pending.popleft()
+                for nxt in itertools.islice(batches, 1):
+                    pending.append((nxt, pool.submit(self.gather, nxt, pin_memory)))
+                yield idx, [x.to(device, non_blocking=pin_memory) for x in future.result()]
@@ -4,9 +4,14 @@ import sys
 import os
 import errno
 
+import itertools
+import json
 import random
+import multiprocessing
 import tqdm
-from collections import defaultdict
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
 
 from ogb.lsc import MAG240MDataset
 import numpy as np
@@ -14,6 +19,10 @@ import dgl
 import torch
 import logging
 
+from metapath_expand import MAX_PAIRS, expand_metapath
+from walk_aggregate import (feature_mean, label_distribution, label_shares, mean_features,
+                            topk_feature_mean, topk_label_distribution)
+
 
 logging.basicConfig(
      format= '%(asctime)s %(levelname)s %(module)s : %(message)s',
@@ -42,253 +51,254 @@ def mkdirs(path):
             raise e
 
 
-def calc_randomwalk_label_features(graph, node_ids, metapath, labels, num_classes=153, num_walkers=160, batch_size=1024):
-    res = []
+def _randomwalk_features(aggregate, graph, node_ids, metapath, dim, num_walkers, batch_size, out=None):
+    """Walk ``num_walkers`` times from every node, batch by batch, and reduce the
+    traces with ``aggregate(traces, nids0)`` (see ``walk_aggregate``) into ``out``.
+    """
+    if out is None:
+        out = np.zeros((len(node_ids), dim), dtype=np.float32)
     for i in tqdm.tqdm(range(0, len(node_ids), batch_size)):
         nids0 = np.array(node_ids[i:(i + batch_size)])
         nids = np.repeat(nids0, num_walkers)
         traces, _ = dgl.sampling.random_walk(graph, nids, metapath=metapath)
+        out[i:(i + len(nids0))] = aggregate(traces.numpy(), nids0)
+    return out
 
-        traces = traces[traces[:, 0] != traces[:, -1]]
-        m = defaultdict(list)
-        for sid, *_, did in traces.numpy():
-            if did >= 0:
-                m[sid].append(did)
-        mapper = {i: np.array(j) for i, j in m.items()}
-
-        feat = np.zeros((len(nids0), num_classes), dtype=np.float32)
-        for i, sid in enumerate(nids0):
-            if sid in mapper.keys():
-                dids = mapper[sid]
-                lbs = labels[dids]
-                mask = (dids != sid) & (lbs >= 0)
-                if mask.sum() < 1.0e-6:
-                    feat[i, :] = 1. / num_classes
-                else:
-                    ft = np.zeros((len(dids), num_classes), dtype=np.float32)
-                    ft[mask, lbs[mask].astype(np.int64)] = 1
-                    feat[i, :] = ft.sum(axis=0) / ft.sum()
-            else:
-                feat[i, :] = 1. / num_classes
-        res.append(feat)
-    return np.concatenate(res, axis=0)
-
-
-def calc_randomwalk_feat_features(graph, node_ids, metapath, features, feature_dim=768, num_walkers=160, batch_size=1024):
-    res = []
-    for i in tqdm.tqdm(range(0, len(node_ids), batch_size)):
-        nids0 = np.array(node_ids[i:(i + batch_size)])
-        nids = np.repeat(nids0, num_walkers)
-        traces, _ = dgl.sampling.random_walk(graph, nids, metapath=metapath)
 
-        traces = traces[traces[:, 0] != traces[:, -1]]
-        m = defaultdict(list)
-        for sid, *_, did in traces.numpy():
-            if did >= 0:
-                m[sid].append(did)
-        mapper = {i: np.array(j) for i, j in m.items()}
-
-        feat = np.zeros((len(nids0), feature_dim), dtype=np.float32)
-        for i, sid in enumerate(nids0):
-            if sid in mapper.keys():
-                feat[i, :] = features[mapper[sid]].astype(np.float32).mean(axis=0)
-            else:
-                feat[i, :] = 0
-        res.append(feat)
-    return np.concatenate(res, axis=0)
-
-
-def calc_randomwalk_topk_label_features(graph, node_ids, metapath, labels, num_classes=153, num_walkers=160, topk=10, batch_size=1024):
-    res = []
-    for i in tqdm.tqdm(range(0, len(node_ids), batch_size)):
-        nids0 = np.array(node_ids[i:(i + batch_size)])
-        nids = np.repeat(nids0, num_walkers)
-        traces, _ = dgl.sampling.random_walk(graph, nids, metapath=metapath)
+def calc_randomwalk_label_features(graph, node_ids, metapath, labels, num_classes=153, num_walkers=160, batch_size=1024, out=None):
+    aggregate = partial(label_distribution, labels=labels, num_classes=num_classes)
+    return _randomwalk_features(aggregate, graph, node_ids, metapath, num_classes, num_walkers, batch_size, out)
+
+
+def calc_randomwalk_feat_features(graph, node_ids, metapath, features, feature_dim=768, num_walkers=160, batch_size=1024, out=None):
+    aggregate = partial(feature_mean, features=features)
+    return _randomwalk_features(aggregate, graph, node_ids, metapath, feature_dim, num_walkers, batch_size, out)
+
+
+def calc_randomwalk_topk_label_features(graph, node_ids, metapath, labels, num_classes=153, num_walkers=160, topk=10, batch_size=1024, out=None):
+    aggregate = partial(topk_label_distribution, labels=labels, num_classes=num_classes, topk=topk)
+    return _randomwalk_features(aggregate, graph, node_ids, metapath, num_classes, num_walkers, batch_size, out)
+
+
+def calc_randomwalk_topk_feat_features(graph, node_ids, metapath, features, feature_dim=768, num_walkers=160, topk=10, batch_size=1024, out=None):
+    aggregate = partial(topk_feature_mean, features=features, topk=topk)
+    return _randomwalk_features(aggregate, graph, node_ids, metapath, feature_dim, num_walkers, batch_size, out)
+
 
-        traces = traces[traces[:, 0] != traces[:, -1]]
-        m = defaultdict(list)
-        for sid, *_, did in traces.numpy():
-            if did >= 0:
-                m[sid].append(did)
-        mapper = {i: np.array(j) for i, j in m.items()}
-
-        feat = np.zeros((len(nids0), num_classes), dtype=np.float32)
-        for i, sid in enumerate(nids0):
-            if sid in mapper.keys():
-                dids = mapper[sid]
-                dids, cnts = np.unique(dids, return_counts=True)
-                itk = np.argsort(cnts)[-topk:]
-                dids, cnts = dids[itk], cnts[itk]
-                lbs = labels[dids]
-                mask = (dids != sid) & (lbs >= 0)
-                if mask.sum() < 1.0e-6:
-                    feat[i, :] = 1. / num_classes
-                else:
-                    ft = np.zeros((len(dids), num_classes), dtype=np.float32)
-                    ft[mask, lbs[mask].astype(np.int64)] = 1
-                    ft *= cnts.reshape((-1, 1))
-                    feat[i, :] = ft.sum(axis=0) / cnts.sum()
-            else:
-                feat[i, :] = 1. / num_classes
-        res.append(feat)
-    return np.concatenate(res, axis=0)
-
-
-def calc_randomwalk_topk_feat_features(graph, node_ids, metapath, features, feature_dim=768, num_walkers=160, topk=10, batch_size=1024):
-    res = []
+def metapath_csrs(graph, metapath):
+    """``(indptr, indices)`` arrays of every edge type on ``metapath``."""
+    return [tuple(t.numpy() for t in graph.adj_sparse('csr', etype=mp)[:2]) for mp in metapath]
+
+
+def _neighborsample_features(reduce, graph, node_ids, metapath, dim, batch_size, out=None, **expand_kwargs):
+    """Expand ``metapath`` from ``batch_size`` nodes at a time and reduce the
+    reached ``(group, nids, mult)`` with ``reduce`` into ``out``.
+    """
+    csrs = metapath_csrs(graph, metapath)
+    node_ids = np.asarray(node_ids)
+    if out is None:
+        out = np.zeros((len(node_ids), dim), dtype=np.float32)
     for i in tqdm.tqdm(range(0, len(node_ids), batch_size)):
-        nids0 = np.array(node_ids[i:(i + batch_size)])
-        nids = np.repeat(nids0, num_walkers)
-        traces, _ = dgl.sampling.random_walk(graph, nids, metapath=metapath)
+        nids0 = node_ids[i:(i + batch_size)]
+        group, nids, mult = expand_metapath(csrs, nids0, **expand_kwargs)
+        out[i:(i + len(nids0))] = reduce(group, nids, mult, len(nids0))
+    return out
+
+
+def _check_filter(metapath, ftype, num_common):
+    if ftype not in {'least', 'common'}:
+        raise ValueError("Unknown ftype: %r, only support 'least' and 'common'" % ftype)
+    if len(metapath) != 2:
+        raise ValueError("metapath should with length 2: %r" % metapath)
+    # 'least' keeps the paths through one middle node, so its targets count with multiplicity.
+    return dict(least=True) if ftype == 'least' else dict(min_mult=num_common)
+
+
+def calc_neighborsample_label_features(graph, node_ids, metapath, labels, num_classes=153, batch_size=4096, out=None):
+    def reduce(group, nids, mult, n):
+        return label_shares(group, nids, n, labels, num_classes)
+    return _neighborsample_features(reduce, graph, node_ids, metapath, num_classes, batch_size, out)
+
+
+def calc_neighborsample_feat_features(graph, node_ids, metapath, features, feature_dim=768, batch_size=4096, out=None):
+    def reduce(group, nids, mult, n):
+        return mean_features(group, nids, n, features)
+    return _neighborsample_features(reduce, graph, node_ids, metapath, feature_dim, batch_size, out)
 
-        traces = traces[traces[:, 0] != traces[:, -1]]
-        m = defaultdict(list)
-        for sid, *_, did in traces.numpy():
-            if did >= 0:
-                m[sid].append(did)
-        mapper = {i: np.array(j) for i, j in m.items()}
-
-        feat = np.zeros((len(nids0), feature_dim), dtype=np.float32)
-        for i, sid in enumerate(nids0):
-            if sid in mapper.keys():
-                dids = mapper[sid]
-                dids, cnts = np.unique(dids, return_counts=True)
-                itk = np.argsort(cnts)[-topk:]
-                dids, cnts = dids[itk], cnts[itk]
-                ft = features[dids].astype(np.float32) * cnts.reshape((-1, 1))
-                feat[i, :] = ft.sum(axis=0) / cnts.sum()
-            else:
-                feat[i, :] = 0
-        res.append(feat)
-    return np.concatenate(res, axis=0)
-
-
-def calc_neighborsample_label_features(graph, node_ids, metapath, labels, num_classes=153):
-    feat = np.zeros((len(node_ids), num_classes), dtype=np.float32)
-    node_ids = np.array(node_ids)
-    for i, nids0 in enumerate(tqdm.tqdm(node_ids)):
-        nids = nids0
-        for mp in metapath:
-            _, nids = map(lambda x: x.numpy(), graph.out_edges(nids, form='uv', etype=mp))
-        nids = np.unique(nids[(nids != nids0)])
-
-        if len(nids) > 0:
-            lbs = labels[nids]
-            lbs = lbs[(lbs >= 0)].astype(np.int64)
-            if len(lbs) == 0:
-                feat[i, :] = 1. / num_classes
-            else:
-                ft = np.zeros((len(lbs), num_classes), dtype=np.float32)
-                ft[list(range(len(lbs))), lbs] = 1
-                feat[i, :] = ft.sum(axis=0) / ft.sum()
-        else:
-            feat[i, :] = 1. / num_classes
-    return feat
-
-
-def calc_neighborsample_feat_features(graph, node_ids, metapath, features, feature_dim=768):
-    feat = np.zeros((len(node_ids), feature_dim), dtype=np.float32)
-    node_ids = np.array(node_ids)
-    for i, nids0 in enumerate(tqdm.tqdm(node_ids)):
-        nids = nids0
-        for mp in metapath:
-            _, nids = map(lambda x: x.numpy(), graph.out_edges(nids, form='uv', etype=mp))
-        nids = np.unique(nids[(nids != nids0)])
-
-        if len(nids) > 0:
-            feat[i, :] = features[nids].astype(np.float32).mean(axis=0)
-        else:
-            feat[i, :] = 0
-    return feat
-
-def calc_neighborsample_heter_feat_features(graph, node_ids, metapath, feat_paper, target_type, 
-                        feat_author=None, feat_institution=None, feature_dim=768):
-    feat = np.zeros((len(node_ids), feature_dim), dtype=np.float32)
+
+def calc_neighborsample_heter_feat_features(graph, node_ids, metapath, feat_paper, target_type,
+                        feat_author=None, feat_institution=None, feature_dim=768, batch_size=4096, out=None):
     if target_type == 'p':
         features = feat_paper
     elif target_type == 'a':
         features = feat_author
     elif target_type == 'i':
         features = feat_institution
-    node_ids = np.array(node_ids)
-    for i, nids0 in enumerate(tqdm.tqdm(node_ids)):
-        nids = nids0
-        for mp in metapath:
-            _, nids = map(lambda x: x.numpy(), graph.out_edges(nids, form='uv', etype=mp))
-        nids = np.unique(nids[(nids != nids0)])
+    return calc_neighborsample_feat_features(graph, node_ids, metapath, features, feature_dim, batch_size, out)
 
-        if len(nids) > 0:
-            feat[i, :] = features[nids].astype(np.float32).mean(axis=0)
-        else:
-            feat[i, :] = 0
-    return feat
 
+def calc_neighborsample_filter_label_features(graph, node_ids, metapath, labels, num_classes=153, ftype='least', num_common=2,
+                                              batch_size=4096, out=None):
+    expand_kwargs = _check_filter(metapath, ftype, num_common)
 
-def calc_neighborsample_filter_label_features(graph, node_ids, metapath, labels, num_classes=153, ftype='least', num_common=2):
-    if ftype not in {'least', 'common'}:
-        raise ValueError("Unknown ftype: %r, only support 'least' and 'common'" % ftype)
-    if len(metapath) != 2:
-        raise ValueError("metapath should with length 2: %r" % metapath)
+    def reduce(group, nids, mult, n):
+        return label_shares(group, nids, n, labels, num_classes, weight=mult if ftype == 'least' else None)
+    return _neighborsample_features(reduce, graph, node_ids, metapath, num_classes, batch_size, out, **expand_kwargs)
 
-    feat = np.zeros((len(node_ids), num_classes), dtype=np.float32)
-    node_ids = np.array(node_ids)
-    for i, nids0 in enumerate(tqdm.tqdm(node_ids)):
-        dids = nids0
-        for mp in metapath:
-            sids, dids = map(lambda x: x.numpy(), graph.out_edges(dids, form='uv', etype=mp))
-
-        if ftype == 'least':
-            nids, cnts = np.unique(sids, return_counts=True)
-            sid = nids[np.argmin(cnts)]  # least middle
-            nids = dids[sids == sid]
-            nids = nids[(nids != nids0)]
-        else:
-            nids, cnts = np.unique(dids, return_counts=True)
-            nids = nids[cnts >= num_common]
-            nids = nids[(nids != nids0)]
-
-        if len(nids) > 0:
-            lbs = labels[nids]
-            lbs = lbs[(lbs >= 0)].astype(np.int64)
-            if len(lbs) == 0:
-                feat[i, :] = 1. / num_classes
-            else:
-                ft = np.zeros((len(lbs), num_classes), dtype=np.float32)
-                ft[list(range(len(lbs))), lbs] = 1
-                feat[i, :] = ft.sum(axis=0) / ft.sum()
-        else:
-            feat[i, :] = 1. / num_classes
-    return feat
-
-
-def calc_neighborsample_filter_feat_features(graph, node_ids, metapath, features, feature_dim=768, ftype='least', num_common=2):
-    if ftype not in {'least', 'common'}:
-        raise ValueError("Unknown ftype: %r, only support 'least' and 'common'" % ftype)
-    if len(metapath) != 2:
-        raise ValueError("metapath should with length 2: %r" % metapath)
 
-    feat = np.zeros((len(node_ids), feature_dim), dtype=np.float32)
-    node_ids = np.array(node_ids)
-    for i, nids0 in enumerate(tqdm.tqdm(node_ids)):
-        dids = nids0
-        for mp in metapath:
-            sids, dids = map(lambda x: x.numpy(), graph.out_edges(dids, form='uv', etype=mp))
-
-        if ftype == 'least':
-            nids, cnts = np.unique(sids, return_counts=True)
-            sid = nids[np.argmin(cnts)]  # least middle
-            nids = dids[sids == sid]
-            nids = nids[(nids != nids0)]
-        else:
-            nids, cnts = np.unique(dids, return_counts=True)
-            nids = nids[cnts >= num_common]
-            nids = nids[(nids != nids0)]
-
-        if len(nids) > 0:
-            feat[i, :] = features[nids].astype(np.float32).mean(axis=0)
-        else:
-            feat[i, :] = 0
-    return feat
+def calc_neighborsample_filter_feat_features(graph, node_ids, metapath, features, feature_dim=768, ftype='least', num_common=2,
+                                             batch_size=4096, out=None):
+    expand_kwargs = _check_filter(metapath, ftype, num_common)
+
+    def reduce(group, nids, mult, n):
+        return mean_features(group, nids, n, features, weight=mult if ftype == 'least' else None)
+    return _neighborsample_features(reduce, graph, node_ids, metapath, feature_dim, batch_size, out, **expand_kwargs)
+
+
+# Ingredients of one output file: ``calc_fn(graph, node_ids, *args, out=..., **kwargs)``
+# fills ``[len(node_ids), dim]`` rows and needs about ``memory`` bytes per shard.
+FeatureJob = namedtuple('FeatureJob', ['path', 'dim', 'calc_fn', 'args', 'kwargs', 'memory'])
+
+
+def randomwalk_shard_memory(metapath, num_walkers=160, batch_size=1024):
+    # One batch of traces plus the grouping temporaries built from it.
+    return batch_size * num_walkers * (len(metapath) + 1) * 8 * 4
+
+
+def neighborsample_shard_memory(max_pairs=MAX_PAIRS):
+    # The (seed, node, mult) frontier, its merge keys and the np.unique buffers.
+    return max_pairs * 8 * 6
+
+
+# (graph, node_ids, jobs, shard_size, seed) of the running ``run_feature_jobs``
+# call, set before forking so workers inherit the graph and feature arrays
+# instead of pickling them.
+_RUNNER = None
+
+
+def _partial_path(path):
+    return path + '.partial.npy'
+
+
+def _manifest_path(path):
+    return path + '.manifest.json'
+
+
+def _write_manifest(path, config, done):
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump({'config': config, 'done': sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def _open_partial(job, config):
+    """Create the partial memmap of ``job`` or reopen it; return the shards already done."""
+    partial, manifest = _partial_path(job.path), _manifest_path(job.path)
+    if os.path.exists(partial) and os.path.exists(manifest):
+        with open(manifest) as f:
+            state = json.load(f)
+        if state['config'] == config:
+            return set(state['done'])
+        logger.info("%s: manifest does not match this run, starting over" % job.path)
+    out = np.lib.format.open_memmap(partial, mode='w+', dtype=config['dtype'], shape=(config['rows'], job.dim))
+    del out
+    _write_manifest(manifest, config, [])
+    return set()
+
+
+def _run_feature_shard(task):
+    job_index, shard = task
+    graph, node_ids, jobs, shard_size, seed = _RUNNER
+    job = jobs[job_index]
+    lo, hi = shard * shard_size, min((shard + 1) * shard_size, len(node_ids))
+    np.random.seed(seed + shard)
+    dgl.seed(seed + shard)
+    out = np.load(_partial_path(job.path), mmap_mode='r+')
+    job.calc_fn(graph, node_ids[lo:hi], *job.args, out=out[lo:hi], **job.kwargs)
+    out.flush()
+    return task
+
+
+def run_feature_jobs(graph, node_ids, jobs, num_workers=0, shard_size=65536, dtype='float32', seed=42,
+                     memory_budget=None, overwrite=False):
+    """Compute every ``FeatureJob`` into its ``.npy`` file through memory maps.
+
+    Jobs whose file already exists are skipped unless ``overwrite``.  With
+    ``num_workers == 0`` each job runs in one pass that follows the global
+    seed.  Otherwise each job is split into ``shard_size`` node ranges, seeded
+    with ``seed + shard``, and run by ``num_workers`` forked processes (in
+    process for one) that mix shards of all jobs while the summed ``memory``
+    of running shards stays within ``memory_budget`` bytes.  Finished shards
+    are recorded in ``<path>.manifest.json`` next to ``<path>.partial.npy``,
+    so a killed run resumes where it stopped.
+    """
+    global _RUNNER
+    if not overwrite:
+        for job in jobs:
+            if os.path.exists(job.path):
+                logger.info("%s exists, skipping" % job.path)
+        jobs = [job for job in jobs if not os.path.exists(job.path)]
+
+    if num_workers == 0:
+        for job in jobs:
+            logger.info("computing %s" % job.path)
+            out = np.lib.format.open_memmap(_partial_path(job.path), mode='w+', dtype=dtype, shape=(len(node_ids), job.dim))
+            job.calc_fn(graph, node_ids, *job.args, out=out, **job.kwargs)
+            out.flush()
+            del out
+            os.replace(_partial_path(job.path), job.path)
+        return
+
+    num_shards = (len(node_ids) + shard_size - 1) // shard_size
+    configs, done, queues = [], [], []
+    for job in jobs:
+        config = dict(rows=len(node_ids), dim=job.dim, dtype=dtype, shard_size=shard_size, seed=seed)
+        configs.append(config)
+        done.append(_open_partial(job, config))
+        queues.append([(len(queues), shard) for shard in range(num_shards) if shard not in done[-1]])
+        logger.info("%s: %d/%d shards to compute" % (job.path, len(queues[-1]), num_shards))
+    # Interleave the jobs so light and heavy shards share the memory budget.
+    pending = deque(task for group in itertools.zip_longest(*queues) for task in group if task is not None)
+
+    def finish(task):
+        job_index, shard = task
+        job = jobs[job_index]
+        done[job_index].add(shard)
+        _write_manifest(_manifest_path(job.path), configs[job_index], done[job_index])
+        if len(done[job_index]) == num_shards:
+            os.replace(_partial_path(job.path), job.path)
+            os.remove(_manifest_path(job.path))
+            logger.info("%s done" % job.path)
+
+    for job_index in range(len(jobs)):
+        if not queues[job_index]:
+            finish((job_index, num_shards - 1))
+
+    _RUNNER = (graph, node_ids, jobs, shard_size, seed)
+    try:
+        if num_workers == 1:
+            for task in tqdm.tqdm(pending):
+                finish(_run_feature_shard(task))
+            return
+        budget = memory_budget or float('inf')
+        running, used = {}, 0
+        with tqdm.tqdm(total=len(pending)) as progress, \
+                ProcessPoolExecutor(num_workers, mp_context=multiprocessing.get_context('fork'),
+                                    initializer=torch.set_num_threads, initargs=(1,)) as pool:
+            while pending or running:
+                while pending and len(running) < num_workers and \
+                        (not running or used + jobs[pending[0][0]].memory <= budget):
+                    task = pending.popleft()
+                    running[pool.submit(_run_feature_shard, task)] = task
+                    used += jobs[task[0]].memory
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    task = running.pop(future)
+                    used -= jobs[task[0]].memory
+                    finish(future.result())
+                    progress.update()
+    finally:
+        _RUNNER = None
 
 
 def parse_args(args=None):
@@ -302,6 +312,15 @@ def parse_args(args=None):
     parser.add_argument('output_path', help='The directory of output data')
     parser.add_argument('preprocess_path', help='The directory of preprocess data')
     parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--num_workers', type=int, default=0,
+                        help='Processes for the metapath features; >0 shards the nodes, seeds each shard '
+                             'and resumes from the shard manifests of an interrupted run')
+    parser.add_argument('--shard_size', type=int, default=65536, help='Nodes per feature shard')
+    parser.add_argument('--memory_budget_gb', type=float, default=0,
+                        help='Estimated memory of the shards running at once (0: no limit)')
+    parser.add_argument('--overwrite', action='store_true', help='Recompute feature files that already exist')
+    parser.add_argument('--feat_dtype', choices=['float32', 'float16'], default='float32',
+                        help='Storage dtype of the memory-mapped metapath feature files')
 
     args = parser.parse_args()
     return args
@@ -340,6 +359,7 @@ if __name__ == '__main__':
     np.save(os.path.join(args.output_path, 'y_base.npy'), y_base)
 
     # 1. random walk
+    jobs = []
     metapaths = {
         'pcp': ['cites'],
         'pcbp': ['cited_by'],
@@ -354,9 +374,9 @@ if __name__ == '__main__':
         # x = calc_randomwalk_feat_features(graph, node_ids, mp, paper_feat, feature_dim,
         #                                   num_walkers=160)
         # np.save(os.path.join(args.output_path, 'x_%s_rw_fmean.npy' % n), x)
-        x = calc_randomwalk_label_features(graph, node_ids, mp, paper_label, num_classes,
-                                           num_walkers=160) 
-        np.save(os.path.join(args.output_path, 'x_%s_rw_lratio.npy' % n), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_rw_lratio.npy' % n), num_classes,
+                               calc_randomwalk_label_features, (mp, paper_label, num_classes),
+                               dict(num_walkers=160), randomwalk_shard_memory(mp)))
 
     # 2. random walk topk
     metapaths = {
@@ -374,9 +394,9 @@ if __name__ == '__main__':
         # x = calc_randomwalk_topk_feat_features(graph, node_ids, mp, paper_feat, feature_dim,
         #                                        num_walkers=160, topk=topk)
         # np.save(os.path.join(args.output_path, 'x_%s_rw_top%d_fmean.npy' % (n, topk)), x)
-        x = calc_randomwalk_topk_label_features(graph, node_ids, mp, paper_label, num_classes,
-                                                num_walkers=160, topk=topk)
-        np.save(os.path.join(args.output_path, 'x_%s_rw_top%d_lratio.npy' % (n, topk)), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_rw_top%d_lratio.npy' % (n, topk)), num_classes,
+                               calc_randomwalk_topk_label_features, (mp, paper_label, num_classes),
+                               dict(num_walkers=160, topk=topk), randomwalk_shard_memory(mp)))
 
     # neighbor sample
     metapaths = {
@@ -392,8 +412,9 @@ if __name__ == '__main__':
         logger.info(n, mp)
         # x = calc_neighborsample_feat_features(graph, node_ids, mp, paper_feat, feature_dim)
         # np.save(os.path.join(args.output_path, 'x_%s_ns_fmean.npy' % n), x)
-        x = calc_neighborsample_label_features(graph, node_ids, mp, paper_label, num_classes)
-        np.save(os.path.join(args.output_path, 'x_%s_ns_lratio.npy' % n), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_ns_lratio.npy' % n), num_classes,
+                               calc_neighborsample_label_features, (mp, paper_label, num_classes),
+                               {}, neighborsample_shard_memory()))
 
     # neigbor sample (different node types)
     metapaths = {
@@ -404,10 +425,11 @@ if __name__ == '__main__':
     }
     for n, mp in metapaths.items():
         logger.info(n, mp)
-        x = calc_neighborsample_heter_feat_features(graph, node_ids, mp, paper_feat, n[-1], 
-                        feat_author=author_feat, feat_institution=ins_feat, feature_dim=768)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_ns_fmean.npy' % n), feature_dim,
+                               calc_neighborsample_heter_feat_features, (mp, paper_feat, n[-1]),
+                               dict(feat_author=author_feat, feat_institution=ins_feat, feature_dim=feature_dim),
+                               neighborsample_shard_memory()))
         # x = calc_neighborsample_feat_features(graph, node_ids, mp, paper_feat, feature_dim)
-        np.save(os.path.join(args.output_path, 'x_%s_ns_fmean.npy' % n), x)
 
 
     # neighbor sample by 'least' or 'common'
@@ -419,22 +441,25 @@ if __name__ == '__main__':
         # x = calc_neighborsample_filter_feat_features(graph, node_ids, mp, paper_feat, feature_dim,
         #                                              ftype='common', num_common=2)
         # np.save(os.path.join(args.output_path, 'x_%s_ns_c2_fmean.npy' % n), x)
-        x = calc_neighborsample_filter_label_features(graph, node_ids, mp, paper_label, num_classes,
-                                                      ftype='common', num_common=2)
-        np.save(os.path.join(args.output_path, 'x_%s_ns_c2_lratio.npy' % n), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_ns_c2_lratio.npy' % n), num_classes,
+                               calc_neighborsample_filter_label_features, (mp, paper_label, num_classes),
+                               dict(ftype='common', num_common=2), neighborsample_shard_memory()))
 
         # x = calc_neighborsample_filter_feat_features(graph, node_ids, mp, paper_feat, feature_dim,
         #                                              ftype='common', num_common=4)
         # np.save(os.path.join(args.output_path, 'x_%s_ns_c4_fmean.npy' % n), x)
-        x = calc_neighborsample_filter_label_features(graph, node_ids, mp, paper_label, num_classes,
-                                                      ftype='common', num_common=4)
-        np.save(os.path.join(args.output_path, 'x_%s_ns_c4_lratio.npy' % n), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_ns_c4_lratio.npy' % n), num_classes,
+                               calc_neighborsample_filter_label_features, (mp, paper_label, num_classes),
+                               dict(ftype='common', num_common=4), neighborsample_shard_memory()))
 
         # x = calc_neighborsample_filter_feat_features(graph, node_ids, mp, paper_feat, feature_dim,
         #                                              ftype='least')
         # np.save(os.path.join(args.output_path, 'x_%s_ns_l_fmean.npy' % n), x)
-        x = calc_neighborsample_filter_label_features(graph, node_ids, mp, paper_label, num_classes,
-                                                      ftype='least')
-        np.save(os.path.join(args.output_path, 'x_%s_ns_l_lratio.npy' % n), x)
+        jobs.append(FeatureJob(os.path.join(args.output_path, 'x_%s_ns_l_lratio.npy' % n), num_classes,
+                               calc_neighborsample_filter_label_features, (mp, paper_label, num_classes),
+                               dict(ftype='least'), neighborsample_shard_memory()))
 
+    run_feature_jobs(graph, node_ids, jobs, num_workers=args.num_workers, shard_size=args.shard_size,
+                     dtype=args.feat_dtype, seed=args.seed, memory_budget=args.memory_budget_gb * (1 << 30),
+                     overwrite=args.overwrite)
     logger.info("DONE")
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""Batched metapath expansion over CSR adjacencies.
+
+The ``calc_neighborsample_*`` features used to call ``graph.out_edges`` once
+per target node and hop.  Here a whole batch of seeds is expanded hop by hop
+on the ``(indptr, indices)`` arrays of each edge type: the frontier is kept as
+distinct ``(seed, node)`` pairs with path multiplicities, neighbours are
+gathered with ``np.repeat`` over the ``indptr`` ranges and merged again with
+``np.unique``.  A batch whose next frontier would exceed ``max_pairs`` is
+split in half and expanded separately.
+"""
+from typing import List, Tuple
+
+import numpy as np
+
+Csr = Tuple[np.ndarray, np.ndarray]
+
+MAX_PAIRS = 1 << 25
+
+
+def csr_neighbors(indptr: np.ndarray, indices: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """``(pos, nbr)``: every out-neighbour of ``nodes`` with the position of its source."""
+    start = indptr[nodes]
+    deg = indptr[nodes + 1] - start
+    pos = np.repeat(np.arange(nodes.size), deg)
+    offset = np.arange(pos.size) - np.repeat(np.cumsum(deg) - deg, deg)
+    return pos, indices[start[pos] + offset]
+
+
+def _merge(group: np.ndarray, node: np.ndarray, mult: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Sum ``mult`` over equal ``(group, node)`` pairs, sorted by group then node."""
+    if node.size == 0:
+        return group, node, mult
+    span = int(node.max()) + 1
+    pairs, inverse = np.unique(group * span + node, return_inverse=True)
+    return pairs // span, pairs % span, np.bincount(inverse, weights=mult).astype(np.int64)
+
+
+def _least_middle(csr: Csr, group: np.ndarray, node: np.ndarray, mult: np.ndarray):
+    """Keep, per group, the middle node reaching the fewest next-hop edges.
+
+    Ties go to the smaller node id, like ``np.argmin`` over ``np.unique`` did.
+    """
+    indptr = csr[0]
+    edges = mult * (indptr[node + 1] - indptr[node])
+    live = np.flatnonzero(edges > 0)
+    order = live[np.lexsort((node[live], edges[live], group[live]))]
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = group[order][1:] != group[order][:-1]
+    keep = order[first]
+    return group[keep], node[keep], mult[keep]
+
+
+def _expand(csrs: List[Csr], seeds: np.ndarray, least: bool, max_pairs: int):
+    group = np.arange(seeds.size, dtype=np.int64)
+    node = seeds.astype(np.int64)
+    mult = np.ones(seeds.size, dtype=np.int64)
+    for hop, (indptr, indices) in enumerate(csrs):
+        if least and hop == len(csrs) - 1:
+            group, node, mult = _least_middle((indptr, indices), group, node, mult)
+        if seeds.size > 1 and int((indptr[node + 1] - indptr[node]).sum()) > max_pairs:
+            return None
+        pos, nbr = csr_neighbors(indptr, indices, node)
+        group, node, mult = _merge(group[pos], nbr.astype(np.int64), mult[pos])
+    return group, node, mult
+
+
+def expand_metapath(csrs: List[Csr], seeds, min_mult: int = 1, least: bool = False,
+                    max_pairs: int = MAX_PAIRS) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Nodes reachable from ``seeds`` along the edge types in ``csrs``.
+
+    Returns ``(group, node, mult)`` sorted by group then node, where ``group``
+    indexes ``seeds`` and ``mult`` counts the metapath instances from the seed
+    to ``node``.  Nodes equal to their seed are excluded, and so are nodes
+    reached fewer than ``min_mult`` times (the 'common' filter).  With
+    ``least`` the last hop only leaves the middle node with the fewest
+    outgoing paths (the 'least' filter).
+    """
+    seeds = np.asarray(seeds)
+    out = _expand(csrs, seeds, least, max_pairs)
+    if out is None:
+        half = seeds.size // 2
+        head = expand_metapath(csrs, seeds[:half], min_mult, least, max_pairs)
+        tail = expand_metapath(csrs, seeds[half:], min_mult, least, max_pairs)
+        return tuple(np.concatenate([h, t + half if i == 0 else t]) for i, (h, t) in enumerate(zip(head, tail)))
+    group, node, mult = out
+    keep = (mult >= min_mult) & (node != seeds[group])
+    return group[keep], node[keep], mult[keep]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""Segment-reduce aggregation of random-walk endpoints.
+
+The ``calc_randomwalk_*`` features used to build a ``defaultdict(list)`` of
+endpoints per start node in Python and then loop over the nodes.  Here a batch
+of traces is reduced in bulk instead: endpoints are grouped by start node with
+``np.unique``/``searchsorted``, label histograms come from one ``bincount`` over
+``(group, label)`` keys, feature means from ``np.add.reduceat`` over the
+endpoints sorted by group, and top-k aggregates from a lexsort of the distinct
+``(group, endpoint)`` pairs by count.
+
+All functions take ``traces`` as returned by ``dgl.sampling.random_walk`` (an
+int64 ``[num_walks, length]`` array, ``-1`` after a dead end) plus the start
+nodes of the batch, and return one row per start node, duplicates included.
+Label shares match the former per-node loops exactly and feature means up to
+float32 summation order. Among endpoints tied on count the top-k keeps the
+larger node ids (the old unstable ``argsort`` left that choice unspecified).
+"""
+from typing import Tuple
+
+import numpy as np
+
+
+def endpoint_groups(traces: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Return ``(starts, row_group, group, did)``.
+
+    ``starts`` are the distinct start nodes, ``row_group`` maps every entry of
+    ``nodes`` to its group, and ``group``/``did`` list the kept walk endpoints
+    (walks that end where they began or at a dead end are dropped).
+    """
+    traces = np.asarray(traces)
+    starts = np.unique(nodes)
+    row_group = np.searchsorted(starts, nodes)
+    sid, did = traces[:, 0], traces[:, -1]
+    keep = (sid != did) & (did >= 0)
+    group = np.searchsorted(starts, sid[keep])
+    return starts, row_group, group, did[keep]
+
+
+def _label_rows(num_groups: int, num_classes: int, group: np.ndarray, lbs: np.ndarray, weight=None) -> np.ndarray:
+    key = group * num_classes + lbs
+    counts = np.bincount(key, weights=weight, minlength=num_groups * num_classes)
+    return counts.reshape(num_groups, num_classes)
+
+
+def label_shares(group, did, num_groups: int, labels, num_classes: int, weight=None) -> np.ndarray:
+    """Share of each label among the (weighted) ``did`` of every group.
+
+    Unlabeled endpoints (negative or NaN) are ignored; groups without a labeled
+    endpoint get the uniform distribution.
+    """
+    lbs = labels[did]
+    valid = lbs >= 0
+    if weight is not None:
+        weight = weight[valid]
+    counts = _label_rows(num_groups, num_classes, group[valid], lbs[valid].astype(np.int64), weight).astype(np.float32)
+    total = counts.sum(axis=1)
+    feat = np.full((num_groups, num_classes), 1.0 / num_classes, dtype=np.float32)
+    has = total > 0
+    feat[has] = counts[has] / total[has, None]
+    return feat
+
+
+def label_distribution(traces, nodes, labels, num_classes: int) -> np.ndarray:
+    """Share of each label among a node's endpoints (uniform when none is labeled)."""
+    starts, row_group, group, did = endpoint_groups(traces, nodes)
+    other = did != starts[group]
+    return label_shares(group[other], did[other], starts.size, labels, num_classes)[row_group]
+
+
+def _segment_sums(order_group: np.ndarray, values_fn, num_groups: int, dim: int, dtype, chunk_rows: int) -> np.ndarray:
+    """Sum ``values_fn(lo, hi)`` rows per group, for endpoints already sorted by group."""
+    sums = np.zeros((num_groups, dim), dtype=dtype)
+    bounds = np.flatnonzero(np.diff(order_group)) + 1
+    seg_start = np.concatenate([[0], bounds])
+    seg_end = np.concatenate([bounds, [order_group.size]])
+    cursor = 0
+    while cursor < seg_start.size:
+        # Gather at most ``chunk_rows`` endpoint rows at a time (at least one whole segment).
+        stop = max(int(np.searchsorted(seg_start, seg_start[cursor] + chunk_rows, side="right")), cursor + 1)
+        lo, hi = int(seg_start[cursor]), int(seg_end[stop - 1])
+        sums[order_group[seg_start[cursor:stop]]] = np.add.reduceat(values_fn(lo, hi), seg_start[cursor:stop] - lo, axis=0)
+        cursor = stop
+    return sums
+
+
+def mean_features(group, did, num_groups: int, features, weight=None, chunk_rows: int = 65536) -> np.ndarray:
+    """(Weighted) mean feature of the ``did`` of every group (zeros for empty groups)."""
+    dim = features.shape[1]
+    feat = np.zeros((num_groups, dim), dtype=np.float32)
+    if group.size == 0:
+        return feat
+    order = np.argsort(group, kind="stable")
+    group, did = group[order], did[order]
+    if weight is None:
+        def rows(lo, hi):
+            return features[did[lo:hi]].astype(np.float32)
+        counts = np.bincount(group, minlength=num_groups).astype(np.float32)
+    else:
+        weight = weight[order].astype(np.float32)
+
+        def rows(lo, hi):
+            return features[did[lo:hi]].astype(np.float32) * weight[lo:hi, None]
+        counts = np.bincount(group, weights=weight, minlength=num_groups).astype(np.float32)
+    sums = _segment_sums(group, rows, num_groups, dim, np.float32, chunk_rows)
+    has = counts > 0
+    feat[has] = sums[has] / counts[has, None]
+    return feat
+
+
+def feature_mean(traces, nodes, features, chunk_rows: int = 65536) -> np.ndarray:
+    """Mean feature of a node's endpoints (zeros when there is none)."""
+    starts, row_group, group, did = endpoint_groups(traces, nodes)
+    return mean_features(group, did, starts.size, features, chunk_rows=chunk_rows)[row_group]
+
+
+def topk_endpoints(traces, nodes, topk: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """The ``topk`` most visited endpoints per start node.
+
+    Returns ``(starts, row_group, group, did, cnt)`` with the selected pairs
+    sorted by group, then by ascending count and endpoint id.
+    """
+    starts, row_group, group, did = endpoint_groups(traces, nodes)
+    if group.size == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return starts, row_group, empty, empty, empty
+    span = int(did.max()) + 1
+    pairs, cnt = np.unique(group.astype(np.int64) * span + did, return_counts=True)
+    group, did = pairs // span, pairs % span
+    order = np.lexsort((did, cnt, group))
+    group, did, cnt = group[order], did[order], cnt[order]
+    seg_end = np.searchsorted(group, group, side="right")
+    keep = np.arange(group.size) >= seg_end - topk
+    return starts, row_group, group[keep], did[keep], cnt[keep]
+
+
+def topk_label_distribution(traces, nodes, labels, num_classes: int, topk: int = 10) -> np.ndarray:
+    """Count-weighted label shares of the top-k endpoints (over all their counts)."""
+    starts, row_group, group, did, cnt = topk_endpoints(traces, nodes, topk)
+    lbs = labels[did]
+    valid = (did != starts[group]) & (lbs >= 0)
+    numer = _label_rows(starts.size, num_classes, group[valid], lbs[valid].astype(np.int64), weight=cnt[valid].astype(np.float64))
+    denom = np.bincount(group, weights=cnt.astype(np.float64), minlength=starts.size)
+    has = np.bincount(group[valid], minlength=starts.size) > 0
+    feat = np.full((starts.size, num_classes), 1.0 / num_classes, dtype=np.float32)
+    feat[has] = (numer[has] / denom[has, None]).astype(np.float32)
+    return feat[row_group]
+
+
+def topk_feature_mean(traces, nodes, features, topk: int = 10, chunk_rows: int = 65536) -> np.ndarray:
+    """Count-weighted mean feature of the top-k endpoints (zeros when there is none)."""
+    starts, row_group, group, did, cnt = topk_endpoints(traces, nodes, topk)
+    dim = features.shape[1]
+    if group.size == 0:
+        return np.zeros((len(nodes), dim), dtype=np.float32)
+
+    def weighted(lo, hi):
+        return features[did[lo:hi]].astype(np.float32) * cnt[lo:hi, None]
+
+    sums = _segment_sums(group, weighted, starts.size, dim, np.float64, chunk_rows)
+    denom = np.bincount(group, weights=cnt.astype(np.float64), minlength=starts.size)
+    feat = np.zeros((starts.size, dim), dtype=np.float32)
+    has = denom > 0
+    feat[has] = (sums[has] / denom[has, None]).astype(np.float32)
+    return feat[row_group]
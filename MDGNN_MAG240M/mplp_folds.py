@@ -21,6 +21,7 @@ import glob
 import socket
 import logging
 from features.config_feats import feats, model_feats
+from feature_store import MmapFeatureStore, TensorFeatureStore
 
 
 logging.basicConfig(
@@ -114,17 +115,20 @@ class MPLP(torch.nn.Module):
         return self.mlp(out)
 
 
-def load_data(datapath, feat_info, device=None):
+def load_data(datapath, feat_info, device=None, store='mmap', num_threads=4):
     logger.info("Loading data from %s" % datapath)
 
-    x_all = []
-    for i, (fn, _, _) in enumerate(feat_info):
-        logger.info("Loading features for %d: %s ..." % (i, fn.upper()))
-        feat = []
-        fname = os.path.join(datapath, '%s.npy' % fn)
-        logger.info("Loading %s" % fname)
-        feat = torch.from_numpy(np.load(fname)).to(device, torch.float32)
-        x_all.append(feat)
+    fnames = [os.path.join(datapath, '%s.npy' % fn) for fn, _, _ in feat_info]
+    if store == 'mmap':
+        logger.info("Memory-mapping %d feature files, rows are gathered per batch" % len(fnames))
+        x_all = MmapFeatureStore(fnames, num_threads=num_threads)
+    else:
+        feats = []
+        for i, fname in enumerate(fnames):
+            logger.info("Loading features for %d: %s ..." % (i, feat_info[i][0].upper()))
+            logger.info("Loading %s" % fname)
+            feats.append(torch.from_numpy(np.load(fname)).to(device, torch.float32))
+        x_all = TensorFeatureStore(feats)
 
     logger.info("Loading labels ...")
     fname = os.path.join(datapath, 'y_base.npy')
@@ -158,6 +162,11 @@ def parse_args(args=None):
     parser.add_argument('--mlp_hidden', type=int, default=512)
     parser.add_argument('--finetune', action='store_true')
     parser.add_argument('--hidden', type=int, default=128)
+    parser.add_argument('--feature_store', choices=['mmap', 'memory'], default='mmap',
+                        help='mmap: memory-map the feature files and gather rows per batch; '
+                             'memory: load every feature group as float32 onto the device')
+    parser.add_argument('--loader_threads', type=int, default=4,
+                        help='Threads gathering the next batches with --feature_store mmap')
 
     args = parser.parse_args()
     return args
@@ -231,8 +240,8 @@ if __name__ == '__main__':
     logger.info("A Total of %d different type features" % len(feat_info))
     logger.info(feat_info)
 
-    x_all, y_all = load_data(args.input_path, feat_info, device)
-    logger.info("<=2019: %d, >=2020: %d" % (y_all.shape[0], x_all[0].shape[0] - y_all.shape[0]))
+    x_all, y_all = load_data(args.input_path, feat_info, device, args.feature_store, args.loader_threads)
+    logger.info("<=2019: %d, >=2020: %d" % (y_all.shape[0], len(x_all) - y_all.shape[0]))
 
     split_nids = dataset.get_idx_split()
 
@@ -311,9 +320,9 @@ if __name__ == '__main__':
 
             model.train()
             total_loss = 0
-            for idx in DataLoader(train_idx, args.batch_size, shuffle=True): # train
+            for idx, xs in x_all.batches(DataLoader(train_idx, args.batch_size, shuffle=True), device): # train
                 optimizer.zero_grad()
-                y_pred = model([x[idx].to(torch.float32) for x in x_all])
+                y_pred = model(xs)
                 y_true = y_all[idx]
                 loss = F.cross_entropy(y_pred, y_true, weight=weight)
                 loss.backward()
@@ -324,8 +333,8 @@ if __name__ == '__main__':
             with torch.no_grad(): # compute train accuracy
                 model.eval()
                 y_pred = []
-                for idx in DataLoader(train_idx, args.batch_size):
-                    y = model([x[idx].to(torch.float32) for x in x_all])
+                for idx, xs in x_all.batches(DataLoader(train_idx, args.batch_size), device):
+                    y = model(xs)
                     y_pred.append(y.argmax(dim=-1).cpu())
                 y_pred = torch.cat(y_pred, dim=-1)
                 train_acc = evaluator.eval({'y_true': y_all[train_idx].cpu(), 'y_pred': y_pred})['acc']
@@ -333,8 +342,8 @@ if __name__ == '__main__':
             with torch.no_grad(): # compute valid accuracy
                 model.eval()
                 y_pred = []
-                for idx in DataLoader(valid_idx, args.batch_size):
-                    y = model([x[idx].to(torch.float32) for x in x_all])
+                for idx, xs in x_all.batches(DataLoader(valid_idx, args.batch_size), device):
+                    y = model(xs)
                     y_pred.append(y.argmax(dim=-1).cpu())
                 y_pred = torch.cat(y_pred, dim=-1)
             valid_acc = evaluator.eval({'y_true': y_all[valid_idx].cpu(), 'y_pred': y_pred})['acc']
@@ -362,8 +371,8 @@ if __name__ == '__main__':
         # with torch.no_grad():
         #     model.eval()
         #     y_pred = []
-        #     for idx in DataLoader(valid_idx, args.batch_size):
-        #         y = model([x[idx].to(torch.float32) for x in x_all])
+        #     for idx, xs in x_all.batches(DataLoader(valid_idx, args.batch_size), device):
+        #         y = model(xs)
         #         y_pred.append(y.argmax(dim=-1).cpu())
         #     y_pred = torch.cat(y_pred, dim=-1)
         #     y_true = y_all[valid_idx].cpu()
@@ -387,9 +396,9 @@ if __name__ == '__main__':
 
                 model.train()
                 total_loss = 0
-                for idx in DataLoader(train_idx_ft, args.batch_size, shuffle=True):
+                for idx, xs in x_all.batches(DataLoader(train_idx_ft, args.batch_size, shuffle=True), device):
                     optimizer.zero_grad()
-                    y_pred = model([x[idx].to(torch.float32) for x in x_all])
+                    y_pred = model(xs)
                     y_true = y_all[idx]
                     loss = F.cross_entropy(y_pred, y_true, weight=weight)
                     loss.backward()
@@ -400,8 +409,8 @@ if __name__ == '__main__':
                 with torch.no_grad():
                     model.eval()
                     y_pred = []
-                    for idx in DataLoader(train_idx_ft, args.batch_size):
-                        y = model([x[idx].to(torch.float32) for x in x_all])
+                    for idx, xs in x_all.batches(DataLoader(train_idx_ft, args.batch_size), device):
+                        y = model(xs)
                         y_pred.append(y.argmax(dim=-1).cpu())
                     y_pred = torch.cat(y_pred, dim=-1)
                     train_acc = evaluator.eval({'y_true': y_all[train_idx_ft].cpu(), 'y_pred': y_pred})['acc']
@@ -409,8 +418,8 @@ if __name__ == '__main__':
                 with torch.no_grad():
                     model.eval()
                     y_pred = []
-                    for idx in DataLoader(valid_idx, args.batch_size):
-                        y = model([x[idx].to(torch.float32) for x in x_all])
+                    for idx, xs in x_all.batches(DataLoader(valid_idx, args.batch_size), device):
+                        y = model(xs)
                         y_pred.append(y.argmax(dim=-1).cpu())
                     y_pred = torch.cat(y_pred, dim=-1)
                 valid_acc = evaluator.eval({'y_true': y_all[valid_idx].cpu(), 'y_pred': y_pred})['acc']
@@ -433,8 +442,8 @@ if __name__ == '__main__':
         with torch.no_grad():
             model.eval()
             y_pred = []
-            for idx in DataLoader(valid_idx, args.batch_size):
-                y = model([x[idx].to(torch.float32) for x in x_all])
+            for idx, xs in x_all.batches(DataLoader(valid_idx, args.batch_size), device):
+                y = model(xs)
                 y_pred.append(y.argmax(dim=-1).cpu())
             y_pred = torch.cat(y_pred, dim=-1)
             y_true = y_all[valid_idx].cpu()
@@ -454,8 +463,8 @@ if __name__ == '__main__':
         with torch.no_grad():
             model.eval()
             y_pred = []
-            for idx in DataLoader(train_idx, args.batch_size):
-                y = model([x[idx].to(torch.float32) for x in x_all])
+            for idx, xs in x_all.batches(DataLoader(train_idx, args.batch_size), device):
+                y = model(xs)
                 y_pred.append(y.cpu().numpy())
             y_pred = np.concatenate(y_pred, axis=0)
             np.save(os.path.join(output_path, "idx_train.npy"), train_idx)
@@ -464,8 +473,8 @@ if __name__ == '__main__':
         with torch.no_grad():
             model.eval()
             y_pred = []
-            for idx in DataLoader(valid_idx, args.batch_size):
-                y = model([x[idx].to(torch.float32) for x in x_all])
+            for idx, xs in x_all.batches(DataLoader(valid_idx, args.batch_size), device):
+                y = model(xs)
                 y_pred.append(y.cpu().numpy())
             y_pred = np.concatenate(y_pred, axis=0)
             np.save(os.path.join(output_path, "idx_valid.npy"), valid_idx)
@@ -474,8 +483,8 @@ if __name__ == '__main__':
         with torch.no_grad():
             model.eval()
             y_pred = []
-            for idx in DataLoader(test_idx, args.batch_size):
-                y = model([x[idx].to(torch.float32) for x in x_all])
+            for idx, xs in x_all.batches(DataLoader(test_idx, args.batch_size), device):
+                y = model(xs)
                 y_pred.append(y.cpu().numpy())
             y_pred = np.concatenate(y_pred, axis=0)
             np.save(os.path.join(output_path, "y_pred_test.npy"), y_pred)
@@ -10,6 +10,8 @@ import dgl
 import dgl.function as fn
 from ogb.lsc import MAG240MDataset
 
+from row_block_features import build_author_inst_features
+
 
 parser = argparse.ArgumentParser()
 parser.add_argument('--rootdir', type=str, default='/fs/ess/PAS1289',
@@ -24,6 +26,13 @@ parser.add_argument('--graph-as-homogeneous', action='store_true',
                     help='Store the graph as DGL homogeneous graph.')
 parser.add_argument('--full-output-path', type=str,
                     help='Path to store features of all nodes.  Effective only when graph is homogeneous.')
+parser.add_argument('--feature-builder', choices=['rowblock', 'legacy'], default='rowblock',
+                    help='rowblock: scan contiguous paper row chunks with threaded CSR sums; '
+                         'legacy: DGL update_all over 16-column blocks.')
+parser.add_argument('--feature-memory-gb', type=float, default=32,
+                    help='Memory for float32 author sums; sets how many columns one paper scan covers.')
+parser.add_argument('--feature-workers', type=int, default=0,
+                    help='Threads of the rowblock builder (0: all cores).')
 args = parser.parse_args()
 
 
@@ -55,25 +64,30 @@ paper_feat = dataset.paper_feat
 author_feat = np.memmap(args.author_output_path, mode='w+', dtype='float16', shape=(dataset.num_authors, dataset.num_paper_features))
 inst_feat = np.memmap(args.inst_output_path, mode='w+', dtype='float16', shape=(dataset.num_institutions, dataset.num_paper_features))
 
-# Iteratively process author features along the feature dimension.
-BLOCK_COLS = 16
-with tqdm.trange(0, dataset.num_paper_features, BLOCK_COLS) as tq: 
-    for start in tq:
-        tq.set_postfix_str('Reading paper features...')
-        g.nodes['paper'].data['x'] = torch.FloatTensor(paper_feat[:, start:start + BLOCK_COLS].astype('float32'))
-        # Compute author features...
-        tq.set_postfix_str('Computing author features...')
-        g.update_all(fn.copy_u('x', 'm'), fn.mean('m', 'x'), etype='writed_by')
-        # Then institution features...
-        tq.set_postfix_str('Computing institution features...')
-        g.update_all(fn.copy_u('x', 'm'), fn.mean('m', 'x'), etype='affiliated_with')
-        tq.set_postfix_str('Writing author features...')
-        author_feat[:, start:start + BLOCK_COLS] = g.nodes['author'].data['x'].numpy().astype('float16')
-        tq.set_postfix_str('Writing institution features...')
-        inst_feat[:, start:start + BLOCK_COLS] = g.nodes['institution'].data['x'].numpy().astype('float16')
-        del g.nodes['paper'].data['x']
-        del g.nodes['author'].data['x']
-        del g.nodes['institution'].data['x']
+if args.feature_builder == 'rowblock':
+    build_author_inst_features(paper_feat, ei_writes, ei_affiliated, dataset.num_authors, dataset.num_institutions,
+                               author_feat, inst_feat, memory_budget=int(args.feature_memory_gb * (1 << 30)),
+                               num_workers=args.feature_workers)
+else:
+    # Iteratively process author features along the feature dimension.
+    BLOCK_COLS = 16
+    with tqdm.trange(0, dataset.num_paper_features, BLOCK_COLS) as tq: 
+        for start in tq:
+            tq.set_postfix_str('Reading paper features...')
+            g.nodes['paper'].data['x'] = torch.FloatTensor(paper_feat[:, start:start + BLOCK_COLS].astype('float32'))
+            # Compute author features...
+            tq.set_postfix_str('Computing author features...')
+            g.update_all(fn.copy_u('x', 'm'), fn.mean('m', 'x'), etype='writed_by')
+            # Then institution features...
+            tq.set_postfix_str('Computing institution features...')
+            g.update_all(fn.copy_u('x', 'm'), fn.mean('m', 'x'), etype='affiliated_with')
+            tq.set_postfix_str('Writing author features...')
+            author_feat[:, start:start + BLOCK_COLS] = g.nodes['author'].data['x'].numpy().astype('float16')
+            tq.set_postfix_str('Writing institution features...')
+            inst_feat[:, start:start + BLOCK_COLS] = g.nodes['institution'].data['x'].numpy().astype('float16')
+            del g.nodes['paper'].data['x']
+            del g.nodes['author'].data['x']
+            del g.nodes['institution'].data['x']
 author_feat.flush()
 inst_feat.flush()
 
@@ -0,0 +1,102 @@
+# Author and institution features as means of paper features, built by
+# scanning contiguous row chunks of the paper feature memmap.
+#
+# The DGL baseline loops over the 768 feature columns in blocks of 16 and runs
+# two full-graph ``update_all`` passes per block, reading a strided column
+# slice of ``paper_feat`` (i.e. every page of the file) each time.  Here each
+# pass keeps float32 author sums for as many columns as ``memory_budget``
+# allows (all of them when it is large enough, so the paper features are read
+# exactly once), reads the papers in contiguous row chunks on a prefetch
+# thread and adds every chunk into the author sums through the paper->author
+# CSR, with one worker thread per column group.  Institutions then average the
+# float32 author means over the affiliation edges, as the baseline did.
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import torch
+import tqdm
+
+
+def edges_to_csr(row, col, num_rows):
+    """``(indptr, indices)`` of the edges ``row -> col`` grouped by ``row``."""
+    order = np.argsort(row, kind='stable')
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(np.bincount(row, minlength=num_rows), out=indptr[1:])
+    return indptr, col[order]
+
+
+def columns_per_pass(num_authors, dim, memory_budget):
+    """Feature columns whose float32 author sums fit in ``memory_budget`` bytes."""
+    return int(min(dim, max(1, memory_budget // (num_authors * 4))))
+
+
+def _column_groups(start, end, num_groups):
+    bounds = np.linspace(start, end, min(num_groups, end - start) + 1).astype(np.int64)
+    return [(int(lo), int(hi)) for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _write_rows(out, start, end, values, block_rows):
+    for lo in range(0, values.shape[0], block_rows):
+        hi = min(values.shape[0], lo + block_rows)
+        out[lo:hi, start:end] = values[lo:hi].numpy().astype('float16')
+
+
+def build_author_inst_features(paper_feat, ei_writes, ei_affiliated, num_authors, num_institutions,
+                               author_out, inst_out, memory_budget=32 << 30, block_rows=200000,
+                               edge_block=1 << 22, num_workers=0):
+    """Fill ``author_out`` / ``inst_out`` (float16 ``[n, dim]`` memmaps) with
+    the mean paper feature of each author and the mean author feature of each
+    institution; nodes without edges get zeros, like DGL's ``fn.mean``.
+
+    ``ei_writes`` is the ``(author, paper)`` and ``ei_affiliated`` the
+    ``(author, institution)`` edge index of MAG240M.
+    """
+    num_papers, dim = paper_feat.shape
+    workers = num_workers if num_workers > 0 else (os.cpu_count() or 1)
+    paper_ptr, paper_author = edges_to_csr(ei_writes[1], ei_writes[0], num_papers)
+    paper_author = torch.from_numpy(paper_author)
+    author_deg = torch.from_numpy(np.bincount(ei_writes[0], minlength=num_authors)).clamp_(min=1).float()
+    aff_author = torch.from_numpy(np.asarray(ei_affiliated[0], dtype=np.int64))
+    aff_inst = torch.from_numpy(np.asarray(ei_affiliated[1], dtype=np.int64))
+    inst_deg = torch.bincount(aff_inst, minlength=num_institutions).clamp_(min=1).float()
+
+    step = columns_per_pass(num_authors, dim, memory_budget)
+    with ThreadPoolExecutor(max_workers=workers + 1) as pool:
+        for c0 in range(0, dim, step):
+            c1 = min(dim, c0 + step)
+            groups = _column_groups(c0, c1, workers)
+            sums = [torch.zeros(num_authors, hi - lo) for lo, hi in groups]
+
+            def read(p0):
+                return np.ascontiguousarray(paper_feat[p0:min(num_papers, p0 + block_rows)])
+
+            def add_papers(g, block, rows, authors):
+                lo, hi = groups[g]
+                x = torch.from_numpy(block[:, lo:hi].astype(np.float32))
+                sums[g].index_add_(0, authors, x[rows])
+
+            starts = range(0, num_papers, block_rows)
+            pending = pool.submit(read, 0)
+            for p0 in tqdm.tqdm(starts, desc='papers[:, %d:%d]' % (c0, c1)):
+                block = pending.result()
+                if p0 + block_rows < num_papers:
+                    pending = pool.submit(read, p0 + block_rows)
+                e0, e1 = int(paper_ptr[p0]), int(paper_ptr[p0 + block.shape[0]])
+                rows = torch.from_numpy(np.repeat(np.arange(block.shape[0]), np.diff(paper_ptr[p0:p0 + block.shape[0] + 1])))
+                authors = paper_author[e0:e1]
+                list(pool.map(lambda g: add_papers(g, block, rows, authors), range(len(groups))))
+
+            def finish_group(g):
+                lo, hi = groups[g]
+                author_mean = sums[g].div_(author_deg[:, None])
+                inst_sum = torch.zeros(num_institutions, hi - lo)
+                for e0 in range(0, aff_author.numel(), edge_block):
+                    inst_sum.index_add_(0, aff_inst[e0:e0 + edge_block], author_mean[aff_author[e0:e0 + edge_block]])
+                _write_rows(author_out, lo, hi, author_mean, block_rows)
+                _write_rows(inst_out, lo, hi, inst_sum.div_(inst_deg[:, None]), block_rows)
+
+            list(pool.map(finish_group, range(len(groups))))
+            del sums
+    author_out.flush()
+    inst_out.flush()
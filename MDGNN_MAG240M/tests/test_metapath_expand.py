@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "features"))
+
+from metapath_expand import expand_metapath  # noqa: E402
+from walk_aggregate import label_shares, mean_features  # noqa: E402
+
+
+NUM_PAPERS = 40
+NUM_AUTHORS = 25
+NUM_CLASSES = 4
+
+
+def random_csr(num_src, num_dst, num_edges, seed):
+    """CSR with duplicate edges; the last sources have no out-edges."""
+    rng = np.random.default_rng(seed)
+    src = rng.integers(0, num_src - 5, num_edges)
+    dst = rng.integers(0, num_dst, num_edges)
+    src, dst = np.concatenate([src, src[:10]]), np.concatenate([dst, dst[:10]])
+    order = np.argsort(src, kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=num_src))])
+    return indptr, dst[order]
+
+
+def metapath(seed=0):
+    """paper -> author -> paper, e.g. ['writed_by', 'writes']."""
+    return [random_csr(NUM_PAPERS, NUM_AUTHORS, 70, seed), random_csr(NUM_AUTHORS, NUM_PAPERS, 80, seed + 1)]
+
+
+def inputs(seed=0):
+    rng = np.random.default_rng(seed)
+    labels = rng.integers(0, NUM_CLASSES, NUM_PAPERS).astype(np.float32)
+    labels[rng.random(NUM_PAPERS) < 0.3] = np.nan
+    features = rng.standard_normal((NUM_PAPERS, 6)).astype(np.float16)
+    nids0 = np.concatenate([np.arange(NUM_PAPERS), [3, 3]])
+    return nids0, labels, features
+
+
+def out_edges(csr, nids):
+    """``graph.out_edges(nids, form='uv')`` on a CSR graph."""
+    indptr, indices = csr
+    nids = np.atleast_1d(nids)
+    sids = np.repeat(nids, indptr[nids + 1] - indptr[nids])
+    dids = np.concatenate([indices[indptr[n]:indptr[n + 1]] for n in nids]) if nids.size else nids
+    return sids, dids.astype(np.int64)
+
+
+# The per-node loops of features/feature.py before they moved to metapath_expand.
+
+
+def old_targets(csrs, nid0, ftype=None, num_common=2):
+    dids = nid0
+    for csr in csrs:
+        sids, dids = out_edges(csr, dids)
+    if ftype is None:
+        return np.unique(dids[(dids != nid0)])
+    if ftype == 'least':
+        if sids.size == 0:
+            # The old loop raised on argmin of an empty array; no targets now.
+            return dids
+        nids, cnts = np.unique(sids, return_counts=True)
+        sid = nids[np.argmin(cnts)]  # least middle
+        nids = dids[sids == sid]
+        return nids[(nids != nid0)]
+    nids, cnts = np.unique(dids, return_counts=True)
+    nids = nids[cnts >= num_common]
+    return nids[(nids != nid0)]
+
+
+def old_label(nids, labels, num_classes):
+    if len(nids) > 0:
+        lbs = labels[nids]
+        lbs = lbs[(lbs >= 0)].astype(np.int64)
+        if len(lbs) > 0:
+            ft = np.zeros((len(lbs), num_classes), dtype=np.float32)
+            ft[list(range(len(lbs))), lbs] = 1
+            return ft.sum(axis=0) / ft.sum()
+    return np.full(num_classes, 1. / num_classes, dtype=np.float32)
+
+
+def old_feat(nids, features):
+    if len(nids) > 0:
+        return features[nids].astype(np.float32).mean(axis=0)
+    return np.zeros(features.shape[1], dtype=np.float32)
+
+
+def expand_features(csrs, nids0, labels, features, ftype=None, num_common=2, max_pairs=1 << 25):
+    """What ``calc_neighborsample_*`` reduce the expansion to."""
+    kwargs = {} if ftype is None else dict(least=True) if ftype == 'least' else dict(min_mult=num_common)
+    group, nids, mult = expand_metapath(csrs, nids0, max_pairs=max_pairs, **kwargs)
+    weight = mult if ftype == 'least' else None
+    return (label_shares(group, nids, len(nids0), labels, NUM_CLASSES, weight=weight),
+            mean_features(group, nids, len(nids0), features, weight=weight))
+
+
+def test_expansion_matches_per_node_loops():
+    nids0, labels, features = inputs()
+    for seed in range(3):
+        csrs = metapath(seed)
+        for ftype, num_common in ((None, 1), ('common', 2), ('common', 3), ('least', 1)):
+            for max_pairs in (1 << 25, 16):
+                got_label, got_feat = expand_features(csrs, nids0, labels, features, ftype, num_common, max_pairs)
+                for i, nid0 in enumerate(nids0):
+                    nids = old_targets(csrs, nid0, ftype, num_common)
+                    assert np.array_equal(got_label[i], old_label(nids, labels, NUM_CLASSES)), (seed, ftype, nid0)
+                    assert np.allclose(got_feat[i], old_feat(nids, features), atol=1e-6), (seed, ftype, nid0)
+
+
+def test_least_keeps_multiplicity_and_breaks_ties_by_id():
+    # Paper 0 reaches author 1 twice and authors 2, 3 once; authors 2 and 3 tie
+    # on outgoing paths, so the smaller id (2) is the least middle.
+    to_author = (np.array([0, 4, 4, 4, 4, 4]), np.array([1, 1, 2, 3]))
+    to_paper = (np.array([0, 0, 2, 3, 4]), np.array([1, 1, 2, 3]))
+    group, nids, mult = expand_metapath([to_author, to_paper], np.array([0]), least=True)
+    assert nids.tolist() == [2] and mult.tolist() == [1], (nids, mult)
+    assert old_targets([to_author, to_paper], 0, 'least').tolist() == [2]
+
+    # Author 2 is reached twice (4 paths, author 3 has 5): its targets keep that multiplicity.
+    to_author = (np.array([0, 3, 3, 3, 3]), np.array([2, 2, 3]))
+    to_paper = (np.array([0, 0, 0, 2, 7]), np.array([1, 2, 1, 2, 3, 1, 2]))
+    group, nids, mult = expand_metapath([to_author, to_paper], np.array([0]), least=True)
+    assert nids.tolist() == [1, 2] and mult.tolist() == [2, 2], (nids, mult)
+    assert old_targets([to_author, to_paper], 0, 'least').tolist() == [1, 2, 1, 2]
+
+
+if __name__ == "__main__":
+    test_expansion_matches_per_node_loops()
+    test_least_keeps_multiplicity_and_breaks_ties_by_id()
+    print("metapath expand tests passed")
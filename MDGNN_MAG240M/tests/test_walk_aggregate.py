@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "features"))
+
+from walk_aggregate import feature_mean, label_distribution, topk_feature_mean, topk_label_distribution  # noqa: E402
+
+
+NUM_NODES = 60
+NUM_CLASSES = 5
+
+
+def random_csr(seed=0):
+    """CSR with duplicate edges, self loops and zero-degree nodes (40..59 have no out-edges)."""
+    rng = np.random.default_rng(seed)
+    src = rng.integers(0, 40, 240)
+    dst = rng.integers(0, NUM_NODES, 240)
+    src, dst = np.concatenate([src, src[:30], [3, 3]]), np.concatenate([dst, dst[:30], [3, 3]])
+    order = np.argsort(src, kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(src, minlength=NUM_NODES))])
+    return indptr, dst[order]
+
+
+def random_walks(csr, starts, length, seed=0):
+    """``dgl.sampling.random_walk``-style traces: ``-1`` after a dead end."""
+    indptr, indices = csr
+    rng = np.random.default_rng(seed)
+    traces = np.full((starts.size, length + 1), -1, dtype=np.int64)
+    traces[:, 0] = starts
+    for step in range(length):
+        cur = traces[:, step]
+        alive = cur >= 0
+        deg = np.zeros(starts.size, dtype=np.int64)
+        deg[alive] = indptr[cur[alive] + 1] - indptr[cur[alive]]
+        moving = np.flatnonzero(deg > 0)
+        pick = (rng.random(moving.size) * deg[moving]).astype(np.int64)
+        traces[moving, step + 1] = indices[indptr[cur[moving]] + pick]
+    return traces
+
+
+def inputs(seed=0):
+    rng = np.random.default_rng(seed)
+    nids0 = np.concatenate([rng.permutation(NUM_NODES)[:35], [5, 5, 44]])
+    traces = random_walks(random_csr(seed), np.repeat(nids0, 40), 2, seed)
+    labels = rng.integers(0, NUM_CLASSES, NUM_NODES).astype(np.float32)
+    labels[rng.random(NUM_NODES) < 0.3] = np.nan
+    labels[:4] = -1
+    features = rng.standard_normal((NUM_NODES, 8)).astype(np.float16)
+    return nids0, traces, labels, features
+
+
+# The per-node loops of features/feature.py before they moved to walk_aggregate.
+
+
+def old_mapper(traces):
+    traces = traces[traces[:, 0] != traces[:, -1]]
+    m = defaultdict(list)
+    for sid, *_, did in traces:
+        if did >= 0:
+            m[sid].append(did)
+    return {i: np.array(j) for i, j in m.items()}
+
+
+def old_label(nids0, traces, labels, num_classes):
+    mapper = old_mapper(traces)
+    feat = np.zeros((len(nids0), num_classes), dtype=np.float32)
+    for i, sid in enumerate(nids0):
+        if sid in mapper.keys():
+            dids = mapper[sid]
+            lbs = labels[dids]
+            mask = (dids != sid) & (lbs >= 0)
+            if mask.sum() < 1.0e-6:
+                feat[i, :] = 1. / num_classes
+            else:
+                ft = np.zeros((len(dids), num_classes), dtype=np.float32)
+                ft[mask, lbs[mask].astype(np.int64)] = 1
+                feat[i, :] = ft.sum(axis=0) / ft.sum()
+        else:
+            feat[i, :] = 1. / num_classes
+    return feat
+
+
+def old_feat(nids0, traces, features, feature_dim):
+    mapper = old_mapper(traces)
+    feat = np.zeros((len(nids0), feature_dim), dtype=np.float32)
+    for i, sid in enumerate(nids0):
+        if sid in mapper.keys():
+            feat[i, :] = features[mapper[sid]].astype(np.float32).mean(axis=0)
+    return feat
+
+
+def old_topk(dids, topk):
+    dids, cnts = np.unique(dids, return_counts=True)
+    # The old loop used the default unstable argsort; walk_aggregate breaks
+    # count ties towards larger ids, which a stable argsort of the sorted ids does too.
+    itk = np.argsort(cnts, kind="stable")[-topk:]
+    return dids[itk], cnts[itk]
+
+
+def old_topk_label(nids0, traces, labels, num_classes, topk):
+    mapper = old_mapper(traces)
+    feat = np.zeros((len(nids0), num_classes), dtype=np.float32)
+    for i, sid in enumerate(nids0):
+        if sid in mapper.keys():
+            dids, cnts = old_topk(mapper[sid], topk)
+            lbs = labels[dids]
+            mask = (dids != sid) & (lbs >= 0)
+            if mask.sum() < 1.0e-6:
+                feat[i, :] = 1. / num_classes
+            else:
+                ft = np.zeros((len(dids), num_classes), dtype=np.float32)
+                ft[mask, lbs[mask].astype(np.int64)] = 1
+                ft *= cnts.reshape((-1, 1))
+                feat[i, :] = ft.sum(axis=0) / cnts.sum()
+        else:
+            feat[i, :] = 1. / num_classes
+    return feat
+
+
+def old_topk_feat(nids0, traces, features, feature_dim, topk):
+    mapper = old_mapper(traces)
+    feat = np.zeros((len(nids0), feature_dim), dtype=np.float32)
+    for i, sid in enumerate(nids0):
+        if sid in mapper.keys():
+            dids, cnts = old_topk(mapper[sid], topk)
+            ft = features[dids].astype(np.float32) * cnts.reshape((-1, 1))
+            feat[i, :] = ft.sum(axis=0) / cnts.sum()
+    return feat
+
+
+def test_label_and_feature_means_match_loops():
+    for seed in range(3):
+        nids0, traces, labels, features = inputs(seed)
+        assert np.array_equal(label_distribution(traces, nids0, labels, NUM_CLASSES), old_label(nids0, traces, labels, NUM_CLASSES))
+        for chunk_rows in (1, 7, 65536):
+            got = feature_mean(traces, nids0, features, chunk_rows=chunk_rows)
+            assert np.allclose(got, old_feat(nids0, traces, features, 8), atol=1e-6), (seed, chunk_rows)
+
+
+def test_topk_matches_loops_with_ties():
+    for seed in range(3):
+        nids0, traces, labels, features = inputs(seed)
+        for topk in (1, 2, 10):
+            got = topk_label_distribution(traces, nids0, labels, NUM_CLASSES, topk=topk)
+            assert np.allclose(got, old_topk_label(nids0, traces, labels, NUM_CLASSES, topk), atol=1e-7), (seed, topk)
+            got = topk_feature_mean(traces, nids0, features, topk=topk, chunk_rows=5)
+            assert np.allclose(got, old_topk_feat(nids0, traces, features, 8, topk), atol=1e-6), (seed, topk)
+
+    # Node 1 reaches 7, 8 and 9 twice each: top-2 keeps the larger ids 8 and 9.
+    traces = np.array([[1, 7], [1, 7], [1, 9], [1, 8], [1, 9], [1, 8], [2, 2]])
+    labels = np.array([0, 0, 0, 0, 0, 0, 0, 0, 1, 2], dtype=np.float32)
+    got = topk_label_distribution(traces, np.array([1, 2]), labels, 3, topk=2)
+    assert np.allclose(got, [[0.0, 0.5, 0.5], [1 / 3, 1 / 3, 1 / 3]]), got
+
+
+if __name__ == "__main__":
+    test_label_and_feature_means_match_loops()
+    test_topk_matches_loops_with_ties()
+    print("walk aggregate tests passed")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Benchmark the ``temporal_weights`` kernels on synthetic graphs of real dataset sizes.
+
+Every GSMP counting kernel (``bincount``, ``unique``, ``sort``, ``auto``) is
+timed for each normalization on each device and compared against the
+``bincount`` result; SMP (which does not count groups) is timed once per
+normalization.  The ``mag`` preset is heterogeneous and additionally times the
+fused single-pass and the thread-pool-per-relation paths.
+
+    python benchmark_temporal_weights.py --presets arxiv pokec mag
+    python benchmark_temporal_weights.py --presets papers100M --scale 0.1 --devices cpu cuda
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Callable, Dict, List, Tuple
+
+import torch
+
+from temporal_weights import (
+    KERNELS,
+    NORMALIZATIONS,
+    hetero_temporal_edge_weights,
+    temporal_edge_weights,
+)
+
+
+# name -> (num_nodes, num_edges, first_year, num_years)
+HOMOGENEOUS_PRESETS: Dict[str, Tuple[int, int, int, int]] = {
+    "arxiv": (169_343, 2_315_598, 1971, 50),
+    "pokec": (1_632_803, 30_622_564, 2000, 13),
+    "papers100M": (111_059_956, 1_615_685_872, 1950, 70),
+}
+MAG_NODES = {"paper": 736_389, "author": 1_134_649, "field_of_study": 59_965, "institution": 8_740}
+MAG_RELATIONS = {
+    ("paper", "cites", "paper"): 5_416_271,
+    ("author", "writes", "paper"): 7_145_660,
+    ("paper", "has_topic", "field_of_study"): 7_505_078,
+    ("author", "affiliated_with", "institution"): 1_043_998,
+}
+PRESETS = tuple(HOMOGENEOUS_PRESETS) + ("mag",)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="SMP/GSMP temporal edge-weight kernel benchmark")
+    parser.add_argument("--presets", nargs="+", choices=PRESETS, default=["arxiv", "pokec", "mag"])
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply node and edge counts (papers100M needs < 1 on most hosts).")
+    parser.add_argument("--devices", nargs="+", default=["cpu"], help="Any of cpu, cuda; cuda is skipped when unavailable.")
+    parser.add_argument("--kernels", nargs="+", choices=KERNELS, default=list(KERNELS))
+    parser.add_argument("--normalizations", nargs="+", choices=NORMALIZATIONS, default=list(NORMALIZATIONS))
+    parser.add_argument("--group-by", choices=["src", "dst"], default="dst")
+    parser.add_argument("--missing-fraction", type=float, default=0.01, help="Share of nodes with a missing (-1) time.")
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=0, help="torch.set_num_threads; 0 keeps the default.")
+    parser.add_argument("--relation-threads", type=int, default=4, help="Thread pool size for the per-relation mag path.")
+    return parser.parse_args()
+
+
+def _node_times(gen: torch.Generator, num_nodes: int, first_year: int, num_years: int, missing_fraction: float) -> torch.Tensor:
+    times = torch.randint(first_year, first_year + num_years, (num_nodes,), generator=gen)
+    if missing_fraction > 0:
+        times[torch.rand(num_nodes, generator=gen) < missing_fraction] = -1
+    return times
+
+
+def _scaled(count: int, scale: float) -> int:
+    return max(1, int(count * scale))
+
+
+def _time_best(fn: Callable[[], object], repeats: int, device: torch.device) -> Tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeats):
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        start = time.perf_counter()
+        out = fn()
+        if device.type == "cuda":
+            torch.cuda.synchronize(device)
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def _max_diff(got, reference) -> float:
+    if isinstance(got, dict):
+        return max((_max_diff(got[key], reference[key]) for key in reference), default=0.0)
+    return float((got.cpu() - reference.cpu()).abs().max().item()) if got.numel() else 0.0
+
+
+def bench_homogeneous(name: str, args: argparse.Namespace, device: torch.device) -> None:
+    num_nodes, num_edges, first_year, num_years = HOMOGENEOUS_PRESETS[name]
+    num_nodes, num_edges = _scaled(num_nodes, args.scale), _scaled(num_edges, args.scale)
+    gen = torch.Generator().manual_seed(0)
+    node_time = _node_times(gen, num_nodes, first_year, num_years, args.missing_fraction).to(device)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=gen).to(device)
+    print(
+        f"[BENCH][{name}] device={device} nodes={num_nodes} edges={num_edges} years={num_years} "
+        f"group_by={args.group_by} threads={torch.get_num_threads()}",
+        flush=True,
+    )
+
+    for normalize in args.normalizations:
+        reference = None
+        timings: Dict[str, float] = {}
+        for kernel in ["bincount"] + [k for k in args.kernels if k != "bincount"]:
+            seconds, weights = _time_best(
+                lambda: temporal_edge_weights(
+                    edge_index, node_time, scheme="gsmp", group_by=args.group_by, normalize=normalize, kernel=kernel
+                ),
+                args.repeats,
+                device,
+            )
+            reference = weights if reference is None else reference
+            if kernel not in args.kernels:
+                continue
+            timings[kernel] = seconds
+            print(
+                f"[BENCH][{name}] scheme=gsmp normalize={normalize} kernel={kernel} time={seconds:.3f}s "
+                f"max_abs_diff={_max_diff(weights, reference):.3e}",
+                flush=True,
+            )
+        fastest = min(timings, key=timings.get)
+        print(f"[BENCH][{name}] scheme=gsmp normalize={normalize} fastest={fastest}", flush=True)
+
+        seconds, _ = _time_best(
+            lambda: temporal_edge_weights(edge_index, node_time, scheme="smp", group_by=args.group_by, normalize=normalize),
+            args.repeats,
+            device,
+        )
+        print(f"[BENCH][{name}] scheme=smp normalize={normalize} time={seconds:.3f}s", flush=True)
+
+
+def bench_mag(args: argparse.Namespace, device: torch.device) -> None:
+    gen = torch.Generator().manual_seed(0)
+    num_nodes = {node_type: _scaled(count, args.scale) for node_type, count in MAG_NODES.items()}
+    time_dict = {
+        node_type: _node_times(gen, count, 2010, 10, args.missing_fraction).to(device)
+        for node_type, count in num_nodes.items()
+    }
+    edge_index_dict = {}
+    for (src_type, rel, dst_type), count in MAG_RELATIONS.items():
+        count = _scaled(count, args.scale)
+        edge_index_dict[(src_type, rel, dst_type)] = torch.stack(
+            [
+                torch.randint(0, num_nodes[src_type], (count,), generator=gen),
+                torch.randint(0, num_nodes[dst_type], (count,), generator=gen),
+            ]
+        ).to(device)
+    total_edges = sum(ei.size(1) for ei in edge_index_dict.values())
+    print(
+        f"[BENCH][mag] device={device} relations={len(edge_index_dict)} edges={total_edges} "
+        f"group_by={args.group_by} threads={torch.get_num_threads()}",
+        flush=True,
+    )
+
+    for normalize in args.normalizations:
+        reference = None
+        variants: List[Tuple[str, str, int]] = [("bincount", "fused", 0)]
+        variants += [(kernel, "fused", 0) for kernel in args.kernels if kernel != "bincount"]
+        variants += [(kernel, "threads", args.relation_threads) for kernel in args.kernels]
+        for kernel, mode, num_threads in variants:
+            seconds, weights = _time_best(
+                lambda: hetero_temporal_edge_weights(
+                    edge_index_dict, time_dict, scheme="gsmp", group_by=args.group_by,
+                    normalize=normalize, kernel=kernel, num_threads=num_threads,
+                ),
+                args.repeats,
+                device,
+            )
+            reference = weights if reference is None else reference
+            if kernel not in args.kernels:
+                continue
+            print(
+                f"[BENCH][mag] scheme=gsmp normalize={normalize} kernel={kernel} mode={mode} "
+                f"time={seconds:.3f}s max_abs_diff={_max_diff(weights, reference):.3e}",
+                flush=True,
+            )
+
+        seconds, _ = _time_best(
+            lambda: hetero_temporal_edge_weights(
+                edge_index_dict, time_dict, scheme="smp", group_by=args.group_by, normalize=normalize
+            ),
+            args.repeats,
+            device,
+        )
+        print(f"[BENCH][mag] scheme=smp normalize={normalize} time={seconds:.3f}s", flush=True)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    for device_name in args.devices:
+        if device_name == "cuda" and not torch.cuda.is_available():
+            print("[BENCH] cuda not available, skipping", flush=True)
+            continue
+        device = torch.device(device_name)
+        for name in args.presets:
+            if name == "mag":
+                bench_mag(args, device)
+            else:
+                bench_homogeneous(name, args, device)
+
+
+if __name__ == "__main__":
+    main()
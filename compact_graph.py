@@ -0,0 +1,373 @@
+"""Opt-in compact storage for edge lists and edge weights.
+
+Edge tensors are stored as int64 indices and float32 weights everywhere, which
+for papers100M's ~3.2B undirected edges is ~25 GB of indices alone.  A
+``CompactGraph`` keeps ``edge_index`` as int32 whenever every endpoint id fits
+(``num_nodes < 2**31``) and the weights as float16/bfloat16 on request.  Values
+are only widened inside the kernels that need it:
+
+- ``temporal_weights`` runs the SMP/GSMP functions of ``temporal_weights.py``
+  (which accept int32 indices directly) and stores the result compactly;
+- ``csr`` counting-sorts the edges into a ``CompactCSR`` (int64 ``indptr``,
+  int32 ``indices``, float32 values, duplicates summed like ``coalesce()``)
+  chunk by chunk; ``to_scipy_csr``/``to_torch_csr`` wrap it for scipy/torch;
+- ``gcn_norm_csr`` is the ``set_diag`` + ``D^-1/2 A D^-1/2`` adjacency the
+  papers100M preprocessing scripts feed to row-block propagation, normalized
+  one row block at a time.
+
+scipy and torch keep ``indptr`` and ``indices`` in one dtype, so a matrix with
+more than ``2**31 - 1`` entries gets int64 column indices there.  ``CompactCSR``
+keeps them int32 and hands out row blocks (``adj[start:end]``) as scipy
+matrices that stay int32 while the block's own entries fit.
+
+``save``/``load`` write ``edge_index.npy``/``edge_weight.npy`` plus ``meta.json``
+and map them back with ``np.load(mmap_mode="c")`` (bfloat16 is stored as its
+raw uint16 bits).
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+import numpy as np
+import scipy.sparse as sp
+import torch
+from torch import Tensor
+
+from temporal_weights import temporal_edge_weights
+
+
+WEIGHT_DTYPES: Dict[str, torch.dtype] = {
+    "float32": torch.float32,
+    "float16": torch.float16,
+    "bfloat16": torch.bfloat16,
+}
+INT32_LIMIT = int(np.iinfo(np.int32).max)
+CSR_CHUNK_EDGES = 50_000_000
+
+
+def index_dtype_for(num_nodes: int) -> torch.dtype:
+    """int32 when every node id in ``[0, num_nodes)`` fits, else int64."""
+    return torch.int32 if int(num_nodes) <= INT32_LIMIT else torch.int64
+
+
+def compact_edge_index(edge_index: Tensor, num_nodes: int) -> Tensor:
+    """``edge_index`` in the narrowest index dtype that holds ``num_nodes`` ids."""
+    return edge_index.to(index_dtype_for(num_nodes))
+
+
+def resolve_weight_dtype(name: Union[str, torch.dtype]) -> torch.dtype:
+    if isinstance(name, torch.dtype):
+        if name not in WEIGHT_DTYPES.values():
+            raise ValueError(f"weight dtype must be one of {tuple(WEIGHT_DTYPES)}, got {name}")
+        return name
+    if name not in WEIGHT_DTYPES:
+        raise ValueError(f"weight dtype must be one of {tuple(WEIGHT_DTYPES)}, got {name!r}")
+    return WEIGHT_DTYPES[name]
+
+
+def _to_numpy(tensor: Tensor) -> np.ndarray:
+    tensor = tensor.detach().cpu().contiguous()
+    if tensor.dtype == torch.bfloat16:
+        return tensor.view(torch.int16).numpy().view(np.uint16)
+    return tensor.numpy()
+
+
+def _from_numpy(array: np.ndarray, dtype: torch.dtype) -> Tensor:
+    if dtype == torch.bfloat16:
+        return torch.from_numpy(array.view(np.int16)).view(torch.bfloat16)
+    return torch.from_numpy(array)
+
+
+class CompactGraph:
+    """``[2, E]`` (src, dst) edges and optional per-edge weights in storage dtypes.
+
+    ``num_src``/``num_dst`` are the node counts of both sides (equal for a
+    homogeneous graph).  Pass ``compact=False`` to keep int64 indices.
+    """
+
+    def __init__(
+        self,
+        edge_index: Tensor,
+        num_src: int,
+        num_dst: Optional[int] = None,
+        edge_weight: Optional[Tensor] = None,
+        weight_dtype: Union[str, torch.dtype] = "float32",
+        compact: bool = True,
+    ) -> None:
+        if edge_index.dim() != 2 or edge_index.size(0) != 2:
+            raise ValueError(f"edge_index must have shape [2, E], got {tuple(edge_index.shape)}")
+        self.num_src = int(num_src)
+        self.num_dst = int(num_src if num_dst is None else num_dst)
+        index_dtype = index_dtype_for(max(self.num_src, self.num_dst)) if compact else torch.int64
+        self.edge_index = edge_index.to(index_dtype)
+        self.weight_dtype = resolve_weight_dtype(weight_dtype)
+        self.edge_weight: Optional[Tensor] = None
+        if edge_weight is not None:
+            self.set_weight(edge_weight)
+
+    @property
+    def num_edges(self) -> int:
+        return int(self.edge_index.size(1))
+
+    @property
+    def src(self) -> Tensor:
+        return self.edge_index[0]
+
+    @property
+    def dst(self) -> Tensor:
+        return self.edge_index[1]
+
+    def nbytes(self) -> int:
+        total = self.edge_index.numel() * self.edge_index.element_size()
+        if self.edge_weight is not None:
+            total += self.edge_weight.numel() * self.edge_weight.element_size()
+        return total
+
+    def set_weight(self, edge_weight: Tensor) -> "CompactGraph":
+        edge_weight = edge_weight.view(-1)
+        if edge_weight.numel() != self.num_edges:
+            raise ValueError(f"edge_weight has {edge_weight.numel()} entries for {self.num_edges} edges.")
+        self.edge_weight = edge_weight.to(self.weight_dtype)
+        return self
+
+    def weight(self) -> Tensor:
+        """float32 weights (ones when unweighted)."""
+        if self.edge_weight is None:
+            return torch.ones(self.num_edges, dtype=torch.float32, device=self.edge_index.device)
+        return self.edge_weight.float()
+
+    def temporal_weights(self, node_time: Optional[Tensor] = None, **kwargs) -> "CompactGraph":
+        """Compute SMP/GSMP weights with ``temporal_edge_weights(**kwargs)`` and store them."""
+        if node_time is not None:
+            kwargs.setdefault("num_nodes", self.num_dst if kwargs.get("group_by", "dst") == "dst" else self.num_src)
+        return self.set_weight(temporal_edge_weights(self.edge_index, node_time, **kwargs))
+
+    def _csr_chunks(self, by: str, edge_weight: Optional[Tensor], drop_loops: bool, chunk_edges: int):
+        """Yield ``(rows, cols, float32 weights)`` numpy slices of at most ``chunk_edges`` edges."""
+        src = self.src.detach().cpu().numpy()
+        dst = self.dst.detach().cpu().numpy()
+        rows, cols = (dst, src) if by == "dst" else (src, dst)
+        weight = self.edge_weight if edge_weight is None else edge_weight.view(-1)
+        for start in range(0, self.num_edges, chunk_edges):
+            end = min(start + chunk_edges, self.num_edges)
+            r, c = rows[start:end], cols[start:end]
+            if weight is None:
+                w = np.ones(end - start, dtype=np.float32)
+            else:
+                w = weight[start:end].detach().cpu().float().numpy()
+            if drop_loops:
+                keep = r != c
+                r, c, w = r[keep], c[keep], w[keep]
+            yield r, c, w
+
+    def csr(
+        self,
+        by: str = "dst",
+        edge_weight: Optional[Tensor] = None,
+        set_diag: bool = False,
+        chunk_edges: int = CSR_CHUNK_EDGES,
+    ) -> "CompactCSR":
+        """CSR with one row per ``by`` node (``"dst"``: ``[num_dst, num_src]``), duplicates summed.
+
+        ``set_diag`` replaces existing self-loops by unit-weight ones.
+        """
+        if by not in {"src", "dst"}:
+            raise ValueError(f"by must be 'src' or 'dst', got {by!r}")
+        shape = (self.num_dst, self.num_src) if by == "dst" else (self.num_src, self.num_dst)
+        if set_diag and shape[0] != shape[1]:
+            raise ValueError("set_diag needs a homogeneous graph.")
+
+        def chunks():
+            yield from self._csr_chunks(by, edge_weight, set_diag, chunk_edges)
+            if set_diag:
+                for start in range(0, shape[0], chunk_edges):
+                    loops = np.arange(start, min(start + chunk_edges, shape[0]))
+                    yield loops, loops, np.ones(loops.size, dtype=np.float32)
+
+        return build_csr(chunks, shape, chunk_edges)
+
+    def to_scipy_csr(self, by: str = "dst", edge_weight: Optional[Tensor] = None) -> sp.csr_matrix:
+        """``csr(by, edge_weight)`` as a scipy matrix (int64 indices past ``2**31 - 1`` entries)."""
+        return self.csr(by, edge_weight).tocsr()
+
+    def to_torch_csr(self, by: str = "dst", edge_weight: Optional[Tensor] = None) -> Tensor:
+        return scipy_to_torch_csr(self.csr(by, edge_weight))
+
+    def gcn_norm_csr(self, set_diag: bool = True, chunk_edges: int = CSR_CHUNK_EDGES) -> "CompactCSR":
+        """``D^-1/2 (A [+ I]) D^-1/2`` with rows indexed by source, as ``SparseTensor(row=src, col=dst)``.
+
+        ``set_diag`` replaces existing self-loops by unit-weight ones; degrees
+        are weighted row sums and isolated rows get 0.
+        """
+        if self.num_src != self.num_dst:
+            raise ValueError("gcn_norm_csr needs a homogeneous graph.")
+        adj = self.csr(by="src", set_diag=set_diag, chunk_edges=chunk_edges)
+        blocks = list(adj.row_blocks(chunk_edges))
+        deg = np.zeros(adj.shape[0], dtype=np.float32)
+        for start, end in blocks:
+            deg[start:end] = np.asarray(adj[start:end].sum(axis=1), dtype=np.float32).reshape(-1)
+        with np.errstate(divide="ignore"):
+            deg_inv_sqrt = np.power(deg, -0.5, dtype=np.float32)
+        deg_inv_sqrt[np.isinf(deg_inv_sqrt)] = 0
+        for start, end in blocks:
+            e0, e1 = int(adj.indptr[start]), int(adj.indptr[end])
+            row_scale = np.repeat(deg_inv_sqrt[start:end], np.diff(adj.indptr[start : end + 1]))
+            adj.data[e0:e1] = row_scale * adj.data[e0:e1] * deg_inv_sqrt[adj.indices[e0:e1]]
+        return adj
+
+    def save(self, path: Union[str, Path]) -> None:
+        """Write the graph to directory ``path``; the directory appears atomically."""
+        path = Path(path)
+        tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+        tmp_path.mkdir(parents=True, exist_ok=True)
+        np.save(tmp_path / "edge_index.npy", _to_numpy(self.edge_index))
+        if self.edge_weight is not None:
+            np.save(tmp_path / "edge_weight.npy", _to_numpy(self.edge_weight))
+        meta = {
+            "num_src": self.num_src,
+            "num_dst": self.num_dst,
+            "weight_dtype": str(self.weight_dtype).replace("torch.", ""),
+            "weighted": self.edge_weight is not None,
+        }
+        with open(tmp_path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path], mmap: bool = True) -> "CompactGraph":
+        path = Path(path)
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        mode = "c" if mmap else None
+        dtype = WEIGHT_DTYPES[meta["weight_dtype"]]
+        graph = cls.__new__(cls)
+        graph.num_src, graph.num_dst = int(meta["num_src"]), int(meta["num_dst"])
+        graph.weight_dtype = dtype
+        graph.edge_index = torch.from_numpy(np.load(path / "edge_index.npy", mmap_mode=mode))
+        graph.edge_weight = None
+        if meta["weighted"]:
+            graph.edge_weight = _from_numpy(np.load(path / "edge_weight.npy", mmap_mode=mode), dtype)
+        return graph
+
+
+class CompactCSR:
+    """CSR arrays with int64 ``indptr`` and int32 ``indices`` whenever the column ids fit.
+
+    Row slices ``adj[start:end]`` are scipy ``csr_matrix`` views of the
+    arrays; ``format`` is ``"csr"`` like scipy's, so row-block consumers take
+    either.
+    """
+
+    format = "csr"
+
+    def __init__(self, indptr: np.ndarray, indices: np.ndarray, data: np.ndarray, shape) -> None:
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = (int(shape[0]), int(shape[1]))
+
+    @property
+    def nnz(self) -> int:
+        return int(self.indptr[-1])
+
+    def __getitem__(self, rows: slice) -> sp.csr_matrix:
+        if not isinstance(rows, slice):
+            raise TypeError("CompactCSR only supports row slices.")
+        start, end, step = rows.indices(self.shape[0])
+        if step != 1:
+            raise ValueError("CompactCSR only supports contiguous row slices.")
+        end = max(start, end)
+        e0, e1 = int(self.indptr[start]), int(self.indptr[end])
+        return sp.csr_matrix(
+            (self.data[e0:e1], self.indices[e0:e1], self.indptr[start : end + 1] - e0),
+            shape=(end - start, self.shape[1]),
+        )
+
+    def row_blocks(self, chunk_edges: int = CSR_CHUNK_EDGES):
+        """``(start, end)`` row ranges of at most ``chunk_edges`` entries (at least one row each)."""
+        num_rows = self.shape[0]
+        start = 0
+        while start < num_rows:
+            end = int(np.searchsorted(self.indptr, self.indptr[start] + chunk_edges, side="right")) - 1
+            end = min(max(end, start + 1), num_rows)
+            yield start, end
+            start = end
+
+    def tocsr(self) -> sp.csr_matrix:
+        """The whole matrix in scipy (int64 indices once nnz exceeds ``2**31 - 1``)."""
+        return self[:]
+
+    def toarray(self) -> np.ndarray:
+        return self.tocsr().toarray()
+
+
+def build_csr(chunks, shape, chunk_edges: int = CSR_CHUNK_EDGES) -> CompactCSR:
+    """``CompactCSR`` of the ``(rows, cols, weights)`` numpy triples yielded by ``chunks()``.
+
+    ``chunks`` is called twice: once to count the entries per row, once to
+    counting-sort them into place (stable, so repeated ``(row, col)`` entries
+    are summed in input order).  The only nnz-sized arrays are the output
+    ``indices``/``data``; duplicates are merged one row block at a time.
+    """
+    num_rows, num_cols = int(shape[0]), int(shape[1])
+    counts = np.zeros(num_rows, dtype=np.int64)
+    for rows, _, _ in chunks():
+        counts += np.bincount(rows, minlength=num_rows)
+    indptr = np.zeros(num_rows + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    index_dtype = np.int32 if index_dtype_for(num_cols) == torch.int32 else np.int64
+    indices = np.empty(int(indptr[-1]), dtype=index_dtype)
+    data = np.empty(int(indptr[-1]), dtype=np.float32)
+    fill = indptr[:-1].copy()
+    for rows, cols, weight in chunks():
+        if rows.size == 0:
+            continue
+        # Sorting (row, position) keys is a stable sort by row without argsort(kind="stable").
+        keys = rows.astype(np.int64)
+        keys *= rows.size
+        keys += np.arange(rows.size)
+        keys.sort()
+        sorted_rows, order = np.divmod(keys, rows.size)
+        del keys
+        chunk_counts = np.bincount(rows, minlength=num_rows)
+        pos = (fill - np.cumsum(chunk_counts) + chunk_counts)[sorted_rows]
+        del sorted_rows
+        pos += np.arange(rows.size)
+        indices[pos] = cols[order]
+        data[pos] = weight[order]
+        fill += chunk_counts
+
+    adj = CompactCSR(indptr, indices, data, (num_rows, num_cols))
+    written = 0
+    for start, end in list(adj.row_blocks(chunk_edges)):
+        block = adj[start:end]
+        block.sum_duplicates()
+        indices[written : written + block.nnz] = block.indices
+        data[written : written + block.nnz] = block.data
+        counts[start:end] = np.diff(block.indptr)
+        written += block.nnz
+    np.cumsum(counts, out=indptr[1:])
+    adj.indices, adj.data = indices[:written], data[:written]
+    return adj
+
+
+def scipy_to_torch_csr(adj: Union[sp.csr_matrix, CompactCSR]) -> Tensor:
+    """Wrap a scipy CSR matrix or ``CompactCSR`` as a torch sparse CSR tensor.
+
+    torch needs one dtype for both index arrays: int32 while nnz and the
+    column ids fit, int64 otherwise.
+    """
+    fits = int(adj.indptr[-1]) <= INT32_LIMIT and adj.indices.dtype == np.int32
+    index_dtype = np.int32 if fits else np.int64
+    return torch.sparse_csr_tensor(
+        torch.from_numpy(adj.indptr.astype(index_dtype, copy=False)),
+        torch.from_numpy(adj.indices.astype(index_dtype, copy=False)),
+        torch.from_numpy(adj.data.astype(np.float32, copy=False)),
+        size=adj.shape,
+    )
@@ -10,6 +10,9 @@ from torch import Tensor
 from torch_geometric.data import Data
 from torch_geometric.nn import GCNConv
 
+from temporal_split import RangeSplit, temporal_split
+from temporal_weights import smp_single_mask
+
 
 def compute_smp_edge_mask(
     edge_index: Tensor,
@@ -29,9 +32,7 @@ def compute_smp_edge_mask(
         t_max = float(time.max().item())
 
     src, dst = edge_index
-    delta = (time[src] - time[dst]).abs()
-    radius = torch.minimum(time[dst] - t_min, t_max - time[dst])
-    return delta > radius
+    return smp_single_mask(time[src], time[dst], t_min, t_max, single_on_equal=False)
 
 
 def preprocess_graph_structure_with_smp(
@@ -82,15 +83,12 @@ def make_masks_from_time(
     val_until: Optional[int] = 41,
 ) -> Tuple[Tensor, Tensor, Tensor]:
     """Default temporal split for Elliptic: train early steps, test later steps."""
-    node_time = node_time.view(-1)
-    train_mask = node_time <= train_until
     if val_until is None or val_until <= train_until:
-        val_mask = torch.zeros_like(train_mask, dtype=torch.bool)
-        test_mask = node_time > train_until
+        spec = RangeSplit(train=(None, train_until), test=(train_until, None))
     else:
-        val_mask = (node_time > train_until) & (node_time <= val_until)
-        test_mask = node_time > val_until
-    return train_mask, val_mask, test_mask
+        spec = RangeSplit(train=(None, train_until), valid=(train_until, val_until), test=(val_until, None))
+    masks = temporal_split(node_time, spec, output="mask")
+    return masks["train"], masks["valid"], masks["test"]
 
 
 def load_elliptic_bitcoin(
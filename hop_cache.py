@@ -0,0 +1,197 @@
+"""Content-addressed on-disk cache for propagated hop features.
+
+Entries are keyed by a hash of everything that determines ``A^k X``: the graph,
+the edge weights, the normalization mode and the feature source.  Each hop is
+stored as its own ``.npy`` file so it can be memory-mapped back instead of
+deserialized, and concurrent runs (seeds, ablation methods) that share a
+configuration reuse one copy.  Entries are evicted least-recently-used first
+once the cache grows beyond ``max_bytes``.
+
+Layout::
+
+    root/<key>/meta.json      # description of the parts that produced the key
+    root/<key>/hop_<k>.npy    # one array per hop
+    root/<key>/.last_used     # touched on every read/write, drives LRU eviction
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import torch
+
+
+HASH_CHUNK_BYTES = 64 << 20
+
+
+def _array_bytes(value: Any) -> np.ndarray:
+    if isinstance(value, torch.Tensor):
+        value = value.detach().cpu().contiguous().view(-1)
+        return value.view(torch.uint8).numpy()
+    value = np.ascontiguousarray(value).reshape(-1)
+    return value.view(np.uint8)
+
+
+def _update(hasher: Any, value: Any) -> None:
+    if value is None or isinstance(value, (str, int, float, bool)):
+        hasher.update(repr(value).encode())
+    elif isinstance(value, (list, tuple)):
+        hasher.update(f"seq{len(value)}".encode())
+        for item in value:
+            _update(hasher, item)
+    elif isinstance(value, dict):
+        hasher.update(f"map{len(value)}".encode())
+        for name in sorted(value):
+            hasher.update(str(name).encode())
+            _update(hasher, value[name])
+    elif isinstance(value, (torch.Tensor, np.ndarray)):
+        hasher.update(f"{tuple(value.shape)}|{value.dtype}".encode())
+        raw = _array_bytes(value)
+        # Every byte is hashed, in chunks so that memory-mapped inputs are streamed.
+        for start in range(0, raw.size, HASH_CHUNK_BYTES):
+            hasher.update(memoryview(raw[start : start + HASH_CHUNK_BYTES]))
+    else:
+        raise TypeError(f"Cannot fingerprint value of type {type(value).__name__}.")
+
+
+def fingerprint(value: Any) -> str:
+    """Stable hex digest of tensors, arrays, scalars and nested containers of them."""
+    hasher = hashlib.blake2b(digest_size=16)
+    _update(hasher, value)
+    return hasher.hexdigest()
+
+
+def _describe(value: Any) -> Any:
+    if isinstance(value, (torch.Tensor, np.ndarray)):
+        return {"shape": list(value.shape), "dtype": str(value.dtype), "hash": fingerprint(value)}
+    if isinstance(value, (list, tuple)):
+        return [_describe(item) for item in value]
+    if isinstance(value, dict):
+        return {str(name): _describe(item) for name, item in value.items()}
+    return value
+
+
+class HopFeatureCache:
+    """LRU, size-capped store of per-hop feature matrices."""
+
+    def __init__(self, root: str | os.PathLike[str], max_bytes: Optional[int] = None) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+
+    def key(self, graph: Any, edge_weight: Any, norm: str, features: Any, **extra: Any) -> str:
+        """Hash the inputs that fully determine the propagated hops.
+
+        ``features`` may be the feature matrix itself or a string naming its
+        source (e.g. a pretrained embedding path).  ``extra`` covers anything
+        else that changes the stored rows, such as a row selection.
+        """
+        parts = {"graph": graph, "edge_weight": edge_weight, "norm": norm, "features": features, **extra}
+        # Every array is hashed once; the key is the digest of its description.
+        meta = _describe(parts)
+        key = fingerprint(meta)
+        meta_path = self.root / key / "meta.json"
+        if not meta_path.exists():
+            meta_path.parent.mkdir(parents=True, exist_ok=True)
+            self._atomic_write_text(meta_path, json.dumps(meta, indent=2))
+        return key
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key
+
+    def _hop_path(self, key: str, hop: int) -> Path:
+        return self._entry(key) / f"hop_{hop}.npy"
+
+    def _touch(self, key: str) -> None:
+        marker = self._entry(key) / ".last_used"
+        marker.touch()
+        now = time.time()
+        os.utime(marker, (now, now))
+
+    @staticmethod
+    def _atomic_write_text(path: Path, text: str) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp_")
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp, path)
+
+    def has(self, key: str, hops: Iterable[int]) -> bool:
+        return all(self._hop_path(key, hop).exists() for hop in hops)
+
+    def load(self, key: str, hops: Iterable[int], mmap: bool = True) -> Optional[List[torch.Tensor]]:
+        """Return the requested hops as tensors, or ``None`` if any is missing.
+
+        With ``mmap=True`` the tensors are copy-on-write views of the cache
+        files, so processes reading the same entry share the page cache.
+        """
+        hops = list(hops)
+        if not self.has(key, hops):
+            return None
+        mode = "c" if mmap else None
+        out = [torch.from_numpy(np.load(self._hop_path(key, hop), mmap_mode=mode)) for hop in hops]
+        self._touch(key)
+        return out
+
+    def save_hop(self, key: str, hop: int, value: Any) -> Path:
+        """Atomically write one hop and evict old entries if over budget."""
+        if isinstance(value, torch.Tensor):
+            value = value.detach().cpu().numpy()
+        path = self._hop_path(key, hop)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp_", suffix=".npy")
+        with os.fdopen(fd, "wb") as f:
+            np.save(f, np.ascontiguousarray(value))
+        os.replace(tmp, path)
+        self._touch(key)
+        self.evict(keep=key)
+        return path
+
+    def save(self, key: str, hops: Dict[int, Any]) -> None:
+        for hop, value in hops.items():
+            self.save_hop(key, hop, value)
+
+    def entry_bytes(self, key: str) -> int:
+        return sum(path.stat().st_size for path in self._entry(key).glob("*.npy"))
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Drop least-recently-used entries until the cache fits ``max_bytes``."""
+        if self.max_bytes is None:
+            return []
+        entries = []
+        for entry in self.root.iterdir():
+            if not entry.is_dir():
+                continue
+            marker = entry / ".last_used"
+            last_used = marker.stat().st_mtime if marker.exists() else entry.stat().st_mtime
+            entries.append((last_used, entry.name, self.entry_bytes(entry.name)))
+        total = sum(size for _, _, size in entries)
+        removed = []
+        for _, name, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            shutil.rmtree(self._entry(name), ignore_errors=True)
+            total -= size
+            removed.append(name)
+        return removed
+
+
+def file_source(path: str | os.PathLike[str]) -> tuple:
+    """Cheap identity of a feature file (path, size, mtime) for use as ``features``."""
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_size, int(stat.st_mtime))
+
+
+def open_hop_cache(root: Optional[str], max_gb: float = 0.0) -> Optional[HopFeatureCache]:
+    """Return a cache for ``--hop_cache_dir``-style options, or ``None`` when unset."""
+    if not root:
+        return None
+    return HopFeatureCache(root, max_bytes=int(max_gb * (1 << 30)))
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
+import hashlib
+import os
+import sys
 from dataclasses import asdict, dataclass, field
+from pathlib import Path
 from typing import Optional
 
 import torch
 from torch_geometric.utils import to_undirected
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from temporal_weights import normalize_edge_weights, smp_single_mask, time_groups  # noqa: E402
+
 
 @dataclass
 class EdgePreprocessResult:
@@ -14,6 +21,47 @@ class EdgePreprocessResult:
     stats: dict[str, object] = field(default_factory=dict)
 
 
+@dataclass
+class EdgeYearGroups:
+    """Edges grouped by (dst, src_year) with one stable sort of the packed keys.
+
+    Every edge-level rule of the four modes depends only on the source year and
+    on the target (its year for SMP/UMP, its id for GSMP), so each is evaluated
+    once per group and broadcast back to the edges through ``edge_group``.
+    """
+
+    num_years: int
+    group_dst: torch.Tensor  # [num_groups] target node of each group
+    group_src_year: torch.Tensor  # [num_groups] source year of each group
+    group_size: torch.Tensor  # [num_groups] number of edges in each group
+    edge_group: torch.Tensor  # [num_edges] group id of each edge
+
+    @classmethod
+    def build(cls, edge_index: torch.Tensor, node_year: torch.Tensor) -> "EdgeYearGroups":
+        year_group, num_years = time_groups(node_year, missing="group")
+        year_values = torch.zeros(num_years, dtype=node_year.dtype)
+        year_values[year_group] = node_year
+        keys = edge_index[1] * num_years + year_group[edge_index[0]]
+        sorted_keys, order = torch.sort(keys, stable=True)
+        groups, group_size = torch.unique_consecutive(sorted_keys, return_counts=True)
+        edge_group = torch.empty_like(keys)
+        edge_group[order] = torch.repeat_interleave(torch.arange(groups.numel()), group_size)
+        return cls(
+            num_years=num_years,
+            group_dst=groups // num_years,
+            group_src_year=year_values[groups % num_years],
+            group_size=group_size,
+            edge_group=edge_group,
+        )
+
+    def dst_year(self, node_year: torch.Tensor) -> torch.Tensor:
+        return node_year[self.group_dst]
+
+
+MODES = ("baseline", "smp", "ump", "gsmp")
+EDGE_CACHE_VERSION = 1
+
+
 def preprocess_edges(
     edge_index: torch.Tensor,
     node_year: torch.Tensor,
@@ -22,65 +70,122 @@ def preprocess_edges(
     make_undirected: bool = True,
 ) -> EdgePreprocessResult:
     mode = mode.lower()
-    if mode not in {"baseline", "smp", "ump", "gsmp"}:
+    if mode not in MODES:
         raise ValueError(f"Unknown mode: {mode}")
+    return preprocess_all_modes(edge_index, node_year, num_nodes, make_undirected=make_undirected, modes=(mode,))[mode]
+
+
+def preprocess_all_modes(
+    edge_index: torch.Tensor,
+    node_year: torch.Tensor,
+    num_nodes: int,
+    make_undirected: bool = True,
+    modes: tuple[str, ...] = MODES,
+    cache_dir: Optional[str | Path] = None,
+) -> dict[str, EdgePreprocessResult]:
+    """Edge variants for several modes from one ``to_undirected`` and one (dst, src_year) sort.
+
+    The sort (``EdgeYearGroups``) gives the GSMP group sizes directly, and the
+    SMP single-edge mask and UMP keep mask are evaluated once per group.
+
+    Results equal ``preprocess_edges`` for every mode. With ``cache_dir`` all
+    four modes are written to ``<cache_dir>/<fingerprint>/<mode>.pt`` on the
+    first call, so later runs (other seeds or sweep jobs) only load the mode
+    they need.
+    """
+    modes = tuple(mode.lower() for mode in modes)
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        raise ValueError(f"Unknown mode: {unknown[0]}")
 
     edge_index = edge_index.long().cpu()
     node_year = node_year.view(-1).long().cpu()
-    original_edges = int(edge_index.size(1))
+    cache_path = None
+    if cache_dir is not None:
+        cache_path = Path(cache_dir) / _edge_fingerprint(edge_index, node_year, num_nodes, make_undirected)
+        if all((cache_path / f"{mode}.pt").exists() for mode in modes):
+            print(f"Loading preprocessed edges for {','.join(modes)} from {cache_path}", flush=True)
+            return {mode: _load_result(cache_path / f"{mode}.pt") for mode in modes}
+    requested = modes
+    if cache_path is not None:
+        modes = MODES
 
+    original_edges = int(edge_index.size(1))
     if make_undirected:
         edge_index = to_undirected(edge_index, num_nodes=num_nodes)
-    aggregation_edges_before = int(edge_index.size(1))
-
-    stats = {
-        "mode": mode,
+    shared_stats = {
         "num_nodes": int(num_nodes),
         "original_directed_edges": original_edges,
-        "aggregation_edges_before_preprocessing": aggregation_edges_before,
+        "aggregation_edges_before_preprocessing": int(edge_index.size(1)),
         "make_undirected": bool(make_undirected),
         "year_min": int(node_year.min().item()),
         "year_max": int(node_year.max().item()),
     }
 
-    if mode == "baseline":
-        edge_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
-    elif mode == "smp":
-        edge_weight, smp_stats = compute_smp_weights(edge_index, node_year, num_nodes)
-        stats.update(smp_stats)
-    elif mode == "ump":
-        edge_index, edge_weight, ump_stats = apply_ump_filter(edge_index, node_year, num_nodes)
-        stats.update(ump_stats)
-    else:
-        edge_weight, gsmp_stats = compute_gsmp_weights(edge_index, node_year, num_nodes)
-        stats.update(gsmp_stats)
+    groups = EdgeYearGroups.build(edge_index, node_year) if set(modes) - {"baseline"} else None
+    results = {}
+    for mode in modes:
+        stats: dict[str, object] = {"mode": mode, **shared_stats}
+        mode_edge_index = edge_index
+        if mode == "baseline":
+            edge_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
+        elif mode == "smp":
+            edge_weight, mode_stats = compute_smp_weights(edge_index, node_year, num_nodes, groups)
+            stats.update(mode_stats)
+        elif mode == "ump":
+            mode_edge_index, edge_weight, mode_stats = apply_ump_filter(edge_index, node_year, num_nodes, groups)
+            stats.update(mode_stats)
+        else:
+            edge_weight, mode_stats = compute_gsmp_weights(edge_index, node_year, num_nodes, groups)
+            stats.update(mode_stats)
+        stats["edges_after_preprocessing"] = int(mode_edge_index.size(1))
+        stats["weight_stats"] = weight_stats(edge_weight)
+        results[mode] = EdgePreprocessResult(
+            edge_index=mode_edge_index.contiguous(), edge_weight=edge_weight.contiguous(), stats=stats
+        )
+
+    if cache_path is not None:
+        cache_path.mkdir(parents=True, exist_ok=True)
+        for mode, result in results.items():
+            _save_result(cache_path / f"{mode}.pt", result)
+        print(f"Saved preprocessed edges for {','.join(results)} to {cache_path}", flush=True)
+    return {mode: results[mode] for mode in requested}
+
+
+def _edge_fingerprint(edge_index: torch.Tensor, node_year: torch.Tensor, num_nodes: int, make_undirected: bool) -> str:
+    digest = hashlib.sha1()
+    digest.update(repr((EDGE_CACHE_VERSION, int(num_nodes), bool(make_undirected), tuple(edge_index.shape))).encode())
+    for tensor in (edge_index, node_year):
+        digest.update(tensor.contiguous().numpy().data)
+    return digest.hexdigest()[:16]
 
-    stats["edges_after_preprocessing"] = int(edge_index.size(1))
-    stats["weight_stats"] = weight_stats(edge_weight)
-    return EdgePreprocessResult(edge_index=edge_index.contiguous(), edge_weight=edge_weight.contiguous(), stats=stats)
+
+def _save_result(path: Path, result: EdgePreprocessResult) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp{os.getpid()}")
+    torch.save(asdict(result), tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _load_result(path: Path) -> EdgePreprocessResult:
+    return EdgePreprocessResult(**torch.load(path, map_location="cpu"))
 
 
 def compute_smp_weights(
     edge_index: torch.Tensor,
     node_year: torch.Tensor,
     num_nodes: int,
+    groups: Optional[EdgeYearGroups] = None,
 ) -> tuple[torch.Tensor, dict[str, object]]:
-    src, dst = edge_index
-    src_time = node_year[src].float()
-    dst_time = node_year[dst].float()
     t_min = float(node_year.min().item())
     t_max = float(node_year.max().item())
-
-    boundary = torch.minimum(
-        torch.full_like(dst_time, t_max) - dst_time,
-        dst_time - torch.full_like(dst_time, t_min),
-    )
-    single_mask = (src_time == dst_time) | ((src_time - dst_time).abs() > boundary)
-    raw_weight = torch.where(
-        single_mask,
-        torch.full_like(src_time, 2.0),
-        torch.ones_like(src_time),
+    groups = EdgeYearGroups.build(edge_index, node_year) if groups is None else groups
+    # Years are compared in float64, like temporal_weights' SMP path.
+    group_single = smp_single_mask(
+        groups.group_src_year.double(), groups.dst_year(node_year).double(), t_min, t_max, single_on_equal=True
     )
+    single_mask = group_single[groups.edge_group]
+    raw_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
+    raw_weight[single_mask] = 2.0
     edge_weight = normalize_to_target_mean_one(edge_index, raw_weight, num_nodes)
 
     return edge_weight, {
@@ -95,9 +200,10 @@ def apply_ump_filter(
     edge_index: torch.Tensor,
     node_year: torch.Tensor,
     num_nodes: int,
+    groups: Optional[EdgeYearGroups] = None,
 ) -> tuple[torch.Tensor, torch.Tensor, dict[str, object]]:
-    src, dst = edge_index
-    keep_mask = node_year[src] <= node_year[dst]
+    groups = EdgeYearGroups.build(edge_index, node_year) if groups is None else groups
+    keep_mask = (groups.group_src_year <= groups.dst_year(node_year))[groups.edge_group]
     kept_edge_index = edge_index[:, keep_mask]
     edge_weight = torch.ones(kept_edge_index.size(1), dtype=torch.float32)
 
@@ -124,25 +230,16 @@ def compute_gsmp_weights(
     edge_index: torch.Tensor,
     node_year: torch.Tensor,
     num_nodes: int,
+    groups: Optional[EdgeYearGroups] = None,
 ) -> tuple[torch.Tensor, dict[str, object]]:
-    src, dst = edge_index
-    unique_years, year_inverse = torch.unique(node_year, sorted=True, return_inverse=True)
-    src_year_id = year_inverse[src]
-    num_years = int(unique_years.numel())
-
-    key = dst * num_years + src_year_id
-    group_counts = torch.bincount(key, minlength=num_nodes * num_years).float()
-    base_weight = 1.0 / group_counts[key].clamp_min(1.0)
-
-    degree = torch.bincount(dst, minlength=num_nodes).float()
-    sum_base = torch.zeros(num_nodes, dtype=torch.float32)
-    sum_base.index_add_(0, dst, base_weight)
-    mean_base = sum_base[dst] / degree[dst].clamp_min(1.0)
-    edge_weight = base_weight / mean_base.clamp_min(torch.finfo(torch.float32).eps)
+    groups = EdgeYearGroups.build(edge_index, node_year) if groups is None else groups
+    base_weight = 1.0 / groups.group_size.to(torch.float32)[groups.edge_group]
+    edge_weight = normalize_edge_weights(edge_index[1], base_weight, num_nodes, "mean_one")
+    nonempty_groups = int(groups.group_size.numel())
 
     return edge_weight, {
-        "gsmp_num_years": num_years,
-        "gsmp_nonempty_target_year_groups": int((group_counts > 0).sum().item()),
+        "gsmp_num_years": groups.num_years,
+        "gsmp_nonempty_target_year_groups": nonempty_groups,
         "gsmp_base_weight_stats": weight_stats(base_weight),
     }
 
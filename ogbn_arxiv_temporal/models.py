@@ -5,8 +5,67 @@ import torch.nn.functional as F
 from torch import nn
 
 
+def build_mean_adj(
+    edge_index: torch.Tensor,
+    num_nodes: int,
+    edge_weight: torch.Tensor | None = None,
+) -> torch.Tensor:
+    """Row-normalized weighted adjacency ``[dst, src]`` as a sparse CSR tensor.
+
+    Entry ``(v, u)`` is ``w_uv / sum_u' w_u'v``, so ``adj @ x`` equals the
+    weighted mean that ``WeightedMeanSAGEConv`` computes from ``edge_index``.
+    Build it once per edge-weight variant and pass it in place of
+    ``edge_index``.
+    """
+    edge_index = edge_index.long()
+    src, dst = edge_index
+    if edge_weight is None:
+        weights = torch.ones(src.numel(), device=edge_index.device, dtype=torch.float32)
+    else:
+        weights = edge_weight.to(device=edge_index.device, dtype=torch.float32).view(-1)
+    denom = torch.zeros(num_nodes, device=edge_index.device, dtype=torch.float32)
+    denom.index_add_(0, dst, weights)
+    values = weights / denom.clamp_min(torch.finfo(denom.dtype).eps)[dst]
+    adj = torch.sparse_coo_tensor(
+        torch.stack([dst, src]),
+        values,
+        size=(num_nodes, num_nodes),
+        check_invariants=False,
+    )
+    return adj.coalesce().to_sparse_csr()
+
+
+def sampled_edge_weight(
+    edge_index: torch.Tensor,
+    edge_weight: torch.Tensor,
+    n_id: torch.Tensor,
+    in_degree: torch.Tensor,
+) -> torch.Tensor:
+    """Edge weights for a mini-batch drawn with weight-proportional neighbor sampling.
+
+    ``n_id`` maps the batch nodes to the full graph and ``in_degree`` counts
+    every node's in-edges there.  A node whose whole neighborhood was sampled
+    (its degree is at most the fanout) keeps its edge weights, so it gets the
+    exact weighted mean of the full graph.  A node whose neighborhood was cut
+    to the fanout gets unit weights: its sample was already drawn in
+    proportion to the weights, and weighting it again would square them.
+    """
+    dst = edge_index[1]
+    sampled = torch.bincount(dst, minlength=n_id.numel())
+    complete = sampled == in_degree[n_id]
+    return torch.where(complete[dst], edge_weight, torch.ones_like(edge_weight))
+
+
+def is_sparse_adj(graph: torch.Tensor) -> bool:
+    return graph.layout in (torch.sparse_csr, torch.sparse_coo)
+
+
 class WeightedMeanSAGEConv(nn.Module):
-    """GraphSAGE mean aggregation with optional scalar edge weights."""
+    """GraphSAGE mean aggregation with optional scalar edge weights.
+
+    ``edge_index`` may also be the precomputed adjacency from
+    ``build_mean_adj``; aggregation is then one SpMM and needs no E x F buffer.
+    """
 
     def __init__(self, in_channels: int, out_channels: int, aggregation_chunk_size: int = 200_000):
         super().__init__()
@@ -25,6 +84,10 @@ class WeightedMeanSAGEConv(nn.Module):
         edge_index: torch.Tensor,
         edge_weight: torch.Tensor | None = None,
     ) -> torch.Tensor:
+        if is_sparse_adj(edge_index):
+            neigh = torch.sparse.mm(edge_index, x.to(edge_index.dtype)).to(x.dtype)
+            return self.lin_neigh(neigh) + self.lin_root(x)
+
         src, dst = edge_index
         num_nodes = x.size(0)
 
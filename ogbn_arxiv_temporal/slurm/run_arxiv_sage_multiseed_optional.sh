@@ -103,6 +103,7 @@ python -u train_arxiv_sage_temporal.py \
   --batch_size "${BATCH_SIZE:-8192}" \
   --num_neighbors "${NUM_NEIGHBORS:-15,10,5}" \
   --num_workers "${NUM_WORKERS:-0}" \
+  --neighbor_sampling "${NEIGHBOR_SAMPLING:-uniform}" \
   --epochs "${EPOCHS:-300}" \
   --patience "${PATIENCE:-50}" \
   --eval_every "${EVAL_EVERY:-10}" \
@@ -110,6 +111,7 @@ python -u train_arxiv_sage_temporal.py \
   --hidden_channels "${HIDDEN_CHANNELS:-256}" \
   --num_layers "${NUM_LAYERS:-3}" \
   --aggregation_chunk_size "${AGGREGATION_CHUNK_SIZE:-200000}" \
+  --aggregation "${AGGREGATION:-edge}" \
   --dropout "${DROPOUT:-0.4}" \
   --label_smoothing "${LABEL_SMOOTHING:-0.0}" \
   --lr "${LR:-0.01}" \
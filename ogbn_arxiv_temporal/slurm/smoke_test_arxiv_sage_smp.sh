@@ -99,6 +99,7 @@ python -u train_arxiv_sage_temporal.py \
   --batch_size "${BATCH_SIZE:-8192}" \
   --num_neighbors "${NUM_NEIGHBORS:-15,10,5}" \
   --num_workers "${NUM_WORKERS:-0}" \
+  --neighbor_sampling "${NEIGHBOR_SAMPLING:-uniform}" \
   --epochs "${EPOCHS:-50}" \
   --patience 20 \
   --eval_every 10 \
@@ -106,6 +107,7 @@ python -u train_arxiv_sage_temporal.py \
   --hidden_channels "${HIDDEN_CHANNELS:-256}" \
   --num_layers "${NUM_LAYERS:-2}" \
   --aggregation_chunk_size "${AGGREGATION_CHUNK_SIZE:-200000}" \
+  --aggregation "${AGGREGATION:-edge}" \
   --dropout "${DROPOUT:-0.4}" \
   --label_smoothing "${LABEL_SMOOTHING:-0.0}" \
   --lr "${LR:-0.01}" \
@@ -21,6 +21,7 @@
 #   export LABEL_SMOOTHING_GRID="0.1 0.2 0.3 0.4"
 #   export LR_GRID="0.005 0.01"
 #   export SEED_GRID="1 2 3"
+#   export EDGE_CACHE_DIR=/path/to/shared/edge_cache   # default: cache/edges under the project
 # If you expand the grid past 36 jobs, submit with a matching --array.
 
 #SBATCH --job-name=arxiv_sage_sweep
@@ -160,6 +161,7 @@ python -u train_arxiv_sage_temporal.py \
   --batch_size "${BATCH_SIZE}" \
   --num_neighbors "${NUM_NEIGHBORS}" \
   --num_workers "${NUM_WORKERS:-0}" \
+  --neighbor_sampling "${NEIGHBOR_SAMPLING:-uniform}" \
   --epochs "${EPOCHS:-100}" \
   --patience "${PATIENCE:-50}" \
   --eval_every "${EVAL_EVERY:-10}" \
@@ -167,9 +169,11 @@ python -u train_arxiv_sage_temporal.py \
   --hidden_channels "${HIDDEN_CHANNELS:-256}" \
   --num_layers "${NUM_LAYERS:-2}" \
   --aggregation_chunk_size "${AGGREGATION_CHUNK_SIZE:-200000}" \
+  --aggregation "${AGGREGATION:-edge}" \
   --dropout "${DROPOUT}" \
   --label_smoothing "${LABEL_SMOOTHING}" \
   --lr "${LR}" \
   --weight_decay "${WEIGHT_DECAY}" \
+  --edge_cache_dir "${EDGE_CACHE_DIR:-cache/edges}" \
   --device "${DEVICE:-cuda:0}" \
   --save_dir "${RUN_SAVE_DIR}"
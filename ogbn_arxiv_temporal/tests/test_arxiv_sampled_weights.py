@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from models import WeightedGraphSAGE, sampled_edge_weight  # noqa: E402
+
+
+def low_degree_graph(num_nodes=40, max_degree=3, seed=0):
+    gen = torch.Generator().manual_seed(seed)
+    dst = torch.arange(num_nodes).repeat_interleave(torch.randint(1, max_degree + 1, (num_nodes,), generator=gen))
+    src = torch.randint(0, num_nodes, (dst.numel(),), generator=gen)
+    edge_weight = torch.rand(dst.numel(), generator=gen) * 2 + 0.1
+    return torch.stack([src, dst]), edge_weight
+
+
+def sample_subgraph(edge_index, seeds, num_neighbors):
+    """What NeighborLoader returns when every fanout covers the whole neighborhood."""
+    n_id = seeds.tolist()
+    local = {node: i for i, node in enumerate(n_id)}
+    frontier = list(n_id)
+    edges = []
+    for fanout in num_neighbors:
+        next_frontier = []
+        for node in frontier:
+            incoming = torch.where(edge_index[1] == node)[0].tolist()
+            assert len(incoming) <= fanout
+            for e in incoming:
+                src = int(edge_index[0, e])
+                if src not in local:
+                    local[src] = len(n_id)
+                    n_id.append(src)
+                    next_frontier.append(src)
+                edges.append(e)
+        frontier = next_frontier
+    edges = torch.tensor(edges)
+    relabel = torch.tensor([local.get(node, -1) for node in range(int(edge_index.max()) + 1)])
+    return torch.tensor(n_id), relabel[edge_index[:, edges]], edges
+
+
+def test_weighted_minibatch_matches_full_graph_on_low_degree_graph():
+    torch.manual_seed(0)
+    edge_index, edge_weight = low_degree_graph()
+    num_nodes = int(edge_index.max()) + 1
+    x = torch.randn(num_nodes, 8)
+    model = WeightedGraphSAGE(8, 16, 4, num_layers=3, dropout=0.5).eval()
+    full = model(x, edge_index, edge_weight)
+
+    seeds = torch.tensor([3, 11, 17, 25])
+    n_id, batch_edge_index, edge_ids = sample_subgraph(edge_index, seeds, [15, 10, 5])
+    in_degree = torch.bincount(edge_index[1], minlength=num_nodes)
+    weight = sampled_edge_weight(batch_edge_index, edge_weight[edge_ids], n_id, in_degree)
+    batch = model(x[n_id], batch_edge_index, weight)[: seeds.numel()]
+    assert torch.allclose(batch, full[seeds], atol=1e-5)
+
+    unweighted = model(x[n_id], batch_edge_index, None)[: seeds.numel()]
+    assert not torch.allclose(unweighted, full[seeds], atol=1e-3)
+
+
+def test_truncated_neighborhoods_use_unit_weights():
+    edge_index = torch.tensor([[1, 2, 3, 0, 2], [0, 0, 0, 1, 1]])
+    edge_weight = torch.tensor([0.5, 2.0, 3.0, 4.0, 5.0])
+    in_degree = torch.bincount(edge_index[1], minlength=4)
+    # Node 0 kept two of its three in-edges, node 1 kept both of its own.
+    batch_edge_index = torch.tensor([[1, 2, 0, 2], [0, 0, 1, 1]])
+    n_id = torch.tensor([0, 1, 2, 3])
+    weight = sampled_edge_weight(batch_edge_index, edge_weight[[0, 1, 3, 4]], n_id, in_degree)
+    assert torch.equal(weight, torch.tensor([1.0, 1.0, 4.0, 5.0]))
+
+
+if __name__ == "__main__":
+    test_weighted_minibatch_matches_full_graph_on_low_degree_graph()
+    test_truncated_neighborhoods_use_unit_weights()
+    print("Arxiv sampled weight tests passed")
@@ -19,8 +19,8 @@ import torch.nn.functional as F
 from torch_geometric.data import Data
 
 from data_loading import ArxivBundle, load_ogbn_arxiv
-from edge_preprocessing import EdgePreprocessResult, preprocess_edges, stats_as_log_lines
-from models import WeightedGraphSAGE
+from edge_preprocessing import EdgePreprocessResult, preprocess_all_modes, stats_as_log_lines
+from models import WeightedGraphSAGE, build_mean_adj, sampled_edge_weight
 
 
 def parse_args() -> argparse.Namespace:
@@ -34,6 +34,13 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--hidden_channels", type=int, default=256)
     parser.add_argument("--num_layers", type=int, default=3)
     parser.add_argument("--aggregation_chunk_size", type=int, default=200000)
+    parser.add_argument(
+        "--aggregation",
+        choices=["edge", "csr"],
+        default="edge",
+        help="Full-graph neighbor aggregation: chunked edge scatter, or SpMM with a row-normalized CSR "
+        "adjacency built once per edge-weight variant. Mini-batch training always uses the edge path.",
+    )
     parser.add_argument("--dropout", type=float, default=0.4)
     parser.add_argument("--label_smoothing", type=float, default=0.0)
     parser.add_argument("--lr", type=float, default=0.01)
@@ -49,6 +56,12 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--save_checkpoint", action="store_true")
     parser.add_argument("--dry_run", action="store_true")
     parser.add_argument("--directed", action="store_true", help="Do not symmetrize the ogbn-arxiv edge_index.")
+    parser.add_argument(
+        "--edge_cache_dir",
+        type=str,
+        default=None,
+        help="Build all four edge variants once and reuse them from this directory across seeds and sweep jobs.",
+    )
     parser.add_argument(
         "--no_auto_features",
         action="store_true",
@@ -62,7 +75,24 @@ def parse_args() -> argparse.Namespace:
         default="15,10,5",
         help="Comma-separated NeighborLoader fanouts used only with --training_mode mini.",
     )
+    parser.add_argument(
+        "--neighbor_sampling",
+        choices=["uniform", "weighted"],
+        default="uniform",
+        help="Mini-batch only. 'uniform' samples the fanout uniformly and takes the edge-weighted mean "
+        "over it; 'weighted' samples the fanout without replacement with probability proportional to the "
+        "SMP/GSMP edge weight (NeighborLoader weight_attr). Nodes with at most fanout neighbors keep all of them "
+        "and get the exact edge-weighted mean; larger neighborhoods take a plain mean over the weight-biased "
+        "sample, which approximates the weighted mean.",
+    )
     parser.add_argument("--num_workers", type=int, default=0)
+    parser.add_argument("--pin_memory", action="store_true", help="Pin sampled batches for async host-to-GPU copies.")
+    parser.add_argument(
+        "--prefetch_factor",
+        type=int,
+        default=2,
+        help="Batches prefetched per loader worker (used only with --num_workers > 0).",
+    )
     return parser.parse_args()
 
 
@@ -84,13 +114,14 @@ def main() -> None:
         features_path=args.features_path,
         allow_auto_features=not args.no_auto_features,
     )
-    edge_result = preprocess_edges(
+    edge_result = preprocess_all_modes(
         edge_index=bundle.data.edge_index,
         node_year=bundle.node_year,
         num_nodes=bundle.data.num_nodes,
-        mode=args.mode,
         make_undirected=not args.directed,
-    )
+        modes=(args.mode,),
+        cache_dir=args.edge_cache_dir,
+    )[args.mode]
     print_preprocess_stats(bundle, edge_result)
 
     if args.dry_run:
@@ -199,12 +230,15 @@ def run_one_seed(
     scaler = make_grad_scaler(use_amp)
 
     data_cpu = build_data(bundle, edge_result, device=torch.device("cpu"))
-    data_device = build_data(bundle, edge_result, device=device)
+    data_device = build_data(bundle, edge_result, device=device, aggregation=args.aggregation)
     split_device = {name: idx.to(device) for name, idx in bundle.split_idx.items()}
 
     loader = None
+    in_degree = None
     if args.training_mode == "mini":
         loader = build_neighbor_loader(args, data_cpu, bundle.split_idx["train"])
+        if args.neighbor_sampling == "weighted":
+            in_degree = torch.bincount(data_cpu.edge_index[1], minlength=data_cpu.num_nodes).to(device)
 
     rows: list[dict[str, object]] = []
     best_valid = -1.0
@@ -237,6 +271,7 @@ def run_one_seed(
                 use_amp,
                 device,
                 args.label_smoothing,
+                in_degree=in_degree,
             )
 
         should_eval = (
@@ -308,7 +343,12 @@ def run_one_seed(
     return summary
 
 
-def build_data(bundle: ArxivBundle, edge_result: EdgePreprocessResult, device: torch.device) -> Data:
+def build_data(
+    bundle: ArxivBundle,
+    edge_result: EdgePreprocessResult,
+    device: torch.device,
+    aggregation: str = "edge",
+) -> Data:
     data = Data(
         x=bundle.data.x.detach().cpu(),
         y=bundle.data.y.detach().cpu(),
@@ -316,7 +356,17 @@ def build_data(bundle: ArxivBundle, edge_result: EdgePreprocessResult, device: t
         edge_weight=edge_result.edge_weight,
         num_nodes=bundle.data.num_nodes,
     )
-    return data.to(device)
+    data = data.to(device)
+    if aggregation == "csr":
+        data.adj_t = build_mean_adj(data.edge_index, data.num_nodes, data.edge_weight)
+    return data
+
+
+def full_graph_forward(model: WeightedGraphSAGE, data: Data) -> torch.Tensor:
+    adj_t = getattr(data, "adj_t", None)
+    if adj_t is not None:
+        return model(data.x, adj_t)
+    return model(data.x, data.edge_index, data.edge_weight)
 
 
 def train_full_epoch(
@@ -331,7 +381,7 @@ def train_full_epoch(
     model.train()
     optimizer.zero_grad(set_to_none=True)
     with autocast_context(use_amp):
-        out = model(data.x, data.edge_index, data.edge_weight)
+        out = full_graph_forward(model, data)
         loss = F.cross_entropy(
             out[train_idx],
             data.y[train_idx],
@@ -351,15 +401,18 @@ def train_mini_epoch(
     use_amp: bool,
     device: torch.device,
     label_smoothing: float,
+    in_degree: torch.Tensor | None = None,
 ) -> float:
     model.train()
     total_loss = 0.0
     total_examples = 0
     for batch in loader:
-        batch = batch.to(device)
+        batch = batch.to(device, non_blocking=True)
         optimizer.zero_grad(set_to_none=True)
         batch_size = int(batch.batch_size)
         edge_weight = getattr(batch, "edge_weight", None)
+        if in_degree is not None:
+            edge_weight = sampled_edge_weight(batch.edge_index, edge_weight, batch.n_id, in_degree)
         with autocast_context(use_amp):
             out = model(batch.x, batch.edge_index, edge_weight)
             loss = F.cross_entropy(
@@ -383,7 +436,7 @@ def evaluate(
     evaluator,
 ) -> tuple[float, float, float]:
     model.eval()
-    out = model(data.x, data.edge_index, data.edge_weight)
+    out = full_graph_forward(model, data)
     y_pred = out.argmax(dim=-1, keepdim=True).cpu()
     y_true = data.y.view(-1, 1).cpu()
 
@@ -410,19 +463,37 @@ def build_neighbor_loader(args: argparse.Namespace, data_cpu: Data, train_idx: t
         raise RuntimeError("Mini-batch mode requires torch_geometric.loader.NeighborLoader.") from exc
 
     num_neighbors = parse_num_neighbors(args.num_neighbors, args.num_layers)
+    loader_kwargs = {"pin_memory": bool(args.pin_memory)}
+    if args.num_workers > 0:
+        loader_kwargs["persistent_workers"] = True
+        loader_kwargs["prefetch_factor"] = args.prefetch_factor
+    if args.neighbor_sampling == "weighted":
+        edge_weight = data_cpu.edge_weight
+        if not bool(torch.isfinite(edge_weight).all()) or bool((edge_weight < 0).any()):
+            raise ValueError("Weighted neighbor sampling needs finite, non-negative edge weights.")
+        loader_kwargs["weight_attr"] = "edge_weight"
     print(
         f"Using mini-batch NeighborLoader: batch_size={args.batch_size} "
-        f"num_neighbors={num_neighbors} num_workers={args.num_workers}",
+        f"num_neighbors={num_neighbors} num_workers={args.num_workers} "
+        f"sampling={args.neighbor_sampling} pin_memory={args.pin_memory}",
         flush=True,
     )
-    return NeighborLoader(
-        data_cpu,
-        input_nodes=train_idx,
-        num_neighbors=num_neighbors,
-        batch_size=args.batch_size,
-        shuffle=True,
-        num_workers=args.num_workers,
-    )
+    try:
+        return NeighborLoader(
+            data_cpu,
+            input_nodes=train_idx,
+            num_neighbors=num_neighbors,
+            batch_size=args.batch_size,
+            shuffle=True,
+            num_workers=args.num_workers,
+            **loader_kwargs,
+        )
+    except TypeError as exc:
+        if "weight_attr" in loader_kwargs:
+            raise RuntimeError(
+                "--neighbor_sampling weighted needs torch_geometric>=2.4 with pyg-lib (NeighborLoader weight_attr)."
+            ) from exc
+        raise
 
 
 def parse_num_neighbors(value: str, num_layers: int) -> list[int]:
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""Benchmark paper-citation propagation backends on ogbn-mag.
+
+Times ``propagate_features`` for every backend on both the
+``paper__cites__paper`` and ``paper__cited_by__paper`` channels and reports the
+max absolute difference against the ``index_add`` reference, then times
+``propagate_channels`` building both channels from one CSR against the two
+separate calls.
+
+    python benchmark_propagation.py --root ./data --num-hops 6 --threads 16
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import torch
+
+from propagation import (
+    PROPAGATION_BACKENDS,
+    _get_paper_citation_edge_index,
+    _get_paper_features,
+    propagate_channels,
+    propagate_features,
+)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="ogbn-mag propagation backend benchmark")
+    parser.add_argument("--root", default="./data")
+    parser.add_argument("--num-hops", type=int, default=6)
+    parser.add_argument("--repeats", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=0, help="torch.set_num_threads; 0 keeps the default.")
+    parser.add_argument("--backends", nargs="+", choices=PROPAGATION_BACKENDS, default=list(PROPAGATION_BACKENDS))
+    parser.add_argument(
+        "--synthetic-nodes",
+        type=int,
+        default=0,
+        help="Benchmark a random graph of this many papers instead of loading ogbn-mag.",
+    )
+    parser.add_argument("--synthetic-degree", type=int, default=10)
+    parser.add_argument("--feature-dim", type=int, default=128)
+    return parser.parse_args()
+
+
+def _load_inputs(args: argparse.Namespace) -> Tuple[torch.Tensor, torch.Tensor]:
+    if args.synthetic_nodes > 0:
+        gen = torch.Generator().manual_seed(0)
+        num_edges = args.synthetic_nodes * args.synthetic_degree
+        x = torch.randn(args.synthetic_nodes, args.feature_dim, generator=gen)
+        edge_index = torch.randint(0, args.synthetic_nodes, (2, num_edges), generator=gen)
+        return x, edge_index
+
+    from train_hh_mag import load_ogbn_mag
+
+    data, _, _ = load_ogbn_mag(args.root)
+    return _get_paper_features(data), _get_paper_citation_edge_index(data)
+
+
+def main() -> None:
+    args = parse_args()
+    if args.threads > 0:
+        torch.set_num_threads(args.threads)
+    x, edge_index = _load_inputs(args)
+    num_papers = x.shape[0]
+    channels = {
+        "paper__cites__paper": edge_index,
+        "paper__cited_by__paper": edge_index.flip(0).contiguous(),
+    }
+    print(
+        f"[BENCH] papers={num_papers} edges={edge_index.shape[1]} dim={x.shape[1]} "
+        f"hops={args.num_hops} threads={torch.get_num_threads()}",
+        flush=True,
+    )
+
+    separate: Dict[str, float] = {backend: 0.0 for backend in args.backends}
+    for channel_name, channel_edge_index in channels.items():
+        reference: List[torch.Tensor] = []
+        timings: Dict[str, float] = {}
+        for backend in args.backends:
+            best = float("inf")
+            for _ in range(args.repeats):
+                start = time.perf_counter()
+                hops = propagate_features(
+                    x, channel_edge_index, num_papers, args.num_hops, backend=backend
+                )
+                best = min(best, time.perf_counter() - start)
+            timings[backend] = best
+            separate[backend] += best
+            if not reference:
+                reference = hops
+            max_diff = max(
+                float((hop - ref).abs().max().item()) for hop, ref in zip(hops, reference)
+            )
+            print(
+                f"[BENCH][{channel_name}] backend={backend} time={best:.3f}s "
+                f"max_abs_diff={max_diff:.3e}",
+                flush=True,
+            )
+        if "index_add" in timings:
+            for backend, seconds in timings.items():
+                if backend == "index_add":
+                    continue
+                print(
+                    f"[BENCH][{channel_name}] speedup {backend} vs index_add: "
+                    f"{timings['index_add'] / seconds:.2f}x",
+                    flush=True,
+                )
+
+    specs = {name: (channel_edge_index, None) for name, channel_edge_index in channels.items()}
+    for backend in args.backends:
+        best = float("inf")
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            propagate_channels(
+                x, specs, num_papers, args.num_hops, backend=backend,
+                reverse_of={"paper__cited_by__paper": "paper__cites__paper"},
+            )
+            best = min(best, time.perf_counter() - start)
+        print(
+            f"[BENCH][both channels] backend={backend} one_csr={best:.3f}s "
+            f"separate={separate[backend]:.3f}s speedup={separate[backend] / best:.2f}x",
+            flush=True,
+        )
+
+
+if __name__ == "__main__":
+    main()
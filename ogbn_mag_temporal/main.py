@@ -92,6 +92,10 @@ def main():
                        help="Strategy for non-paper node timestamps (default: mean)")
     parser.add_argument("--use-reverse-edges", action="store_true",
                        help="Include reverse edges in the graph")
+    parser.add_argument("--gsmp-threads", type=int, default=0,
+                       help="Thread pool size across relations for GSMP weights; 0 uses one fused pass (default: 0)")
+    parser.add_argument("--gsmp-check", action="store_true",
+                       help="Verify vectorized GSMP weights against the per-edge reference loop (slow)")
     
     # I/O
     parser.add_argument("--root", type=str, default="./data",
@@ -169,7 +173,9 @@ def main():
         elif args.method == "ump":
             data = apply_ump_edge_filter(data, timestamp_dict)
         elif args.method == "gsmp":
-            data = compute_gsmp_edge_weights(data, timestamp_dict)
+            data = compute_gsmp_edge_weights(
+                data, timestamp_dict, num_threads=args.gsmp_threads, check=args.gsmp_check
+            )
         
         print_method_info(args.method, data, timestamp_dict)
         
@@ -4,18 +4,33 @@ The implementation intentionally starts with the paper citation graph because it
 is the minimum robust channel required by the requested ablation and avoids
 silently inventing features for node types that do not have raw attributes.
 
-Extension point: add more meta-path channels, such as paper-author-paper, inside
-``_build_paper_feature_dict``. The model already accepts any number of feature
-channels as long as each channel is a paper-node tensor.
+Extension point: pass more meta-path channels, such as a composed
+paper-author-paper edge list, to the builders via ``extra_channels``. All
+channels are propagated by ``propagate_channels``, which builds the cites and
+cited_by channels from one coalesced CSR and advances every channel's hops in
+one loop over a single copy of the paper features. The model already
+accepts any number of feature channels as long as each channel is a paper-node
+tensor.
+
+Every builder accepts an optional ``cache`` (``hop_cache.HopFeatureCache`` from
+the repository root). Channels are cached independently, keyed on their edge
+index, edge weights, normalization mode and the raw paper features, so methods
+and seeds that share a channel configuration propagate it only once.
 """
 
 from __future__ import annotations
 
 import logging
-from typing import Any, Dict, Mapping, Optional, Tuple
+import sys
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
 
+import numpy as np
 import torch
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from compact_graph import CompactGraph, index_dtype_for  # noqa: E402
+
 logger = logging.getLogger(__name__)
 
 
@@ -80,7 +95,9 @@ def normalize_adj(
     if num_src <= 0 or num_dst <= 0:
         raise ValueError(f"num_src and num_dst must be positive, got {num_src}, {num_dst}")
 
-    edge_index = edge_index.detach().cpu().long()
+    edge_index = edge_index.detach().cpu()
+    if edge_index.dtype != torch.int32:
+        edge_index = edge_index.long()
     num_edges = edge_index.shape[1]
     if edge_weight is None:
         edge_weight = torch.ones(num_edges, dtype=torch.float32)
@@ -141,33 +158,164 @@ def _propagate_once(
     return out
 
 
+PROPAGATION_BACKENDS = ("index_add", "csr", "csr_compact")
+
+
+def build_csr_adj(
+    edge_index: torch.Tensor,
+    edge_weight: torch.Tensor,
+    num_src: int,
+    num_dst: int,
+) -> torch.Tensor:
+    """Sparse CSR ``[num_dst, num_src]`` matrix with ``A @ x == _propagate_once(x)``.
+
+    Duplicate edges are summed, matching the ``index_add_`` path.
+    """
+    src = edge_index[0]
+    dst = edge_index[1]
+    adj = torch.sparse_coo_tensor(
+        torch.stack([dst, src]),
+        edge_weight.float(),
+        size=(num_dst, num_src),
+        check_invariants=False,
+    )
+    return adj.coalesce().to_sparse_csr()
+
+
+HopStep = Callable[[torch.Tensor], torch.Tensor]
+
+
+def _csr_step(adj: torch.Tensor) -> HopStep:
+    return lambda h: torch.sparse.mm(adj, h).contiguous()
+
+
+def _index_add_step(edge_index: torch.Tensor, edge_weight: torch.Tensor, num_dst: int) -> HopStep:
+    return lambda h: _propagate_once(h, edge_index, edge_weight, num_dst).contiguous()
+
+
+def _channel_step(
+    edge_index: torch.Tensor,
+    edge_weight: Optional[torch.Tensor],
+    num_nodes: int,
+    backend: str,
+) -> HopStep:
+    """One destination-normalized hop ``h -> A h`` of a single channel."""
+    norm_edge_index, norm_edge_weight = normalize_adj(
+        edge_index=edge_index,
+        num_src=num_nodes,
+        num_dst=num_nodes,
+        edge_weight=edge_weight,
+        mode="dst",
+    )
+    if backend == "csr_compact":
+        return _csr_step(CompactGraph(norm_edge_index, num_nodes, edge_weight=norm_edge_weight).to_torch_csr())
+    if backend == "csr":
+        return _csr_step(build_csr_adj(norm_edge_index, norm_edge_weight, num_nodes, num_nodes))
+    return _index_add_step(norm_edge_index, norm_edge_weight, num_nodes)
+
+
+def _stable_order(keys: np.ndarray, key_bound: int) -> np.ndarray:
+    """Stable argsort of non-negative ``keys < key_bound``.
+
+    When ``key * n + position`` fits in int64, sorting those packed keys is a
+    stable sort on numpy's vectorized ``np.sort``, several times faster than
+    ``argsort(kind="stable")``.
+    """
+    n = keys.size
+    if key_bound * max(n, 1) < 2**63:
+        packed = keys.astype(np.int64) * n + np.arange(n)
+        packed.sort()
+        return packed % n
+    return np.argsort(keys, kind="stable")
+
+
+def _citation_pair_steps(
+    edge_index: torch.Tensor,
+    forward_weight: Optional[torch.Tensor],
+    reverse_weight: Optional[torch.Tensor],
+    num_nodes: int,
+    backend: str,
+) -> Tuple[HopStep, HopStep]:
+    """Hop steps of ``edge_index`` and of its flip, both built from one coalesced CSR.
+
+    The edges are sorted once by ``(dst, src)`` and coalesced into a CSR with
+    one row per destination, carrying the forward and reverse weights side
+    by side.  One bincount over its rows and one over its columns give the
+    forward and reverse destination normalizations; the reverse CSR is the
+    transpose of the same entries.  Duplicate edges are summed before
+    normalizing, so results match ``propagate_features`` up to float rounding.
+    """
+    edge_index, forward_weight = normalize_adj(edge_index, num_nodes, num_nodes, forward_weight, mode="none")
+    _, reverse_weight = normalize_adj(edge_index, num_nodes, num_nodes, reverse_weight, mode="none")
+    src = edge_index[0].numpy()
+    dst = edge_index[1].numpy()
+    keys = dst.astype(np.int64) * num_nodes + src
+    order = _stable_order(keys, num_nodes * num_nodes)
+    keys = keys[order]
+    first = np.ones(keys.size, dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    starts = np.flatnonzero(first)
+    weights = np.stack([forward_weight.numpy(), reverse_weight.numpy()], axis=1)[order]
+    values = np.add.reduceat(weights, starts, axis=0) if starts.size else weights
+    rows, cols = np.divmod(keys[starts], num_nodes)
+    del keys, order, weights
+
+    row_sum = np.bincount(rows, weights=values[:, 0], minlength=num_nodes).astype(np.float32)
+    col_sum = np.bincount(cols, weights=values[:, 1], minlength=num_nodes).astype(np.float32)
+    forward = torch.from_numpy(values[:, 0] / np.maximum(row_sum[rows], 1e-12))
+    reverse = torch.from_numpy(values[:, 1] / np.maximum(col_sum[cols], 1e-12))
+    rows_t, cols_t = torch.from_numpy(rows), torch.from_numpy(cols)
+
+    if backend == "index_add":
+        return (
+            _index_add_step(torch.stack([cols_t, rows_t]), forward, num_nodes),
+            _index_add_step(torch.stack([rows_t, cols_t]), reverse, num_nodes),
+        )
+
+    index_dtype = torch.int64
+    if backend == "csr_compact":
+        index_dtype = index_dtype_for(max(num_nodes, rows.size))
+    transpose = torch.from_numpy(_stable_order(cols, num_nodes))
+    crow = torch.zeros(num_nodes + 1, dtype=index_dtype)
+    crow[1:] = torch.from_numpy(np.cumsum(np.bincount(rows, minlength=num_nodes)))
+    crow_t = torch.zeros(num_nodes + 1, dtype=index_dtype)
+    crow_t[1:] = torch.from_numpy(np.cumsum(np.bincount(cols, minlength=num_nodes)))
+    size = (num_nodes, num_nodes)
+    forward_adj = torch.sparse_csr_tensor(crow, cols_t.to(index_dtype), forward, size=size)
+    reverse_adj = torch.sparse_csr_tensor(crow_t, rows_t[transpose].to(index_dtype), reverse[transpose], size=size)
+    return _csr_step(forward_adj), _csr_step(reverse_adj)
+
+
 def propagate_features(
     x: torch.Tensor,
     edge_index: torch.Tensor,
     num_nodes: int,
     num_hops: int,
     edge_weight: Optional[torch.Tensor] = None,
+    backend: str = "index_add",
 ) -> list[torch.Tensor]:
-    """Return ``[A X, A^2 X, ... A^K X]`` for a homogeneous paper graph."""
+    """Return ``[A X, A^2 X, ... A^K X]`` for a homogeneous paper graph.
+
+    ``backend='index_add'`` runs the chunked gather/scatter loop;
+    ``backend='csr'`` builds the normalized adjacency once as a torch sparse
+    CSR matrix and runs one multithreaded SpMM per hop; ``'csr_compact'``
+    does the same with int32 edge and CSR indices (``compact_graph``).
+    """
     if num_hops < 0:
         raise ValueError("num_hops must be non-negative.")
     if x.shape[0] != num_nodes:
         raise ValueError(f"x has {x.shape[0]} rows but num_nodes={num_nodes}.")
+    if backend not in PROPAGATION_BACKENDS:
+        raise ValueError(f"Unknown propagation backend '{backend}'. Use one of {PROPAGATION_BACKENDS}.")
     if num_hops == 0:
         return []
 
-    norm_edge_index, norm_edge_weight = normalize_adj(
-        edge_index=edge_index,
-        num_src=num_nodes,
-        num_dst=num_nodes,
-        edge_weight=edge_weight,
-        mode="dst",
-    )
+    step = _channel_step(edge_index, edge_weight, num_nodes, backend)
     h = x.detach().cpu().float().contiguous()
     hops = []
     for _ in range(num_hops):
-        h = _propagate_once(h, norm_edge_index, norm_edge_weight, num_nodes)
-        hops.append(h.contiguous())
+        h = step(h)
+        hops.append(h)
     return hops
 
 
@@ -328,38 +476,121 @@ def _bucket_balanced_weights(
     return 1.0 / counts[inverse].clamp_min(1.0)
 
 
+ChannelSpec = Tuple[torch.Tensor, Optional[torch.Tensor]]
+
+
+def propagate_channels(
+    x: torch.Tensor,
+    channels: Mapping[str, ChannelSpec],
+    num_nodes: int,
+    num_hops: int,
+    backend: str = "index_add",
+    cache: Optional[Any] = None,
+    reverse_of: Optional[Mapping[str, str]] = None,
+) -> Dict[str, list[torch.Tensor]]:
+    """Propagate several paper-to-paper channels in one hop loop.
+
+    ``channels`` maps a name to ``(edge_index, edge_weight)``.
+    ``reverse_of`` maps a channel to the channel whose flipped edges it holds
+    (``{"paper__cited_by__paper": "paper__cites__paper"}``); such a pair is
+    built from one coalesced CSR by ``_citation_pair_steps``, every other
+    channel on its own.  All channels start from one float32 copy of ``x``
+    and advance hop by hop together.  Channels found in ``cache`` are skipped.
+    """
+    if num_hops < 0:
+        raise ValueError("num_hops must be non-negative.")
+    if backend not in PROPAGATION_BACKENDS:
+        raise ValueError(f"Unknown propagation backend '{backend}'. Use one of {PROPAGATION_BACKENDS}.")
+    if x.shape[0] != num_nodes:
+        raise ValueError(f"x has {x.shape[0]} rows but num_nodes={num_nodes}.")
+    if num_hops == 0:
+        return {name: [] for name in channels}
+
+    results: Dict[str, list[torch.Tensor]] = {}
+    cache_keys: Dict[str, str] = {}
+    hop_ids = range(1, num_hops + 1)
+    for name, (edge_index, edge_weight) in channels.items():
+        if cache is None:
+            continue
+        cache_keys[name] = cache.key(graph=edge_index, edge_weight=edge_weight, norm="dst", features=x)
+        hops = cache.load(cache_keys[name], hop_ids)
+        if hops is not None:
+            logger.info("Loaded %s hops 1..%d from cache entry %s", name, num_hops, cache_keys[name])
+            results[name] = hops
+
+    steps: Dict[str, HopStep] = {}
+    for reverse_name, forward_name in (reverse_of or {}).items():
+        if reverse_name in results or forward_name in results:
+            continue
+        edge_index, forward_weight = channels[forward_name]
+        reverse_edge_index, reverse_weight = channels[reverse_name]
+        if reverse_edge_index.shape != edge_index.shape:
+            raise ValueError(f"Channel '{reverse_name}' is not the reverse of '{forward_name}'.")
+        logger.info(
+            "Building %s and %s from one CSR: edges=%d, backend=%s",
+            forward_name, reverse_name, edge_index.shape[1], backend,
+        )
+        steps[forward_name], steps[reverse_name] = _citation_pair_steps(
+            edge_index, forward_weight, reverse_weight, num_nodes, backend
+        )
+    for name, (edge_index, edge_weight) in channels.items():
+        if name not in results and name not in steps:
+            logger.info("Building %s: edges=%d, backend=%s", name, edge_index.shape[1], backend)
+            steps[name] = _channel_step(edge_index, edge_weight, num_nodes, backend)
+
+    if steps:
+        logger.info("Propagating %s: hops=%d", ", ".join(steps), num_hops)
+        x = x.detach().cpu().float().contiguous()
+        current = {name: x for name in steps}
+        for name in steps:
+            results[name] = []
+        for _ in hop_ids:
+            for name, step in steps.items():
+                current[name] = step(current[name])
+                results[name].append(current[name])
+    for name in steps:
+        if cache is not None:
+            cache.save(cache_keys[name], dict(zip(hop_ids, results[name])))
+            logger.info("Saved %s hops 1..%d to cache entry %s", name, num_hops, cache_keys[name])
+
+    return {name: results[name] for name in channels}
+
+
 def _build_paper_feature_dict(
     data: Any,
     num_hops: int,
     forward_weight: Optional[torch.Tensor] = None,
     reverse_weight: Optional[torch.Tensor] = None,
+    cache: Optional[Any] = None,
+    backend: str = "index_add",
+    extra_channels: Optional[Mapping[str, ChannelSpec]] = None,
 ) -> Dict[str, torch.Tensor]:
     x = _get_paper_features(data)
     num_papers = x.shape[0]
     edge_index = _get_paper_citation_edge_index(data)
-    reverse_edge_index = edge_index.flip(0).contiguous()
+    reverse_edge_index = edge_index.flip(0)
 
     features: Dict[str, torch.Tensor] = {"paper": x}
 
-    channels = [
-        ("paper__cites__paper", edge_index, forward_weight),
-        ("paper__cited_by__paper", reverse_edge_index, reverse_weight),
-    ]
-
-    for channel_name, channel_edge_index, channel_weight in channels:
-        logger.info(
-            "Building %s propagation: hops=%d, edges=%d",
-            channel_name,
-            num_hops,
-            channel_edge_index.shape[1],
-        )
-        hops = propagate_features(
-            x=x,
-            edge_index=channel_edge_index,
-            num_nodes=num_papers,
-            num_hops=num_hops,
-            edge_weight=channel_weight,
-        )
+    channels: Dict[str, ChannelSpec] = {
+        "paper__cites__paper": (edge_index, forward_weight),
+        "paper__cited_by__paper": (reverse_edge_index, reverse_weight),
+    }
+    for channel_name, spec in (extra_channels or {}).items():
+        if channel_name in channels or channel_name == "paper":
+            raise ValueError(f"Extra channel '{channel_name}' collides with a built-in channel.")
+        channels[channel_name] = spec
+
+    channel_hops = propagate_channels(
+        x=x,
+        channels=channels,
+        num_nodes=num_papers,
+        num_hops=num_hops,
+        backend=backend,
+        cache=cache,
+        reverse_of={"paper__cited_by__paper": "paper__cites__paper"},
+    )
+    for channel_name, hops in channel_hops.items():
         for hop_idx, hop_x in enumerate(hops, start=1):
             key = f"{channel_name}_hop{hop_idx}"
             features[key] = hop_x
@@ -367,9 +598,21 @@ def _build_paper_feature_dict(
     return features
 
 
-def build_base_propagation(data: Any, num_hops: int) -> Dict[str, torch.Tensor]:
+def build_base_propagation(
+    data: Any,
+    num_hops: int,
+    cache: Optional[Any] = None,
+    backend: str = "index_add",
+    extra_channels: Optional[Mapping[str, ChannelSpec]] = None,
+) -> Dict[str, torch.Tensor]:
     """Ordinary HGAMLP-HOPE paper citation propagation."""
-    return _build_paper_feature_dict(data=data, num_hops=num_hops)
+    return _build_paper_feature_dict(
+        data=data,
+        num_hops=num_hops,
+        cache=cache,
+        backend=backend,
+        extra_channels=extra_channels,
+    )
 
 
 def build_smp_propagation(
@@ -378,6 +621,9 @@ def build_smp_propagation(
     years: torch.Tensor,
     num_hops: int,
     bucket_style: str = "coarse",
+    cache: Optional[Any] = None,
+    backend: str = "index_add",
+    extra_channels: Optional[Mapping[str, ChannelSpec]] = None,
 ) -> Dict[str, torch.Tensor]:
     """Source-to-target temporal reweighted propagation for HH+SMP."""
     years = _get_paper_years(data, years)
@@ -402,6 +648,9 @@ def build_smp_propagation(
         num_hops=num_hops,
         forward_weight=forward_weight,
         reverse_weight=reverse_weight,
+        cache=cache,
+        backend=backend,
+        extra_channels=extra_channels,
     )
 
 
@@ -411,6 +660,9 @@ def build_ump_propagation(
     years: torch.Tensor,
     num_hops: int,
     bucket_style: str = "coarse",
+    cache: Optional[Any] = None,
+    backend: str = "index_add",
+    extra_channels: Optional[Mapping[str, ChannelSpec]] = None,
 ) -> Dict[str, torch.Tensor]:
     """Uniform/bucket-balanced message-passing correction for HH+UMP."""
     del split_idx
@@ -424,6 +676,9 @@ def build_ump_propagation(
         num_hops=num_hops,
         forward_weight=forward_weight,
         reverse_weight=reverse_weight,
+        cache=cache,
+        backend=backend,
+        extra_channels=extra_channels,
     )
 
 
@@ -434,6 +689,9 @@ def build_gsmp_propagation(
     num_hops: int,
     bucket_style: str = "yearly",
     eps: float = 1e-6,
+    cache: Optional[Any] = None,
+    backend: str = "index_add",
+    extra_channels: Optional[Mapping[str, ChannelSpec]] = None,
 ) -> Dict[str, torch.Tensor]:
     """Generalized source message passing for HH+GSMP.
 
@@ -463,4 +721,7 @@ def build_gsmp_propagation(
         num_hops=num_hops,
         forward_weight=forward_weight,
         reverse_weight=reverse_weight,
+        cache=cache,
+        backend=backend,
+        extra_channels=extra_channels,
     )
@@ -2,12 +2,17 @@
 Temporal message passing methods: SMP, UMP, GSMP
 """
 
+import sys
 import torch
 import logging
+from pathlib import Path
 from torch_geometric.data import HeteroData
-from typing import Dict, Tuple
+from typing import Dict
 from collections import defaultdict
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from temporal_weights import hetero_temporal_edge_weights  # noqa: E402
+
 logger = logging.getLogger(__name__)
 
 
@@ -39,36 +44,15 @@ def compute_smp_edge_weights(
         Modified data with edge_weight attributes added
     """
     logger.info("Computing SMP edge weights...")
-    
-    for edge_type in data.edge_types:
-        src_type, rel_type, dst_type = edge_type
+
+    float_times = {node_type: times.float() for node_type, times in timestamp_dict.items()}
+    weights = hetero_temporal_edge_weights(
+        data.edge_index_dict, float_times, scheme="smp", normalize="raw",
+        missing="group", single_on_equal=True, t_min=t_min, t_max=t_max,
+    )
+    for edge_type, edge_weight in weights.items():
         edge_index = data[edge_type].edge_index
-        
-        if edge_index is None or edge_index.shape[1] == 0:
-            continue
-        
-        src_nodes = edge_index[0]
-        dst_nodes = edge_index[1]
-        
-        # Get timestamps
-        src_times = timestamp_dict[src_type][src_nodes].float()
-        dst_times = timestamp_dict[dst_type][dst_nodes].float()
-        
-        # Compute delta
-        delta = torch.abs(src_times - dst_times)
-        
-        # Compute boundary
-        dst_boundary = torch.minimum(
-            t_max - dst_times,
-            dst_times - t_min
-        )
-        
-        # Single condition: delta == 0 OR delta > boundary
-        single_mask = (delta == 0) | (delta > dst_boundary)
-        
-        # Weights: 2.0 for single, 1.0 for double
-        edge_weight = torch.where(single_mask, torch.tensor(2.0), torch.tensor(1.0))
-        
+
         # Add to data
         data[edge_type].edge_weight = edge_weight.to(edge_index.device)
         
@@ -151,9 +135,23 @@ def apply_ump_edge_filter(
     return data
 
 
+def _gsmp_weights_loop(src_times: torch.Tensor, dst_nodes: torch.Tensor) -> torch.Tensor:
+    """Per-edge Python reference for ``1 / count_v[time(u)]`` (used by ``check=True``)."""
+    timestamp_counts = defaultdict(int)
+    for src_time, dst_node in zip(src_times.tolist(), dst_nodes.tolist()):
+        timestamp_counts[(int(dst_node), int(src_time))] += 1
+
+    edge_weight = torch.zeros(len(dst_nodes), dtype=torch.float32)
+    for i, (src_time, dst_node) in enumerate(zip(src_times.tolist(), dst_nodes.tolist())):
+        edge_weight[i] = 1.0 / timestamp_counts[(int(dst_node), int(src_time))]
+    return edge_weight
+
+
 def compute_gsmp_edge_weights(
     data: HeteroData,
-    timestamp_dict: Dict[str, torch.Tensor]
+    timestamp_dict: Dict[str, torch.Tensor],
+    num_threads: int = 0,
+    check: bool = False,
 ) -> HeteroData:
     """
     Compute General Symmetrized Message Passing (GSMP) edge weights.
@@ -165,49 +163,41 @@ def compute_gsmp_edge_weights(
         Edge weight: w_{u->v} = 1 / count_v[time(u)]
     
     This makes each timestamp group contribute equally to the aggregation.
+
+    Every relation's (dst_node, src_time) pairs are counted in a single
+    fused pass of ``temporal_weights.hetero_temporal_edge_weights``.  With
+    ``num_threads > 0`` relations are instead counted independently on a
+    thread pool.
     
     Args:
         data: HeteroData object with edge_index tensors
         timestamp_dict: Dict mapping node_type -> timestamp tensor
+        num_threads: Thread pool size across relations; 0 runs the fused pass
+        check: Also run the per-edge Python reference and assert equality
     
     Returns:
         Modified data with edge_weight attributes added
     """
     logger.info("Computing GSMP edge weights...")
-    
-    for edge_type in data.edge_types:
-        src_type, rel_type, dst_type = edge_type
+
+    # int() in the reference loop truncates toward zero; .long() does the same.
+    long_times = {node_type: times.long() for node_type, times in timestamp_dict.items()}
+    weights = hetero_temporal_edge_weights(
+        data.edge_index_dict, long_times, scheme="gsmp", group_by="dst", normalize="raw",
+        missing="group", num_threads=num_threads,
+    )
+
+    for edge_type, edge_weight in weights.items():
         edge_index = data[edge_type].edge_index
-        
-        if edge_index is None or edge_index.shape[1] == 0:
-            continue
-        
-        src_nodes = edge_index[0]
-        dst_nodes = edge_index[1]
-        
-        # Get timestamps
-        src_times = timestamp_dict[src_type][src_nodes]
-        dst_times = timestamp_dict[dst_type][dst_nodes]
-        
-        # For each (dst_node, src_time) pair, count how many edges have that combination
-        # This is count_v[tau]
-        timestamp_counts = defaultdict(int)
-        for src_time, dst_node in zip(src_times.tolist(), dst_nodes.tolist()):
-            src_time = int(src_time)
-            dst_node = int(dst_node)
-            key = (dst_node, src_time)
-            timestamp_counts[key] += 1
-        
-        # Compute edge weights: 1 / count_v[time(u)]
-        edge_weight = torch.zeros(len(src_nodes), dtype=torch.float32)
-        for i, (src_time, dst_node) in enumerate(zip(src_times.tolist(), dst_nodes.tolist())):
-            src_time = int(src_time)
-            dst_node = int(dst_node)
-            key = (dst_node, src_time)
-            count = timestamp_counts[key]
-            edge_weight[i] = 1.0 / count
-        
+        if check:
+            src_type, _, _ = edge_type
+            src_times = long_times[src_type][edge_index[0]]
+            reference = _gsmp_weights_loop(src_times.cpu(), edge_index[1].cpu())
+            assert torch.equal(edge_weight.cpu(), reference), \
+                f"Vectorized GSMP weights differ from the reference loop for {edge_type}"
+
         # Add to data
+        edge_weight = edge_weight.contiguous()
         data[edge_type].edge_weight = edge_weight.to(edge_index.device)
         
         # Sanity checks
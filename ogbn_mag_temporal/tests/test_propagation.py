@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from propagation import (  # noqa: E402
+    PROPAGATION_BACKENDS,
+    CompactGraph,
+    _csr_step,
+    _propagate_once,
+    build_csr_adj,
+    normalize_adj,
+    propagate_channels,
+    propagate_features,
+)
+
+
+NUM_NODES = 50
+
+
+def assert_close(actual, expected, name):
+    if not torch.allclose(actual, expected, rtol=1e-5, atol=1e-6):
+        raise AssertionError(f"{name}: max diff {float((actual - expected).abs().max())}")
+
+
+def graph_with_duplicates(seed=0):
+    """Random edges plus repeated ones; nodes 40..49 have no edges at all."""
+    gen = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(0, 40, (2, 300), generator=gen)
+    edge_index = torch.cat([edge_index, edge_index[:, :60], torch.tensor([[3, 3, 3], [7, 7, 7]])], dim=1)
+    edge_weight = torch.rand(edge_index.shape[1], generator=gen) + 0.1
+    x = torch.randn(NUM_NODES, 6, generator=gen)
+    return edge_index, edge_weight, x
+
+
+def backend_hops(backend, x, edge_index, edge_weight, num_hops):
+    if backend == "index_add":
+        def step(h):
+            return _propagate_once(h, edge_index, edge_weight, NUM_NODES, chunk_size=37)
+    elif backend == "csr":
+        step = _csr_step(build_csr_adj(edge_index, edge_weight, NUM_NODES, NUM_NODES))
+    else:
+        step = _csr_step(CompactGraph(edge_index, NUM_NODES, edge_weight=edge_weight).to_torch_csr())
+    hops, h = [], x
+    for _ in range(num_hops):
+        h = step(h)
+        hops.append(h)
+    return hops
+
+
+def test_backends_match_index_add_for_every_mode():
+    edge_index, edge_weight, x = graph_with_duplicates()
+    for mode in ("dst", "src", "none"):
+        norm_edge_index, norm_edge_weight = normalize_adj(edge_index, NUM_NODES, NUM_NODES, edge_weight, mode=mode)
+        expected = backend_hops("index_add", x, norm_edge_index, norm_edge_weight, 3)
+        for backend in PROPAGATION_BACKENDS[1:]:
+            got = backend_hops(backend, x, norm_edge_index, norm_edge_weight, 3)
+            for hop, (a, b) in enumerate(zip(got, expected), start=1):
+                assert_close(a, b, f"{backend}/{mode} hop {hop}")
+                assert torch.equal(a[40:], torch.zeros_like(a[40:])), f"{backend}/{mode} isolated rows"
+
+
+def test_propagate_features_backends_agree():
+    edge_index, edge_weight, x = graph_with_duplicates(seed=1)
+    for weight in (None, edge_weight):
+        expected = propagate_features(x, edge_index, NUM_NODES, 2, edge_weight=weight, backend="index_add")
+        for backend in PROPAGATION_BACKENDS[1:]:
+            got = propagate_features(x, edge_index, NUM_NODES, 2, edge_weight=weight, backend=backend)
+            for hop, (a, b) in enumerate(zip(got, expected), start=1):
+                assert_close(a, b, f"{backend} weighted={weight is not None} hop {hop}")
+
+
+class DictCache:
+    """In-memory stand-in for ``hop_cache.HopFeatureCache``."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def key(self, graph, edge_weight, norm, features):
+        return (graph.data_ptr(), None if edge_weight is None else edge_weight.data_ptr(), norm)
+
+    def load(self, key, hops):
+        return self.entries.get(key)
+
+    def save(self, key, hops):
+        self.entries[key] = list(hops.values())
+
+
+def test_citation_pair_matches_separate_channels():
+    edge_index, forward_weight, x = graph_with_duplicates(seed=2)
+    reverse_weight = torch.rand(edge_index.shape[1], generator=torch.Generator().manual_seed(3)) + 0.1
+    extra = torch.randint(0, NUM_NODES, (2, 80), generator=torch.Generator().manual_seed(4))
+    channels = {
+        "cites": (edge_index, forward_weight),
+        "cited_by": (edge_index.flip(0), reverse_weight),
+        "extra": (extra, None),
+    }
+    for backend in PROPAGATION_BACKENDS:
+        cache = DictCache()
+        for _ in range(2):
+            got = propagate_channels(x, channels, NUM_NODES, 3, backend=backend, cache=cache, reverse_of={"cited_by": "cites"})
+            for name, (channel_edge_index, weight) in channels.items():
+                expected = propagate_features(x, channel_edge_index, NUM_NODES, 3, edge_weight=weight, backend=backend)
+                assert len(got[name]) == 3
+                for hop, (a, b) in enumerate(zip(got[name], expected), start=1):
+                    assert_close(a, b, f"{backend} {name} hop {hop}")
+        assert len(cache.entries) == 3
+
+
+if __name__ == "__main__":
+    test_backends_match_index_add_for_every_mode()
+    test_propagate_features_backends_agree()
+    test_citation_pair_matches_separate_channels()
+    print("propagation backend tests passed")
@@ -14,6 +14,7 @@ import torch.nn.functional as F
 
 from models import HHModel
 from propagation import (
+    PROPAGATION_BACKENDS,
     build_base_propagation,
     build_gsmp_propagation,
     build_smp_propagation,
@@ -31,6 +32,9 @@ from utils import (
     validate_split,
 )
 
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from hop_cache import open_hop_cache  # noqa: E402
+
 
 logger = logging.getLogger(__name__)
 
@@ -120,6 +124,26 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--use-label-feats", action="store_true")
     parser.add_argument("--use-precomputed", action="store_true")
     parser.add_argument("--force-recompute", action="store_true")
+    parser.add_argument(
+        "--propagation-backend",
+        choices=PROPAGATION_BACKENDS,
+        default="index_add",
+        help=(
+            "index_add = chunked gather/scatter; csr = normalized CSR adjacency + SpMM per hop; "
+            "csr_compact = csr with int32 indices."
+        ),
+    )
+    parser.add_argument(
+        "--hop-cache-dir",
+        default=None,
+        help="Shared content-addressed hop cache (see hop_cache.py); reused across methods and seeds.",
+    )
+    parser.add_argument(
+        "--hop-cache-max-gb",
+        type=float,
+        default=0.0,
+        help="Evict least-recently-used hop cache entries beyond this size; 0 = unlimited.",
+    )
 
     parser.add_argument(
         "--bucket-style",
@@ -281,11 +305,19 @@ def _build_or_load_features(
 
     print(
         f"[PROPAGATION] method={args.method} num_hops={args.num_hops} "
-        f"bucket_style={bucket_style}",
+        f"bucket_style={bucket_style} backend={args.propagation_backend}",
         flush=True,
     )
+    hop_cache = None if args.force_recompute else open_hop_cache(args.hop_cache_dir, args.hop_cache_max_gb)
+    if hop_cache is not None:
+        print(f"[CACHE] Using hop cache {args.hop_cache_dir} max_gb={args.hop_cache_max_gb}", flush=True)
     if args.method == "hh":
-        features = build_base_propagation(data=data, num_hops=args.num_hops)
+        features = build_base_propagation(
+            data=data,
+            num_hops=args.num_hops,
+            cache=hop_cache,
+            backend=args.propagation_backend,
+        )
     elif args.method == "hh_smp":
         features = build_smp_propagation(
             data=data,
@@ -293,6 +325,8 @@ def _build_or_load_features(
             years=years,
             num_hops=args.num_hops,
             bucket_style=bucket_style,
+            cache=hop_cache,
+            backend=args.propagation_backend,
         )
     elif args.method == "hh_ump":
         features = build_ump_propagation(
@@ -301,6 +335,8 @@ def _build_or_load_features(
             years=years,
             num_hops=args.num_hops,
             bucket_style=bucket_style,
+            cache=hop_cache,
+            backend=args.propagation_backend,
         )
     elif args.method == "hh_gsmp":
         features = build_gsmp_propagation(
@@ -309,12 +345,15 @@ def _build_or_load_features(
             years=years,
             num_hops=args.num_hops,
             bucket_style=bucket_style,
+            cache=hop_cache,
+            backend=args.propagation_backend,
         )
     else:
         raise ValueError(f"Unknown method {args.method}")
 
-    torch.save(features, cache_path)
-    print(f"[CACHE] Saved propagated features to {cache_path}", flush=True)
+    if hop_cache is None:
+        torch.save(features, cache_path)
+        print(f"[CACHE] Saved propagated features to {cache_path}", flush=True)
     return features
 
 
@@ -14,6 +14,8 @@ from torch import Tensor
 from torch_geometric.data import Data
 from torch_geometric.nn.models import LINKX
 
+from temporal_weights import smp_single_mask
+
 
 POKEC_FILE_ID = "1dNs5E7BrWJbgcHeQ_zuy5Ozp2tRCWG0y"
 POKEC_SPLITS_FILE_ID = "1ZhpAiyTNc0cE_hhgyiqxnkKREHK7MK-_"
@@ -144,9 +146,7 @@ def compute_smp_edge_weight(
     if t_max is None:
         t_max = float(node_time.max().item())
     src, dst = edge_index
-    delta = (node_time[src] - node_time[dst]).abs()
-    radius = torch.minimum(node_time[dst] - t_min, t_max - node_time[dst])
-    single = delta > radius
+    single = smp_single_mask(node_time[src], node_time[dst], t_min, t_max, single_on_equal=False)
     edge_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
     edge_weight[single.cpu()] = 2.0
     return edge_weight, int(single.sum().item())
@@ -0,0 +1,356 @@
+"""Columnar loader and binary cache for the raw SNAP Pokec dump.
+
+``soc-pokec-profiles.txt.gz`` (1.6M rows, 59 columns) and
+``soc-pokec-relationships.txt.gz`` (30.6M edges) are parsed once with the
+pandas C reader in row chunks and written next to the raw files:
+
+    soc-pokec-profiles.cache.npz          # per-row user_id/public/completion/gender/age/registered_ns
+    soc-pokec-profiles.cache.json         # source size/mtime, cache version
+    soc-pokec-relationships.cache.npy     # int32 [2, E] raw (1-based) endpoints, memory-mapped on load
+    soc-pokec-relationships.cache.json
+
+Later runs only check the json against the raw file and load the arrays.  The
+cache keeps the rows exactly as they appear in the file (duplicates, unknown
+labels, missing registrations) so each script can apply its own filtering;
+``profile_tensors`` rebuilds the ``x, y, node_time, node_year`` tensors of
+``pokec_raw_linkx_smp.load_profiles``.
+
+Registration stamps are stored as naive nanoseconds.  ``registration_days``
+converts them the way ``datetime.timestamp()`` does (local time zone), so
+``node_time`` matches the old per-line parser on the machine that loads it.
+
+    python pokec_raw_cache.py --root ./data/pokec      # build or refresh both caches
+"""
+import argparse
+import csv
+import gzip
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import torch
+from torch import Tensor
+
+
+CACHE_VERSION = 2
+PROFILE_CHUNK_ROWS = 200_000
+EDGE_CHUNK_ROWS = 5_000_000
+NAT_NS = np.iinfo(np.int64).min
+
+USER_ID_COL = 0
+PUBLIC_COL = 1
+COMPLETION_COL = 2
+GENDER_COL = 3
+REGISTRATION_COL = 6
+AGE_COL = 7
+
+PROFILE_COLUMNS = ("user_id", "public", "completion", "gender", "age", "registered_ns")
+
+
+def cache_prefix(path: str, cache_dir: Optional[str] = None) -> str:
+    name = os.path.basename(path)
+    for suffix in (".gz", ".txt"):
+        if name.endswith(suffix):
+            name = name[: -len(suffix)]
+    return os.path.join(cache_dir or os.path.dirname(os.path.abspath(path)), f"{name}.cache")
+
+
+def _source_meta(path: str) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {
+        "version": CACHE_VERSION,
+        "source": os.path.basename(path),
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }
+
+
+def _cache_valid(prefix: str, data_path: str, path: str) -> bool:
+    meta_path = f"{prefix}.json"
+    if not (os.path.exists(meta_path) and os.path.exists(data_path)):
+        return False
+    with open(meta_path, "r", encoding="utf-8") as f:
+        return json.load(f) == _source_meta(path)
+
+
+def _atomic_save(data_path: str, meta: Dict[str, object], write) -> bool:
+    """Write ``data_path`` and its json sidecar; returns False if the directory is read-only."""
+    directory = os.path.dirname(data_path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.splitext(data_path)[1])
+    except OSError as exc:
+        print(f"[pokec-cache] cannot write cache next to {data_path}: {exc}")
+        return False
+    with os.fdopen(fd, "wb") as f:
+        write(f)
+    os.replace(tmp, data_path)
+    meta_path = os.path.splitext(data_path)[0] + ".json"
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(meta_path + ".tmp", meta_path)
+    return True
+
+
+def _numeric(values: pd.Series) -> np.ndarray:
+    return pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64)
+
+
+def _open_text(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def _short_lines(path: str, lines: np.ndarray) -> np.ndarray:
+    """The entries of ``lines`` (0-based line numbers) with at most ``AGE_COL`` fields.
+
+    The per-line parser skipped such rows.  Only lines with an empty age field
+    are passed in, so the extra scan of the file is rare.
+    """
+    if lines.size == 0:
+        return lines
+    wanted = set(lines.tolist())
+    last = max(wanted)
+    short = []
+    with _open_text(path) as f:
+        for number, text in enumerate(f):
+            if number in wanted and text.count("\t") < AGE_COL:
+                short.append(number)
+            if number == last:
+                break
+    return np.asarray(short, dtype=np.int64)
+
+
+def read_profile_columns(path: str, chunksize: int = PROFILE_CHUNK_ROWS) -> Dict[str, np.ndarray]:
+    """Parse the profile dump into per-row numeric columns without a cache."""
+    reader = pd.read_csv(
+        path,
+        sep="\t",
+        header=None,
+        names=list(range(AGE_COL + 1)),
+        usecols=[USER_ID_COL, PUBLIC_COL, COMPLETION_COL, GENDER_COL, REGISTRATION_COL, AGE_COL],
+        index_col=False,
+        dtype=str,
+        keep_default_na=False,
+        quoting=csv.QUOTE_NONE,
+        compression="infer",
+        encoding="utf-8",
+        encoding_errors="replace",
+        skip_blank_lines=False,
+        chunksize=chunksize,
+        engine="c",
+    )
+    parts: Dict[str, list] = {name: [] for name in PROFILE_COLUMNS}
+    row_lines, empty_age_lines = [], []
+    offset = 0
+    for chunk in reader:
+        line = np.arange(offset, offset + len(chunk))
+        offset += len(chunk)
+        user_id = _numeric(chunk[USER_ID_COL])
+        keep = np.isfinite(user_id) & (user_id == np.floor(user_id))
+        if not keep.all():
+            chunk = chunk[keep]
+            user_id = user_id[keep]
+            line = line[keep]
+        row_lines.append(line)
+        # The reader pads short rows with empty fields, so an empty age may be a missing column.
+        empty_age_lines.append(line[(chunk[AGE_COL] == "").to_numpy()])
+        gender = _numeric(chunk[GENDER_COL])
+        gender = np.where(np.isin(gender, (0.0, 1.0)), gender, -1).astype(np.int8)
+        registered = pd.to_datetime(chunk[REGISTRATION_COL], format="ISO8601", errors="coerce")
+        registered_ns = registered.astype("datetime64[ns]").to_numpy().view(np.int64)
+
+        parts["user_id"].append(user_id.astype(np.int64))
+        parts["public"].append(np.nan_to_num(_numeric(chunk[PUBLIC_COL]), nan=0.0))
+        parts["completion"].append(np.nan_to_num(_numeric(chunk[COMPLETION_COL]), nan=0.0))
+        parts["gender"].append(gender)
+        parts["age"].append(np.nan_to_num(_numeric(chunk[AGE_COL]), nan=0.0))
+        parts["registered_ns"].append(registered_ns)
+    columns = {name: np.concatenate(chunks) for name, chunks in parts.items()}
+    short = _short_lines(path, np.concatenate(empty_age_lines))
+    if short.size:
+        keep = ~np.isin(np.concatenate(row_lines), short)
+        columns = {name: values[keep] for name, values in columns.items()}
+    return columns
+
+
+def read_relationship_columns(path: str, chunksize: int = EDGE_CHUNK_ROWS) -> np.ndarray:
+    """Parse the relationship dump into a raw ``[2, E]`` endpoint array without a cache."""
+    reader = pd.read_csv(
+        path,
+        sep=r"\s+",
+        header=None,
+        names=["src", "dst"],
+        usecols=[0, 1],
+        dtype={"src": np.int64, "dst": np.int64},
+        compression="infer",
+        chunksize=chunksize,
+        engine="c",
+    )
+    chunks = [chunk.to_numpy(dtype=np.int64).T for chunk in reader]
+    if not chunks:
+        return np.empty((2, 0), dtype=np.int32)
+    edges = np.concatenate(chunks, axis=1)
+    if edges.size and edges.max() <= np.iinfo(np.int32).max and edges.min() >= 0:
+        edges = edges.astype(np.int32)
+    return edges
+
+
+def load_profile_columns(path: str, cache_dir: Optional[str] = None, refresh: bool = False) -> Dict[str, np.ndarray]:
+    """Per-row profile columns, read from ``<stem>.cache.npz`` when it matches ``path``."""
+    prefix = cache_prefix(path, cache_dir)
+    data_path = f"{prefix}.npz"
+    if not refresh and _cache_valid(prefix, data_path, path):
+        with np.load(data_path) as data:
+            return {name: data[name] for name in PROFILE_COLUMNS}
+
+    start = time.time()
+    columns = read_profile_columns(path)
+    print(f"[pokec-cache] parsed {columns['user_id'].size} profile rows in {time.time() - start:.1f}s")
+    if _atomic_save(data_path, _source_meta(path), lambda f: np.savez(f, **columns)):
+        print(f"[pokec-cache] wrote {data_path}")
+    return columns
+
+
+def load_relationship_array(path: str, cache_dir: Optional[str] = None, refresh: bool = False) -> np.ndarray:
+    """Raw 1-based ``[2, E]`` endpoints, memory-mapped from ``<stem>.cache.npy`` when cached."""
+    prefix = cache_prefix(path, cache_dir)
+    data_path = f"{prefix}.npy"
+    if not refresh and _cache_valid(prefix, data_path, path):
+        return np.load(data_path, mmap_mode="r")
+
+    start = time.time()
+    edges = read_relationship_columns(path)
+    print(f"[pokec-cache] parsed {edges.shape[1]} relationship rows in {time.time() - start:.1f}s")
+    if _atomic_save(data_path, _source_meta(path), lambda f: np.save(f, edges)):
+        print(f"[pokec-cache] wrote {data_path}")
+    return edges
+
+
+def registration_days(registered_ns: np.ndarray) -> np.ndarray:
+    """float32 days since the epoch as ``datetime.timestamp() / 86400``; NaN where missing.
+
+    Naive stamps are interpreted in the local time zone.  The UTC offset is
+    looked up once per distinct hour, which is where DST transitions happen.
+    """
+    days = np.full(registered_ns.shape, np.nan, dtype=np.float32)
+    valid = registered_ns != NAT_NS
+    if not valid.any():
+        return days
+    ns = registered_ns[valid]
+    seconds = ns // 1_000_000_000
+    micros = (ns % 1_000_000_000) // 1000
+    hours, inverse = np.unique(seconds // 3600, return_inverse=True)
+    epoch = datetime(1970, 1, 1)
+    offsets = np.array(
+        [int((epoch + timedelta(hours=int(hour))).timestamp()) - int(hour) * 3600 for hour in hours],
+        dtype=np.int64,
+    )
+    local = (seconds + offsets[inverse.reshape(-1)]).astype(np.float64) + micros / 1e6
+    days[valid] = (local / 86400.0).astype(np.float32)
+    return days
+
+
+def registration_years(registered_ns: np.ndarray) -> np.ndarray:
+    years = np.full(registered_ns.shape, -1, dtype=np.int64)
+    valid = registered_ns != NAT_NS
+    years[valid] = registered_ns[valid].astype("datetime64[ns]").astype("datetime64[Y]").astype(np.int64) + 1970
+    return years
+
+
+def profile_tensors(
+    columns: Dict[str, np.ndarray], num_nodes: Optional[int] = None
+) -> Tuple[Tensor, Tensor, Tensor, Tensor, Dict[str, int]]:
+    """Scatter per-row columns into ``x, y, node_time, node_year`` indexed by ``user_id - 1``.
+
+    Later rows overwrite earlier ones for duplicated ids, as in the per-line
+    parser.  Also returns the row/label/registration counts it reports.
+    """
+    user_id = columns["user_id"]
+    n = max(num_nodes or 0, int(user_id.max()) if user_id.size else 0)
+    idx = user_id - 1
+    gender = columns["gender"].astype(np.int64)
+    registered_ns = columns["registered_ns"]
+
+    y = np.full(n, -1, dtype=np.int64)
+    has_gender = gender >= 0
+    y[idx[has_gender]] = gender[has_gender]
+
+    has_time = registered_ns != NAT_NS
+    node_time = np.full(n, np.nan, dtype=np.float32)
+    node_time[idx[has_time]] = registration_days(registered_ns[has_time])
+    node_year = np.full(n, -1, dtype=np.int64)
+    node_year[idx[has_time]] = registration_years(registered_ns[has_time])
+
+    age_raw = columns["age"]
+    age_known = age_raw > 0
+    rows = np.stack(
+        [
+            columns["public"],
+            columns["completion"] / 100.0,
+            np.where(age_known, age_raw / 100.0, 0.0),
+            age_known.astype(np.float64),
+            np.ones_like(age_raw),
+        ],
+        axis=1,
+    ).astype(np.float32)
+    x = np.zeros((n, 5), dtype=np.float32)
+    x[idx] = rows
+
+    counts = {
+        "profile_rows": int(user_id.size),
+        "valid_gender": int(has_gender.sum()),
+        "valid_registration": int(has_time.sum()),
+    }
+    return (
+        torch.from_numpy(x),
+        torch.from_numpy(y),
+        torch.from_numpy(node_time),
+        torch.from_numpy(node_year),
+        counts,
+    )
+
+
+def relationship_edge_index(edges: np.ndarray, num_nodes: int, compact: bool = False) -> Tensor:
+    """0-based ``edge_index`` keeping only edges whose endpoints fall in ``[0, num_nodes)``.
+
+    ``compact`` keeps int32 ids (see ``compact_graph.py``) instead of int64.
+    """
+    index_dtype = np.int32 if compact and num_nodes <= np.iinfo(np.int32).max else np.int64
+    src = edges[0].astype(index_dtype) - 1
+    dst = edges[1].astype(index_dtype) - 1
+    keep = (src >= 0) & (src < num_nodes) & (dst >= 0) & (dst < num_nodes)
+    if not keep.all():
+        src = src[keep]
+        dst = dst[keep]
+    return torch.from_numpy(np.stack([src, dst]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the binary cache for raw SNAP Pokec files.")
+    parser.add_argument("--root", default="data/pokec")
+    parser.add_argument("--cache-dir", default=None, help="Defaults to the directory of the raw files.")
+    parser.add_argument("--refresh", action="store_true", help="Re-parse even if the cache is up to date.")
+    args = parser.parse_args()
+
+    from pokec_raw_linkx_smp import existing_path
+
+    profiles_path = existing_path(args.root, "soc-pokec-profiles.txt.gz")
+    relationships_path = existing_path(args.root, "soc-pokec-relationships.txt.gz")
+    start = time.time()
+    columns = load_profile_columns(profiles_path, args.cache_dir, refresh=args.refresh)
+    x, _, _, _, counts = profile_tensors(columns)
+    print(f"profiles: {counts} nodes={x.size(0)} ({time.time() - start:.1f}s)")
+    start = time.time()
+    edges = load_relationship_array(relationships_path, args.cache_dir, refresh=args.refresh)
+    print(f"relationships: {edges.shape[1]} edges ({time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
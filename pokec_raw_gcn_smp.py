@@ -131,6 +131,11 @@ def main() -> None:
     parser.add_argument("--dropout", type=float, default=0.5)
     parser.add_argument("--lr", type=float, default=0.01)
     parser.add_argument("--weight-decay", type=float, default=5e-4)
+    parser.add_argument(
+        "--compact-graph",
+        action="store_true",
+        help="Keep edge_index and the sparse adjacencies in int32 (see compact_graph.py).",
+    )
     parser.add_argument("--result-dir", default="results")
     parser.add_argument("--tag", default="pokec_raw_gcn_vs_gcn_smp")
     args = parser.parse_args()
@@ -143,7 +148,7 @@ def main() -> None:
         download(RELATIONSHIPS_URL, relationships_path)
 
     x, y, node_time, node_year = load_profiles(profiles_path)
-    edge_index = load_relationships(relationships_path, num_nodes=x.size(0))
+    edge_index = load_relationships(relationships_path, num_nodes=x.size(0), compact=args.compact_graph)
     # Use an undirected graph for the GCN baseline.
     edge_index = torch.cat([edge_index, edge_index.flip(0)], dim=1)
     split = build_temporal_split(
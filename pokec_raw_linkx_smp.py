@@ -1,10 +1,7 @@
 import argparse
-import gzip
 import os
 import random
 import time
-from collections import Counter
-from datetime import datetime
 from typing import Dict, Optional, Tuple
 
 import numpy as np
@@ -14,19 +11,20 @@ from torch import Tensor
 from torch_geometric.data import Data
 from torch_geometric.nn.models import LINKX
 
+from compact_graph import CompactGraph
+from pokec_raw_cache import (
+    load_profile_columns,
+    load_relationship_array,
+    profile_tensors,
+    relationship_edge_index,
+)
+from temporal_split import temporal_split, year_split
+from temporal_weights import smp_single_mask
+
 
 PROFILES_URL = "https://snap.stanford.edu/data/soc-pokec-profiles.txt.gz"
 RELATIONSHIPS_URL = "https://snap.stanford.edu/data/soc-pokec-relationships.txt.gz"
 
-USER_ID_COL = 0
-PUBLIC_COL = 1
-COMPLETION_COL = 2
-GENDER_COL = 3
-LAST_LOGIN_COL = 5
-REGISTRATION_COL = 6
-AGE_COL = 7
-
-
 def set_seed(seed: int) -> None:
     random.seed(seed)
     np.random.seed(seed)
@@ -54,123 +52,23 @@ def existing_path(root: str, gz_name: str) -> str:
     return gz_path
 
 
-def open_text(path: str):
-    if path.endswith(".gz"):
-        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
-    return open(path, "r", encoding="utf-8", errors="replace")
-
-
-def parse_datetime(value: str) -> Optional[datetime]:
-    value = value.strip()
-    if not value or value == "null":
-        return None
-    for fmt in (
-        "%Y-%m-%d %H:%M:%S.%f",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%d",
-    ):
-        try:
-            return datetime.strptime(value, fmt)
-        except ValueError:
-            pass
-    return None
-
-
-def parse_float(value: str, default: float = 0.0) -> float:
-    if value == "null" or value == "":
-        return default
-    try:
-        return float(value)
-    except ValueError:
-        return default
-
-
-def parse_int_label(value: str) -> int:
-    if value == "null" or value == "":
-        return -1
-    try:
-        return int(value)
-    except ValueError:
-        return -1
-
-
-def timestamp_days(dt: datetime) -> float:
-    return dt.timestamp() / 86400.0
-
-
-def load_profiles(path: str, num_nodes: Optional[int] = None):
-    rows = []
-    max_user_id = 0
-    with open_text(path) as f:
-        for line in f:
-            parts = line.rstrip("\n").split("\t")
-            if len(parts) <= AGE_COL:
-                continue
-            try:
-                user_id = int(parts[USER_ID_COL])
-            except ValueError:
-                continue
-            max_user_id = max(max_user_id, user_id)
-            rows.append((user_id, parts))
-
-    n = max(num_nodes or 0, max_user_id)
-    y = torch.full((n,), -1, dtype=torch.long)
-    node_time = torch.full((n,), float("nan"), dtype=torch.float32)
-    node_year = torch.full((n,), -1, dtype=torch.long)
-    x = torch.zeros((n, 5), dtype=torch.float32)
-
-    valid_registration = 0
-    valid_gender = 0
-    for user_id, parts in rows:
-        idx = user_id - 1
-        gender = parse_int_label(parts[GENDER_COL])
-        if gender in (0, 1):
-            y[idx] = gender
-            valid_gender += 1
-
-        registered_at = parse_datetime(parts[REGISTRATION_COL])
-        if registered_at is not None:
-            node_time[idx] = timestamp_days(registered_at)
-            node_year[idx] = registered_at.year
-            valid_registration += 1
-
-        public = parse_float(parts[PUBLIC_COL])
-        completion = parse_float(parts[COMPLETION_COL]) / 100.0
-        age_raw = parse_float(parts[AGE_COL])
-        age_known = 1.0 if age_raw > 0 else 0.0
-        age = age_raw / 100.0 if age_raw > 0 else 0.0
-
-        # No label leakage: excluded columns are user_id, gender label,
-        # last_login, and registration time. Registration is used only for
-        # temporal split construction and SMP edge weights.
-        x[idx] = torch.tensor([public, completion, age, age_known, 1.0])
-
-    print(f"profile rows: {len(rows)}")
-    print(f"valid gender labels: {valid_gender}")
-    print(f"valid registration times: {valid_registration}")
+def load_profiles(path: str, num_nodes: Optional[int] = None, cache_dir: Optional[str] = None):
+    columns = load_profile_columns(path, cache_dir=cache_dir)
+    x, y, node_time, node_year, counts = profile_tensors(columns, num_nodes=num_nodes)
+
+    # No label leakage: excluded columns are user_id, gender label,
+    # last_login, and registration time. Registration is used only for
+    # temporal split construction and SMP edge weights.
+    print(f"profile rows: {counts['profile_rows']}")
+    print(f"valid gender labels: {counts['valid_gender']}")
+    print(f"valid registration times: {counts['valid_registration']}")
     print("features: public, completion_percentage, age, age_known, bias")
     print("excluded from features: user_id, gender(label), last_login, registration")
     return x, y, node_time, node_year
 
 
-def load_relationships(path: str, num_nodes: int) -> Tensor:
-    def flat_edges():
-        with open_text(path) as f:
-            for line in f:
-                parts = line.split()
-                if len(parts) < 2:
-                    continue
-                u = int(parts[0]) - 1
-                v = int(parts[1]) - 1
-                if 0 <= u < num_nodes and 0 <= v < num_nodes:
-                    yield u
-                    yield v
-
-    flat = np.fromiter(flat_edges(), dtype=np.int64)
-    if flat.size % 2 != 0:
-        raise ValueError("Relationship file produced an odd number of endpoints.")
-    edges = flat.reshape(-1, 2).T
-    return torch.from_numpy(edges).long()
+def load_relationships(path: str, num_nodes: int, cache_dir: Optional[str] = None, compact: bool = False) -> Tensor:
+    return relationship_edge_index(load_relationship_array(path, cache_dir=cache_dir), num_nodes, compact=compact)
 
 
 def build_temporal_split(
@@ -180,25 +78,10 @@ def build_temporal_split(
     val_year: int,
     test_from_year: int,
 ) -> Dict[str, Tensor]:
-    train = []
-    val = []
-    test = []
-    years = []
-    for idx in torch.where((y >= 0) & (node_year >= 0))[0].tolist():
-        year = int(node_year[idx].item())
-        years.append(year)
-        if year <= train_until_year:
-            train.append(idx)
-        elif year == val_year:
-            val.append(idx)
-        elif year >= test_from_year:
-            test.append(idx)
-    print(f"labeled temporal year counts: {dict(sorted(Counter(years).items()))}")
-    return {
-        "train": torch.tensor(train, dtype=torch.long),
-        "valid": torch.tensor(val, dtype=torch.long),
-        "test": torch.tensor(test, dtype=torch.long),
-    }
+    eligible = (y >= 0) & (node_year >= 0)
+    years, counts = torch.unique(node_year[eligible], return_counts=True)
+    print(f"labeled temporal year counts: {dict(zip(years.tolist(), counts.tolist()))}")
+    return temporal_split(node_year, year_split(train_until_year, val_year, test_from_year), eligible=eligible)
 
 
 def compute_smp_edge_weight(edge_index: Tensor, node_time: Tensor) -> Tuple[Tensor, int, int]:
@@ -210,9 +93,7 @@ def compute_smp_edge_weight(edge_index: Tensor, node_time: Tensor) -> Tuple[Tens
     src, dst = edge_index
     valid = torch.isfinite(node_time[src]) & torch.isfinite(node_time[dst])
     edge_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
-    delta = (node_time[src[valid]] - node_time[dst[valid]]).abs()
-    radius = torch.minimum(node_time[dst[valid]] - t_min, t_max - node_time[dst[valid]])
-    single_valid = delta > radius
+    single_valid = smp_single_mask(node_time[src[valid]], node_time[dst[valid]], t_min, t_max, single_on_equal=False)
     valid_positions = torch.where(valid)[0]
     edge_weight[valid_positions[single_valid]] = 2.0
     return edge_weight, int(single_valid.sum().item()), int(valid.sum().item())
@@ -226,6 +107,9 @@ def make_linkx_sparse_adj(edge_index: Tensor, num_nodes: int, edge_weight: Optio
     messages. For raw Pokec that is too large, so we pass a sparse adjacency
     and trigger LINKX's sparse-matrix multiply path instead.
     """
+    if edge_index.dtype == torch.int32:
+        # Compact edges: build the CSR with int32 indices instead of widening through COO.
+        return CompactGraph(edge_index, num_nodes, edge_weight=edge_weight).to_torch_csr()
     src, dst = edge_index
     if edge_weight is None:
         edge_weight = torch.ones(edge_index.size(1), dtype=torch.float32)
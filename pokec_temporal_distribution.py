@@ -5,6 +5,8 @@ from collections import Counter
 from datetime import datetime
 from typing import Iterable, Optional, Tuple
 
+from pokec_raw_cache import NAT_NS, load_profile_columns
+
 
 REGISTRATION_COL = 6
 
@@ -36,6 +38,14 @@ def parse_registration(value: str) -> Optional[datetime]:
     return None
 
 
+def iter_cached_registered_users(path: str, cache_dir: Optional[str] = None) -> Iterable[Tuple[int, datetime]]:
+    columns = load_profile_columns(path, cache_dir=cache_dir)
+    valid = columns["registered_ns"] != NAT_NS
+    user_ids = columns["user_id"][valid].tolist()
+    stamps = columns["registered_ns"][valid].view("datetime64[ns]").astype("datetime64[us]").tolist()
+    return zip(user_ids, stamps)
+
+
 def iter_registered_users(path: str) -> Iterable[Tuple[int, datetime]]:
     with open_text(path) as f:
         for line_num, line in enumerate(f, start=1):
@@ -90,6 +100,10 @@ def main() -> None:
         required=True,
         help="Path to soc-pokec-profiles.txt or soc-pokec-profiles.txt.gz.",
     )
+    parser.add_argument("--cache-dir", default=None,
+                        help="Directory for the binary profile cache (default: next to --profiles).")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse the text file line by line, accepting the extra date formats.")
     parser.add_argument("--train-prop", type=float, default=0.5)
     parser.add_argument("--val-prop", type=float, default=0.25)
     parser.add_argument("--split-mode", choices=("quantile", "year"), default="quantile")
@@ -103,7 +117,11 @@ def main() -> None:
     if not os.path.exists(args.profiles):
         raise FileNotFoundError(args.profiles)
 
-    records = sorted(iter_registered_users(args.profiles), key=lambda item: (item[1], item[0]))
+    if args.no_cache:
+        users = iter_registered_users(args.profiles)
+    else:
+        users = iter_cached_registered_users(args.profiles, args.cache_dir)
+    records = sorted(users, key=lambda item: (item[1], item[0]))
     total = len(records)
     if total == 0:
         raise ValueError("No parseable registration timestamps found.")
@@ -0,0 +1,200 @@
+"""Tensor-native temporal node splits shared by the Pokec, Elliptic and arxiv scripts.
+
+Two kinds of split are supported:
+
+* ``RangeSplit``: each split is a time interval ``(start, end]`` (``None`` is
+  unbounded).  ``year_split`` builds the usual "train <= Y0, valid == Y1,
+  test >= Y2" rule for integer years and ``rolling_splits`` a sequence of
+  sliding (or expanding) windows for sweeps.
+* ``QuantileSplit``: eligible nodes are ordered by ``(time, node id)`` and the
+  first ``train_prop`` / next ``valid_prop`` / rest go to train/valid/test.
+
+``temporal_splits`` evaluates any number of configurations at once: the times
+are bucketized once against the union of all range boundaries and sorted once
+for all quantile configurations, then every configuration is a table lookup.
+
+    splits = temporal_splits(node_year, [year_split(2009, 2010, 2011), year_split(2010, 2011, 2012)],
+                             eligible=y >= 0)
+    splits[0]["train"]  # LongTensor of node ids
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import torch
+from torch import Tensor
+
+
+SPLIT_NAMES = ("train", "valid", "test")
+Interval = Tuple[Optional[float], Optional[float]]
+
+
+@dataclass(frozen=True)
+class RangeSplit:
+    """Per-split ``(start, end]`` time intervals; ``None`` leaves a side open."""
+
+    train: Optional[Interval] = None
+    valid: Optional[Interval] = None
+    test: Optional[Interval] = None
+
+
+@dataclass(frozen=True)
+class QuantileSplit:
+    """Chronological rank split with ``int(n * prop)`` nodes per leading split."""
+
+    train_prop: float
+    valid_prop: float
+
+
+SplitSpec = Union[RangeSplit, QuantileSplit]
+
+
+def year_split(train_until: int, val_year: int, test_from: int) -> RangeSplit:
+    """``year <= train_until`` / ``year == val_year`` / ``year >= test_from`` for integer years."""
+    return RangeSplit(
+        train=(None, train_until),
+        valid=(val_year - 1, val_year),
+        test=(test_from - 1, None),
+    )
+
+
+def rolling_splits(
+    first_train_end: int,
+    last_train_end: int,
+    train_span: Optional[int] = None,
+    valid_span: int = 1,
+    test_span: int = 1,
+    step: int = 1,
+) -> List[RangeSplit]:
+    """Sliding windows ``(t - train_span, t] / (t, t + v] / (t + v, t + v + s]``.
+
+    ``train_span=None`` gives expanding windows that always start at the
+    earliest time.
+    """
+    splits = []
+    for end in range(first_train_end, last_train_end + 1, step):
+        start = None if train_span is None else end - train_span
+        valid_end = end + valid_span
+        splits.append(
+            RangeSplit(
+                train=(start, end),
+                valid=(end, valid_end),
+                test=(valid_end, valid_end + test_span),
+            )
+        )
+    return splits
+
+
+def default_eligible(node_time: Tensor) -> Tensor:
+    if node_time.is_floating_point():
+        return torch.isfinite(node_time)
+    return torch.ones_like(node_time, dtype=torch.bool)
+
+
+def _split_output(split_id: Tensor, output: str) -> Dict[str, Tensor]:
+    if output == "mask":
+        return {name: split_id == k for k, name in enumerate(SPLIT_NAMES)}
+    return {name: torch.where(split_id == k)[0] for k, name in enumerate(SPLIT_NAMES)}
+
+
+def _range_split_ids(node_time: Tensor, eligible: Tensor, specs: Sequence[RangeSplit]) -> List[Tensor]:
+    bounds = set()
+    for spec in specs:
+        for interval in (spec.train, spec.valid, spec.test):
+            if interval is not None:
+                bounds.update(value for value in interval if value is not None)
+    boundaries = torch.tensor(sorted(bounds), dtype=torch.float64)
+    # bucket b covers (boundaries[b - 1], boundaries[b]]; the last bucket is open above.
+    bucket = torch.bucketize(node_time.double(), boundaries, right=False)
+    lower = torch.cat([torch.tensor([-float("inf")], dtype=torch.float64), boundaries])
+
+    out = []
+    for spec in specs:
+        table = torch.full((boundaries.numel() + 1,), -1, dtype=torch.long)
+        for k, interval in enumerate((spec.train, spec.valid, spec.test)):
+            if interval is None:
+                continue
+            start, end = interval
+            start = -float("inf") if start is None else float(start)
+            end = float("inf") if end is None else float(end)
+            inside = lower >= start
+            inside &= torch.cat([boundaries, torch.tensor([float("inf")], dtype=torch.float64)]) <= end
+            table[inside & (table < 0)] = k
+        split_id = table[bucket]
+        split_id[~eligible] = -1
+        out.append(split_id)
+    return out
+
+
+def _quantile_split_ids(node_time: Tensor, eligible: Tensor, specs: Sequence[QuantileSplit]) -> List[Tensor]:
+    candidates = torch.where(eligible)[0]
+    order = candidates[torch.sort(node_time[candidates], stable=True).indices]
+    total = order.numel()
+    rank_split = torch.empty(total, dtype=torch.long)
+
+    out = []
+    for spec in specs:
+        train_end = int(total * spec.train_prop)
+        valid_end = train_end + int(total * spec.valid_prop)
+        rank_split[:train_end] = 0
+        rank_split[train_end:valid_end] = 1
+        rank_split[valid_end:] = 2
+        split_id = torch.full(node_time.shape, -1, dtype=torch.long)
+        split_id[order] = rank_split
+        out.append(split_id)
+    return out
+
+
+def temporal_splits(
+    node_time: Tensor,
+    specs: Union[Sequence[SplitSpec], Mapping[str, SplitSpec]],
+    eligible: Optional[Tensor] = None,
+    output: str = "index",
+) -> Union[List[Dict[str, Tensor]], Dict[str, Dict[str, Tensor]]]:
+    """Evaluate many split configurations over one time vector.
+
+    Args:
+        node_time: Tensor [num_nodes] of timestamps or years.
+        specs: List of ``RangeSplit``/``QuantileSplit`` or a name -> spec mapping.
+        eligible: Optional bool mask of nodes that may enter any split (e.g.
+            labeled nodes). Non-finite float times are always excluded.
+        output: ``"index"`` for sorted node ids per split, ``"mask"`` for bool masks.
+
+    Returns:
+        One ``{"train", "valid", "test"}`` dict per spec, in the container
+        type of ``specs``.
+    """
+    if output not in {"index", "mask"}:
+        raise ValueError(f"output must be 'index' or 'mask', got {output!r}")
+    node_time = node_time.view(-1)
+    mask = default_eligible(node_time)
+    if eligible is not None:
+        mask = mask & eligible.view(-1).to(device=node_time.device, dtype=torch.bool)
+
+    named = isinstance(specs, Mapping)
+    items = list(specs.items()) if named else list(enumerate(specs))
+    for _, spec in items:
+        if not isinstance(spec, (RangeSplit, QuantileSplit)):
+            raise TypeError(f"Unsupported split spec {spec!r}")
+    range_items = [(key, spec) for key, spec in items if isinstance(spec, RangeSplit)]
+    quantile_items = [(key, spec) for key, spec in items if isinstance(spec, QuantileSplit)]
+
+    split_ids = {}
+    if range_items:
+        ids = _range_split_ids(node_time.cpu(), mask.cpu(), [spec for _, spec in range_items])
+        split_ids.update(zip([key for key, _ in range_items], ids))
+    if quantile_items:
+        ids = _quantile_split_ids(node_time.cpu(), mask.cpu(), [spec for _, spec in quantile_items])
+        split_ids.update(zip([key for key, _ in quantile_items], ids))
+
+    results = {key: _split_output(split_ids[key].to(node_time.device), output) for key, _ in items}
+    return results if named else [results[key] for key, _ in items]
+
+
+def temporal_split(
+    node_time: Tensor,
+    spec: SplitSpec,
+    eligible: Optional[Tensor] = None,
+    output: str = "index",
+) -> Dict[str, Tensor]:
+    """Single-configuration convenience wrapper around ``temporal_splits``."""
+    return temporal_splits(node_time, [spec], eligible=eligible, output=output)[0]
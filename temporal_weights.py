@@ -0,0 +1,435 @@
+"""Shared SMP/GSMP temporal edge weights for homogeneous and heterogeneous graphs.
+
+Edges are ``edge_index = [src; dst]`` with messages flowing ``src -> dst``.
+
+* GSMP: the *anchor* endpoint (``group_by="dst"`` for target-wise balancing,
+  ``"src"`` for source-wise) groups its edges by the time of the other
+  endpoint; an edge's raw weight is ``1 / size of its group``.
+* SMP: raw weight 2 for "single" edges, ``|t_u - t_v| > min(t_v - t_min,
+  t_max - t_v)`` (and ``t_u == t_v`` with ``single_on_equal``), else 1.
+
+``normalize`` rescales per anchor: ``"raw"`` keeps the raw weights,
+``"mean_one"`` makes the anchor's weights average 1 and ``"row"`` makes them
+sum to 1.  Missing times (negative or non-finite) follow ``missing``:
+``"unit"`` gives such edges raw weight 1 and keeps them out of the counts,
+``"group"`` treats every value, including ``-1``, as an ordinary time.
+Edges outside ``edge_mask`` are dropped from counting and normalization and
+get ``fill_value``.
+
+Group sizes come from one of three counting kernels over packed
+``anchor * num_groups + group`` keys: ``"bincount"`` (dense table, best when
+the key space is at most a few times the edge count), ``"unique"`` and
+``"sort"`` (``O(E log E)``, independent of the key space).  ``"auto"`` picks
+bincount for small key spaces, otherwise sort on CPU and unique on CUDA.
+All kernels run on the device of the inputs; CPU kernels use torch's
+intra-op threads and heterogeneous graphs can additionally spread relations
+over a thread pool.
+
+    w = temporal_edge_weights(edge_index, node_year, scheme="gsmp", group_by="src", normalize="mean_one")
+    w_dict = hetero_temporal_edge_weights(data.edge_index_dict, year_dict, scheme="gsmp")
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import torch
+from torch import Tensor
+
+
+SCHEMES = ("gsmp", "smp")
+NORMALIZATIONS = ("raw", "mean_one", "row")
+KERNELS = ("auto", "bincount", "unique", "sort")
+MISSING = ("unit", "group")
+
+
+def valid_time_mask(time: Tensor) -> Tensor:
+    if time.is_floating_point():
+        return torch.isfinite(time) & (time >= 0)
+    return time >= 0
+
+
+def select_kernel(num_keys: int, key_range: int, device: torch.device, max_bincount_size: Optional[int] = None) -> str:
+    if max_bincount_size is not None:
+        small = key_range <= max_bincount_size
+    else:
+        small = key_range <= 4 * num_keys + 1024
+    if small:
+        return "bincount"
+    return "sort" if device.type == "cpu" else "unique"
+
+
+def group_counts(
+    keys: Tensor,
+    key_range: int,
+    kernel: str = "auto",
+    return_groups: bool = False,
+    max_bincount_size: Optional[int] = None,
+) -> Tuple[Tensor, Optional[Tensor]]:
+    """Size of each key's group per element, and optionally the sorted distinct keys."""
+    if kernel not in KERNELS:
+        raise ValueError(f"kernel must be one of {KERNELS}, got {kernel!r}")
+    if kernel == "auto":
+        kernel = select_kernel(keys.numel(), key_range, keys.device, max_bincount_size)
+    groups = None
+    if kernel == "bincount":
+        table = torch.bincount(keys, minlength=key_range)
+        counts = table[keys]
+        if return_groups:
+            groups = torch.nonzero(table).view(-1)
+    elif kernel == "unique":
+        groups, inverse, table = torch.unique(keys, sorted=True, return_inverse=True, return_counts=True)
+        counts = table[inverse]
+    else:
+        sorted_keys, order = torch.sort(keys)
+        groups, runs = torch.unique_consecutive(sorted_keys, return_counts=True)
+        counts = torch.empty_like(keys)
+        counts[order] = torch.repeat_interleave(runs, runs)
+    return counts, groups
+
+
+def time_groups(time: Tensor, missing: str = "unit") -> Tuple[Tensor, int]:
+    """Dense time-group ids (``-1`` for missing times under ``missing="unit"``) and the group count."""
+    if missing not in MISSING:
+        raise ValueError(f"missing must be one of {MISSING}, got {missing!r}")
+    group = torch.full(time.shape, -1, dtype=torch.long, device=time.device)
+    valid = valid_time_mask(time) if missing == "unit" else torch.ones_like(time, dtype=torch.bool)
+    if not bool(valid.any()):
+        return group, 0
+    _, inverse = torch.unique(time[valid], sorted=True, return_inverse=True)
+    group[valid] = inverse
+    return group, int(inverse.max().item()) + 1
+
+
+def smp_single_mask(
+    src_time: Tensor,
+    dst_time: Tensor,
+    t_min: float,
+    t_max: float,
+    single_on_equal: bool = True,
+) -> Tensor:
+    """Per-edge SMP "single" flag from endpoint times; the radius is measured at the target."""
+    delta = (src_time - dst_time).abs()
+    radius = torch.minimum(dst_time - t_min, t_max - dst_time)
+    single = delta > radius
+    if single_on_equal:
+        single = single | (delta == 0)
+    return single
+
+
+def _as_index(index: Tensor) -> Tensor:
+    """Keep int32/int64 indices as they are; anything else becomes int64."""
+    return index if index.dtype in (torch.int32, torch.int64) else index.long()
+
+
+class _GSMPPlan:
+    """Packed counting keys of one relation plus what is needed to finish its weights."""
+
+    def __init__(self, anchor: Tensor, edge_group: Tensor, num_groups: int, num_anchors: int, member: Optional[Tensor]):
+        counted = edge_group >= 0
+        if member is not None:
+            counted = counted & member
+        self.anchor = anchor
+        self.member = member
+        self.num_anchors = num_anchors
+        self.num_groups = max(num_groups, 1)
+        self.counted = torch.where(counted)[0]
+        # Keys are int64 even for int32 anchors (compact edge storage).
+        self.keys = anchor[self.counted].long() * self.num_groups + edge_group[self.counted]
+        self.key_range = num_anchors * self.num_groups
+
+
+def normalize_edge_weights(
+    anchor: Tensor,
+    raw: Tensor,
+    num_anchors: int,
+    normalize: str,
+    member: Optional[Tensor] = None,
+) -> Tensor:
+    """Rescale raw weights per anchor (``"mean_one"`` or ``"row"``); ``member`` limits the edges involved."""
+    if normalize not in NORMALIZATIONS:
+        raise ValueError(f"normalize must be one of {NORMALIZATIONS}, got {normalize!r}")
+    raw = raw.to(torch.float32)
+    if normalize == "raw":
+        return raw
+    pos = None if member is None else torch.where(member)[0]
+    anchor_m = anchor if pos is None else anchor[pos]
+    raw_m = raw if pos is None else raw[pos]
+    total = torch.zeros(num_anchors, dtype=torch.float32, device=raw.device)
+    total.scatter_add_(0, anchor_m, raw_m)
+    if normalize == "row":
+        scaled = raw_m / total[anchor_m].clamp_min(1e-12)
+    else:
+        degree = torch.bincount(anchor_m, minlength=num_anchors).to(torch.float32)
+        mean = torch.zeros_like(total)
+        has_edges = degree > 0
+        mean[has_edges] = total[has_edges] / degree[has_edges]
+        scaled = raw_m / mean[anchor_m].clamp_min(1e-12)
+    if pos is None:
+        return scaled
+    out = raw.clone()
+    out[pos] = scaled
+    return out
+
+
+def _finish_gsmp(plan: _GSMPPlan, counts: Tensor, groups: Optional[Tensor], normalize: str, fill_value: float) -> Tensor:
+    num_edges = plan.anchor.numel()
+    device = plan.anchor.device
+    raw = torch.ones(num_edges, dtype=torch.float32, device=device)
+    if plan.member is not None:
+        raw[~plan.member] = fill_value
+    if normalize != "row":
+        raw[plan.counted] = 1.0 / counts.to(torch.float32)
+        return normalize_edge_weights(plan.anchor, raw, plan.num_anchors, normalize, plan.member)
+
+    # Row sums are exact: every non-empty group adds 1 and every uncounted member edge adds 1.
+    denom = torch.bincount(groups // plan.num_groups, minlength=plan.num_anchors).to(torch.float32)
+    uncounted = torch.ones(num_edges, dtype=torch.bool, device=device)
+    uncounted[plan.counted] = False
+    if plan.member is not None:
+        uncounted &= plan.member
+    if bool(uncounted.any()):
+        denom += torch.bincount(plan.anchor[uncounted], minlength=plan.num_anchors).to(torch.float32)
+    denom = denom.clamp_min(1.0)
+    raw[plan.counted] = 1.0 / (denom[plan.anchor[plan.counted]] * counts.to(torch.float32))
+    raw[uncounted] = 1.0 / denom[plan.anchor[uncounted]]
+    return raw
+
+
+def gsmp_edge_weights(
+    anchor: Tensor,
+    edge_group: Tensor,
+    num_groups: int,
+    num_anchors: int,
+    normalize: str = "raw",
+    kernel: str = "auto",
+    edge_mask: Optional[Tensor] = None,
+    fill_value: float = 1.0,
+    max_bincount_size: Optional[int] = None,
+) -> Tensor:
+    """GSMP weights from per-edge anchors and dense time-group ids (``-1`` = not counted)."""
+    plan = _GSMPPlan(_as_index(anchor), edge_group.long(), num_groups, num_anchors, edge_mask)
+    counts, groups = group_counts(
+        plan.keys, plan.key_range, kernel, return_groups=normalize == "row", max_bincount_size=max_bincount_size
+    )
+    return _finish_gsmp(plan, counts, groups, normalize, fill_value)
+
+
+def _check_args(scheme: str, group_by: str, normalize: str, missing: str) -> None:
+    if scheme not in SCHEMES:
+        raise ValueError(f"scheme must be one of {SCHEMES}, got {scheme!r}")
+    if group_by not in {"src", "dst"}:
+        raise ValueError(f"group_by must be 'src' or 'dst', got {group_by!r}")
+    if normalize not in NORMALIZATIONS:
+        raise ValueError(f"normalize must be one of {NORMALIZATIONS}, got {normalize!r}")
+    if missing not in MISSING:
+        raise ValueError(f"missing must be one of {MISSING}, got {missing!r}")
+
+
+def _time_range(times: List[Tensor], missing: str) -> Tuple[Optional[float], Optional[float]]:
+    known = [t[valid_time_mask(t)] if missing == "unit" else t for t in times]
+    known = [t for t in known if t.numel() > 0]
+    if not known:
+        return None, None
+    return min(float(t.min().item()) for t in known), max(float(t.max().item()) for t in known)
+
+
+def _smp_weights(
+    src: Tensor,
+    dst: Tensor,
+    src_time: Tensor,
+    dst_time: Tensor,
+    anchor: Tensor,
+    num_anchors: int,
+    normalize: str,
+    missing: str,
+    single_on_equal: bool,
+    t_min: Optional[float],
+    t_max: Optional[float],
+    edge_mask: Optional[Tensor],
+    fill_value: float,
+) -> Tensor:
+    if t_min is None or t_max is None:
+        low, high = _time_range([src_time, dst_time], missing)
+        t_min = low if t_min is None else t_min
+        t_max = high if t_max is None else t_max
+    raw = torch.ones(src.numel(), dtype=torch.float32, device=src.device)
+    # Integer times are compared in float64 so large timestamps stay exact.
+    edge_src_time = src_time[src] if src_time.is_floating_point() else src_time[src].double()
+    edge_dst_time = dst_time[dst] if dst_time.is_floating_point() else dst_time[dst].double()
+    use = torch.ones_like(raw, dtype=torch.bool)
+    if missing == "unit":
+        use = valid_time_mask(edge_src_time) & valid_time_mask(edge_dst_time)
+    if edge_mask is not None:
+        use = use & edge_mask
+        raw[~edge_mask] = fill_value
+    if t_min is not None and bool(use.any()):
+        pos = torch.where(use)[0]
+        single = smp_single_mask(edge_src_time[pos], edge_dst_time[pos], t_min, t_max, single_on_equal)
+        raw[pos[single]] = 2.0
+    return normalize_edge_weights(anchor, raw, num_anchors, normalize, edge_mask)
+
+
+def temporal_edge_weights(
+    edge_index: Tensor,
+    node_time: Optional[Tensor] = None,
+    scheme: str = "gsmp",
+    group_by: str = "dst",
+    normalize: str = "raw",
+    src_time: Optional[Tensor] = None,
+    dst_time: Optional[Tensor] = None,
+    num_nodes: Optional[int] = None,
+    missing: str = "unit",
+    single_on_equal: bool = True,
+    t_min: Optional[float] = None,
+    t_max: Optional[float] = None,
+    kernel: str = "auto",
+    edge_mask: Optional[Tensor] = None,
+    fill_value: float = 1.0,
+    max_bincount_size: Optional[int] = None,
+    device: Optional[torch.device] = None,
+) -> Tensor:
+    """SMP/GSMP weights for one relation, in edge order (float32).
+
+    Args:
+        edge_index: Integer tensor [2, num_edges] (src, dst); int32 is used as is.
+        node_time: Node times of a homogeneous graph; for a bipartite
+            relation pass ``src_time``/``dst_time`` (per node of each side).
+            GSMP only needs the time of the non-anchor side.
+        scheme: ``"gsmp"`` or ``"smp"``.
+        group_by: Anchor endpoint, ``"dst"`` (target-wise) or ``"src"``.
+        normalize: ``"raw"``, ``"mean_one"`` or ``"row"`` per anchor.
+        num_nodes: Node count (anchor side for bipartite relations); inferred
+            from times/edges if omitted.
+        missing: ``"unit"`` or ``"group"`` handling of negative/non-finite times.
+        single_on_equal: SMP only, also single-weight same-time edges.
+        t_min, t_max: SMP time range; defaults to the range of known times.
+        kernel: Counting kernel, see module docstring.
+        edge_mask: Optional bool mask of edges that take part at all.
+        fill_value: Weight of edges outside ``edge_mask``.
+        max_bincount_size: With ``kernel="auto"``, use bincount iff the key space fits.
+        device: Optional device to compute on; defaults to ``edge_index.device``.
+    """
+    _check_args(scheme, group_by, normalize, missing)
+    if edge_index.dim() != 2 or edge_index.size(0) != 2:
+        raise ValueError("edge_index must have shape [2, num_edges].")
+    device = edge_index.device if device is None else torch.device(device)
+    edge_index = _as_index(edge_index.to(device))
+    if node_time is not None:
+        src_time = dst_time = node_time
+    other_side_time = src_time if group_by == "dst" else dst_time
+    if other_side_time is None or (scheme == "smp" and (src_time is None or dst_time is None)):
+        raise ValueError("Pass node_time, or src_time/dst_time (GSMP only needs the non-anchor side).")
+    # GSMP never reads the anchor's own time.
+    src_time = (src_time if src_time is not None else torch.empty(0)).view(-1).to(device)
+    dst_time = (dst_time if dst_time is not None else torch.empty(0)).view(-1).to(device)
+    if edge_mask is not None:
+        edge_mask = edge_mask.to(device=device, dtype=torch.bool)
+
+    src, dst = edge_index
+    num_edges = edge_index.size(1)
+    if num_edges == 0:
+        return torch.ones(0, dtype=torch.float32, device=device)
+    inferred = int(edge_index.max().item()) + 1
+    num_src = max(inferred if node_time is not None else int(src.max().item()) + 1, src_time.numel())
+    num_dst = max(inferred if node_time is not None else int(dst.max().item()) + 1, dst_time.numel())
+    if num_nodes is not None:
+        if node_time is not None:
+            num_src = num_dst = max(num_src, int(num_nodes))
+        elif group_by == "dst":
+            num_dst = max(num_dst, int(num_nodes))
+        else:
+            num_src = max(num_src, int(num_nodes))
+
+    anchor, other, other_time, num_anchors = (
+        (dst, src, src_time, num_dst) if group_by == "dst" else (src, dst, dst_time, num_src)
+    )
+    if scheme == "smp":
+        return _smp_weights(
+            src, dst, src_time, dst_time, anchor, num_anchors, normalize, missing,
+            single_on_equal, t_min, t_max, edge_mask, fill_value,
+        )
+    node_group, num_groups = time_groups(other_time, missing)
+    return gsmp_edge_weights(
+        anchor, node_group[other], num_groups, num_anchors, normalize=normalize, kernel=kernel,
+        edge_mask=edge_mask, fill_value=fill_value, max_bincount_size=max_bincount_size,
+    )
+
+
+def hetero_temporal_edge_weights(
+    edge_index_dict: Mapping[Tuple[str, str, str], Tensor],
+    time_dict: Mapping[str, Tensor],
+    scheme: str = "gsmp",
+    group_by: str = "dst",
+    normalize: str = "raw",
+    num_nodes_dict: Optional[Mapping[str, int]] = None,
+    num_threads: int = 0,
+    missing: str = "unit",
+    single_on_equal: bool = True,
+    t_min: Optional[float] = None,
+    t_max: Optional[float] = None,
+    kernel: str = "auto",
+    device: Optional[torch.device] = None,
+) -> Dict[Tuple[str, str, str], Tensor]:
+    """Per-relation weights for a heterogeneous graph.
+
+    With ``num_threads == 0`` GSMP counts every relation in one fused pass
+    (relation key spaces are offset into a single range); otherwise relations
+    run independently on a thread pool.  SMP uses one global ``t_min``/``t_max``
+    over all node types unless given.
+    """
+    _check_args(scheme, group_by, normalize, missing)
+    relations = [(edge_type, ei) for edge_type, ei in edge_index_dict.items() if ei is not None and ei.size(1) > 0]
+    if scheme == "smp" and (t_min is None or t_max is None):
+        low, high = _time_range([time_dict[name] for name in time_dict], missing)
+        t_min = low if t_min is None else t_min
+        t_max = high if t_max is None else t_max
+
+    def num_nodes(node_type: str) -> int:
+        if num_nodes_dict is not None and node_type in num_nodes_dict:
+            return int(num_nodes_dict[node_type])
+        return int(time_dict[node_type].numel())
+
+    def one(item):
+        (src_type, _, dst_type), ei = item
+        ei = ei if device is None else ei.to(device)
+        return temporal_edge_weights(
+            ei, scheme=scheme, group_by=group_by, normalize=normalize,
+            src_time=time_dict[src_type], dst_time=time_dict[dst_type], missing=missing,
+            single_on_equal=single_on_equal, t_min=t_min, t_max=t_max, kernel=kernel,
+        )
+
+    if scheme == "smp" or num_threads > 0:
+        if num_threads > 0:
+            with ThreadPoolExecutor(max_workers=num_threads) as pool:
+                weights = list(pool.map(one, relations))
+        else:
+            weights = [one(item) for item in relations]
+        return {edge_type: w for (edge_type, _), w in zip(relations, weights)}
+
+    plans = []
+    group_cache: Dict[str, Tuple[Tensor, int]] = {}
+    for (src_type, _, dst_type), ei in relations:
+        ei = _as_index(ei if device is None else ei.to(device))
+        src, dst = ei
+        anchor_type, other_type = (dst_type, src_type) if group_by == "dst" else (src_type, dst_type)
+        anchor, other = (dst, src) if group_by == "dst" else (src, dst)
+        if other_type not in group_cache:
+            group_cache[other_type] = time_groups(time_dict[other_type].view(-1).to(ei.device), missing)
+        node_group, num_groups = group_cache[other_type]
+        num_anchors = max(num_nodes(anchor_type), int(anchor.max().item()) + 1)
+        plans.append(_GSMPPlan(anchor, node_group[other], num_groups, num_anchors, None))
+
+    offsets = [0]
+    for plan in plans:
+        offsets.append(offsets[-1] + plan.key_range)
+    keys = torch.cat([plan.keys + offset for plan, offset in zip(plans, offsets)])
+    counts, groups = group_counts(keys, offsets[-1], kernel, return_groups=normalize == "row")
+    counts = torch.split(counts, [plan.keys.numel() for plan in plans])
+    if groups is not None:
+        bounds = torch.searchsorted(groups, torch.tensor(offsets, device=groups.device)).tolist()
+        groups = [groups[bounds[i] : bounds[i + 1]] - offsets[i] for i in range(len(plans))]
+    else:
+        groups = [None] * len(plans)
+    return {
+        edge_type: _finish_gsmp(plan, count, group, normalize, 1.0)
+        for (edge_type, _), plan, count, group in zip(relations, plans, counts, groups)
+    }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "FGAMLP" / "data"))
+
+import compact_graph  # noqa: E402
+from compact_graph import CompactGraph  # noqa: E402
+from hop_writer import iter_propagated_hops  # noqa: E402
+from temporal_weights import temporal_edge_weights  # noqa: E402
+
+
+def assert_equal(actual, expected, name):
+    if not torch.equal(actual, expected):
+        raise AssertionError(f"{name}: actual={actual.tolist()} expected={expected.tolist()}")
+
+
+def random_graph(num_nodes=400, num_edges=6000, seed=0):
+    gen = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=gen)
+    weight = torch.rand(num_edges, generator=gen)
+    return edge_index, weight
+
+
+def reference_gcn_norm(edge_index, weight, num_nodes):
+    dense = torch.sparse_coo_tensor(edge_index, weight, (num_nodes, num_nodes)).coalesce().to_dense()
+    dense.fill_diagonal_(1.0)
+    deg_inv_sqrt = dense.sum(dim=1).pow(-0.5)
+    return deg_inv_sqrt.view(-1, 1) * dense * deg_inv_sqrt.view(1, -1)
+
+
+def test_temporal_weights_match_int64_path():
+    edge_index, _ = random_graph()
+    node_time = torch.randint(2000, 2012, (400,), generator=torch.Generator().manual_seed(1))
+    node_time[:9] = -1
+    graph = CompactGraph(edge_index, 400)
+    assert graph.edge_index.dtype == torch.int32 and graph.nbytes() * 2 == edge_index.numel() * 8
+    for scheme in ("gsmp", "smp"):
+        for normalize in ("raw", "mean_one", "row"):
+            expected = temporal_edge_weights(edge_index, node_time, scheme=scheme, normalize=normalize)
+            graph.temporal_weights(node_time, scheme=scheme, normalize=normalize)
+            assert_equal(graph.weight(), expected, f"{scheme}/{normalize}")
+
+
+def test_torch_csr_sums_duplicates():
+    edge_index, weight = random_graph()
+    reference = torch.sparse_coo_tensor(edge_index.flip(0), weight, (400, 400)).coalesce().to_dense()
+    x = torch.randn(400, 8, generator=torch.Generator().manual_seed(2))
+    csr = CompactGraph(edge_index, 400, edge_weight=weight).to_torch_csr()
+    assert csr.col_indices().dtype == torch.int32
+    assert torch.allclose(csr.to_dense(), reference)
+    assert torch.allclose(torch.sparse.mm(csr, x), reference @ x, atol=1e-5)
+
+
+def test_gcn_norm_row_blocks_match_dense():
+    edge_index, weight = random_graph()
+    expected = reference_gcn_norm(edge_index, weight, 400).numpy()
+    graph = CompactGraph(edge_index, 400, edge_weight=weight)
+    whole = graph.gcn_norm_csr()
+    blocked = graph.gcn_norm_csr(chunk_edges=97)
+    assert whole.indices.dtype == np.int32 and whole.indptr.dtype == np.int64
+    assert np.allclose(whole.toarray(), expected, atol=1e-6)
+    for name in ("indptr", "indices", "data"):
+        assert np.array_equal(getattr(blocked, name), getattr(whole, name)), name
+
+    x = np.random.default_rng(3).standard_normal((400, 4)).astype(np.float32)
+    rows = np.arange(0, 400, 7)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        hops = dict(iter_propagated_hops(blocked, x, 2, rows, str(Path(tmpdir) / "hops"), block_rows=64))
+    assert np.allclose(hops[2], (expected @ (expected @ x))[rows], atol=1e-4)
+
+
+def test_index_dtype_crossover():
+    edge_index, weight = random_graph(num_nodes=60, num_edges=400)
+    saved = compact_graph.INT32_LIMIT
+    compact_graph.INT32_LIMIT = 100
+    try:
+        graph = CompactGraph(edge_index, 60, edge_weight=weight)
+        adj = graph.csr()
+        assert graph.edge_index.dtype == torch.int32
+        # More entries than the limit: the CSR keeps int32 column ids, torch needs int64 for both.
+        assert adj.nnz > 100 and adj.indices.dtype == np.int32 and adj.indptr.dtype == np.int64
+        csr = graph.to_torch_csr()
+        assert csr.crow_indices().dtype == torch.int64 and csr.col_indices().dtype == torch.int64
+        reference = torch.sparse_coo_tensor(edge_index.flip(0), weight, (60, 60)).coalesce().to_dense()
+        assert torch.allclose(csr.to_dense(), reference)
+
+        small = CompactGraph(edge_index[:, :50], 60).to_torch_csr()
+        assert small.crow_indices().dtype == torch.int32 and small.col_indices().dtype == torch.int32
+
+        wide = CompactGraph(edge_index, 150, edge_weight=weight)
+        assert wide.edge_index.dtype == torch.int64 and wide.csr().indices.dtype == np.int64
+        assert torch.equal(wide.to_torch_csr().to_dense()[:60, :60], reference)
+    finally:
+        compact_graph.INT32_LIMIT = saved
+
+
+def test_save_load_narrow_weights():
+    edge_index, weight = random_graph()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in ("float16", "bfloat16"):
+            stored = CompactGraph(edge_index, 400, edge_weight=weight, weight_dtype=name)
+            stored.save(Path(tmpdir) / name)
+            loaded = CompactGraph.load(Path(tmpdir) / name)
+            assert_equal(loaded.edge_index, stored.edge_index, f"{name} edge_index")
+            assert_equal(loaded.edge_weight, stored.edge_weight, f"{name} edge_weight")
+            assert torch.allclose(loaded.weight(), weight, rtol=1e-2)
+
+
+if __name__ == "__main__":
+    test_temporal_weights_match_int64_path()
+    test_torch_csr_sums_duplicates()
+    test_gcn_norm_row_blocks_match_dense()
+    test_index_dtype_crossover()
+    test_save_load_narrow_weights()
+    print("compact graph tests passed")
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import hop_cache  # noqa: E402
+from hop_cache import HopFeatureCache, fingerprint  # noqa: E402
+
+
+def test_fingerprint_covers_every_chunk():
+    saved = hop_cache.HASH_CHUNK_BYTES
+    hop_cache.HASH_CHUNK_BYTES = 64
+    try:
+        base = np.arange(10000, dtype=np.int64)
+        keys = {fingerprint(base)}
+        for pos in (0, 1, 4321, 9999):
+            changed = base.copy()
+            changed[pos] += 1
+            keys.add(fingerprint(changed))
+        assert len(keys) == 5
+        assert fingerprint(base) == fingerprint(base.copy())
+    finally:
+        hop_cache.HASH_CHUNK_BYTES = saved
+
+
+def test_fingerprint_independent_of_chunk_size():
+    base = np.random.default_rng(0).integers(0, 1 << 40, 5000)
+    reference = fingerprint(base)
+    saved = hop_cache.HASH_CHUNK_BYTES
+    hop_cache.HASH_CHUNK_BYTES = 96
+    try:
+        assert fingerprint(base) == reference
+    finally:
+        hop_cache.HASH_CHUNK_BYTES = saved
+
+
+def test_key_hashes_each_array_once():
+    calls = []
+    saved = hop_cache._array_bytes
+
+    def counting(value):
+        calls.append(value.shape)
+        return saved(value)
+
+    graph = (np.arange(100), np.arange(100)[::-1].copy())
+    features = np.ones((10, 4), dtype=np.float32)
+    hop_cache._array_bytes = counting
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            cache = HopFeatureCache(tmpdir)
+            key = cache.key(graph=graph, edge_weight=None, norm="sym", features=features)
+            assert len(calls) == 3
+            assert (Path(tmpdir) / key / "meta.json").exists()
+            assert cache.key(graph=graph, edge_weight=None, norm="sym", features=features) == key
+            changed = features.copy()
+            changed[3, 2] = 2
+            assert cache.key(graph=graph, edge_weight=None, norm="sym", features=changed) != key
+    finally:
+        hop_cache._array_bytes = saved
+
+
+if __name__ == "__main__":
+    test_fingerprint_covers_every_chunk()
+    test_fingerprint_independent_of_chunk_size()
+    test_key_hashes_each_array_once()
+    print("Hop cache tests passed")
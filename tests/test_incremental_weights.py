@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import incremental_weights  # noqa: E402
+from gsmp import compute_gsmp_edge_weights  # noqa: E402
+from incremental_weights import IncrementalTemporalWeights  # noqa: E402
+
+
+def assert_equal(actual, expected, name):
+    if not torch.equal(actual, expected):
+        raise AssertionError(f"{name}: actual={actual.tolist()} expected={expected.tolist()}")
+
+
+def grow(scheme, check, per_year=40, **kwargs):
+    """Add a year of nodes and two batches of edges at a time, calling ``check`` after each batch."""
+    gen = torch.Generator().manual_seed(0)
+    years = torch.arange(2000, 2010)
+    node_time = years.repeat_interleave(per_year)
+    node_time[per_year + 3] = -1
+    tracker = IncrementalTemporalWeights(node_time[:per_year], scheme=scheme, **kwargs)
+    for step in range(1, years.numel()):
+        tracker.add_nodes(node_time[step * per_year : (step + 1) * per_year])
+        new_nodes = torch.arange(step * per_year, (step + 1) * per_year)
+        src = new_nodes[torch.randint(0, per_year, (200,), generator=gen)]
+        dst = torch.randint(0, (step + 1) * per_year, (200,), generator=gen)
+        for edges in (torch.stack([src, dst]), torch.stack([dst, src])):
+            ids = tracker.add_edges(edges)
+            assert_equal(tracker.edge_index[:, ids], edges, f"{scheme} appended edges")
+            check(tracker, step)
+    return tracker
+
+
+def test_gsmp_src_mean_one_matches_gsmp_bit_exact():
+    def check(tracker, step):
+        expected = compute_gsmp_edge_weights(tracker.edge_index, tracker.node_time, num_nodes=tracker.num_nodes)
+        assert_equal(tracker.edge_weight, expected, f"gsmp src/mean_one year {step}")
+
+    grow("gsmp", check)
+
+
+def test_gsmp_dst_raw_matches_full_recompute():
+    def check(tracker, step):
+        assert_equal(tracker.edge_weight, tracker.recompute(), f"gsmp dst/none year {step}")
+
+    grow("gsmp", check, group_by="dst", normalize="none")
+
+
+def test_gsmp_reads_recompute_touched_anchors_only():
+    node_time = torch.arange(2000, 2010).repeat_interleave(10)
+    tracker = IncrementalTemporalWeights(node_time, scheme="gsmp")
+    gen = torch.Generator().manual_seed(1)
+    tracker.add_edges(torch.randint(0, 100, (2, 500), generator=gen))
+    before = tracker.edge_weight.clone()
+
+    sizes = []
+    original = incremental_weights.normalize_edge_weights
+
+    def counting(anchor, raw, num_anchors, normalize):
+        sizes.append((raw.numel(), num_anchors))
+        return original(anchor, raw, num_anchors, normalize)
+
+    incremental_weights.normalize_edge_weights = counting
+    try:
+        new_edges = torch.tensor([[3, 3, 7], [50, 61, 99]])
+        tracker.add_edges(new_edges)
+        weight = tracker.edge_weight
+        tracker.edge_weight  # a second read has nothing left to recompute
+        assert len(sizes) == 1, sizes
+    finally:
+        incremental_weights.normalize_edge_weights = original
+    touched = torch.isin(tracker.edge_index[0], new_edges[0])
+    assert sizes[0] == (int(touched.sum()), 2), sizes
+    assert_equal(weight[:500][~touched[:500]], before[~touched[:500]], "untouched anchors")
+    expected = compute_gsmp_edge_weights(tracker.edge_index, tracker.node_time, num_nodes=tracker.num_nodes)
+    assert_equal(weight, expected, "after touched-anchor update")
+
+
+def test_smp_matches_full_recompute():
+    for single_on_equal in (False, True):
+        def check(tracker, step):
+            assert_equal(tracker.edge_weight, tracker.recompute(), f"smp single_on_equal={single_on_equal} year {step}")
+
+        grow("smp", check, single_on_equal=single_on_equal)
+
+
+def test_smp_range_change_reweights_edges():
+    node_time = torch.tensor([2000, 2001, 2005])
+    tracker = IncrementalTemporalWeights(node_time, scheme="smp")
+    tracker.add_edges(torch.tensor([[1, 2], [0, 0]]))
+    assert_equal(tracker.edge_weight, torch.tensor([2.0, 2.0]), "before range change")
+    changed = tracker.add_nodes(torch.tensor([1990]))
+    assert_equal(changed, torch.tensor([0, 1]), "changed edges")
+    assert_equal(tracker.edge_weight, torch.tensor([1.0, 1.0]), "after range change")
+
+
+if __name__ == "__main__":
+    test_gsmp_src_mean_one_matches_gsmp_bit_exact()
+    test_gsmp_dst_raw_matches_full_recompute()
+    test_gsmp_reads_recompute_touched_anchors_only()
+    test_smp_matches_full_recompute()
+    test_smp_range_change_reweights_edges()
+    print("Incremental weight tests passed")
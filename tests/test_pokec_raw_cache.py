@@ -0,0 +1,42 @@
+#!/usr/bin/env python
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from pokec_raw_cache import read_profile_columns  # noqa: E402
+
+
+def profile_row(user_id, public, completion, gender, registered, age):
+    fields = [user_id, public, completion, gender, "region", "2012-05-25 11:20:00.0", registered, age, "180 cm", "null"]
+    return "\t".join(str(field) for field in fields)
+
+
+def test_short_profile_rows_are_dropped():
+    lines = [
+        profile_row(1, 1, 14, 1, "2005-04-03 00:00:00.0", 26),
+        profile_row(7, 0, 62, 0, "2008-01-15 00:00:00.0", 31),
+        "7\t1\t50",
+        "9\t1\t20\t1\tregion\t2012-05-25 11:20:00.0\t2010-02-01 00:00:00.0",
+        profile_row(8, 1, 38, "", "", 0),
+    ]
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "soc-pokec-profiles.txt"
+        path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+        columns = read_profile_columns(str(path), chunksize=3)
+    assert columns["user_id"].tolist() == [1, 7, 8]
+    assert columns["public"].tolist() == [1.0, 0.0, 1.0]
+    assert columns["completion"].tolist() == [14.0, 62.0, 38.0]
+    assert columns["gender"].tolist() == [1, 0, -1]
+    assert columns["age"].tolist() == [26.0, 31.0, 0.0]
+    assert columns["registered_ns"][2] == np.iinfo(np.int64).min
+
+
+if __name__ == "__main__":
+    test_short_profile_rows_are_dropped()
+    print("Pokec raw cache tests passed")
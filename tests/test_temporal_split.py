@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from temporal_split import SPLIT_NAMES, QuantileSplit, RangeSplit, temporal_split, temporal_splits, year_split  # noqa: E402
+
+
+def assert_equal(actual, expected, name):
+    if not torch.equal(actual, expected):
+        raise AssertionError(f"{name}: actual={actual.tolist()} expected={expected.tolist()}")
+
+
+def old_pokec_year_split(y, node_year, train_until, val_year, test_from):
+    """pokec_raw_linkx_smp.build_temporal_split before it used temporal_split."""
+    split = {"train": [], "valid": [], "test": []}
+    for idx in torch.where((y >= 0) & (node_year >= 0))[0].tolist():
+        year = int(node_year[idx].item())
+        if year <= train_until:
+            split["train"].append(idx)
+        elif year == val_year:
+            split["valid"].append(idx)
+        elif year >= test_from:
+            split["test"].append(idx)
+    return {name: torch.tensor(value, dtype=torch.long) for name, value in split.items()}
+
+
+def old_elliptic_masks(node_time, train_until, val_until):
+    """elliptic_bitcoin_smp.make_masks_from_time before it used temporal_split."""
+    node_time = node_time.view(-1)
+    train_mask = node_time <= train_until
+    if val_until is None or val_until <= train_until:
+        val_mask = torch.zeros_like(train_mask, dtype=torch.bool)
+        test_mask = node_time > train_until
+    else:
+        val_mask = (node_time > train_until) & (node_time <= val_until)
+        test_mask = node_time > val_until
+    return {"train": train_mask, "valid": val_mask, "test": test_mask}
+
+
+def test_year_splits_match_pokec_loop():
+    gen = torch.Generator().manual_seed(0)
+    node_year = torch.randint(2000, 2014, (5000,), generator=gen)
+    node_year[:50] = -1
+    y = torch.randint(-1, 2, (5000,), generator=gen)
+    configs = [(2009, 2010, 2011), (2010, 2011, 2012), (2008, 2010, 2012)]
+    got = temporal_splits(node_year, [year_split(*c) for c in configs], eligible=(y >= 0) & (node_year >= 0))
+    for config, split in zip(configs, got):
+        expected = old_pokec_year_split(y, node_year, *config)
+        for name in SPLIT_NAMES:
+            assert_equal(split[name], expected[name], f"{config} {name}")
+
+
+def test_range_masks_match_elliptic():
+    node_time = torch.randint(1, 50, (2000,), generator=torch.Generator().manual_seed(1))
+    for train_until, val_until in ((34, 41), (34, None), (34, 30)):
+        if val_until is None or val_until <= train_until:
+            spec = RangeSplit(train=(None, train_until), test=(train_until, None))
+        else:
+            spec = RangeSplit(train=(None, train_until), valid=(train_until, val_until), test=(val_until, None))
+        masks = temporal_split(node_time, spec, output="mask")
+        expected = old_elliptic_masks(node_time, train_until, val_until)
+        for name in SPLIT_NAMES:
+            assert_equal(masks[name], expected[name], f"({train_until}, {val_until}) {name}")
+
+
+def test_quantile_split_orders_by_time_then_id():
+    gen = torch.Generator().manual_seed(2)
+    node_time = torch.rand(5000, generator=gen).mul(10).round()
+    node_time[:10] = float("nan")
+    quantile = temporal_split(node_time, QuantileSplit(0.5, 0.25))
+    finite = torch.where(torch.isfinite(node_time))[0]
+    order = sorted(finite.tolist(), key=lambda idx: (node_time[idx].item(), idx))
+    n_train, n_valid = int(len(order) * 0.5), int(len(order) * 0.25)
+    assert_equal(quantile["train"], torch.tensor(sorted(order[:n_train])), "quantile train")
+    assert_equal(quantile["valid"], torch.tensor(sorted(order[n_train:n_train + n_valid])), "quantile valid")
+
+
+if __name__ == "__main__":
+    test_year_splits_match_pokec_loop()
+    test_range_masks_match_elliptic()
+    test_quantile_split_orders_by_time_then_id()
+    print("temporal split tests passed")
@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+import sys
+from pathlib import Path
+
+import torch
+
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from gsmp import compute_gsmp_edge_weights  # noqa: E402
+from temporal_weights import (  # noqa: E402
+    NORMALIZATIONS,
+    hetero_temporal_edge_weights,
+    normalize_edge_weights,
+    smp_single_mask,
+    temporal_edge_weights,
+)
+
+
+def assert_equal(actual, expected, name):
+    if not torch.equal(actual, expected):
+        raise AssertionError(f"{name}: actual={actual.tolist()} expected={expected.tolist()}")
+
+
+def random_graph(num_nodes=300, num_edges=4000, seed=0):
+    gen = torch.Generator().manual_seed(seed)
+    edge_index = torch.randint(0, num_nodes, (2, num_edges), generator=gen)
+    node_time = torch.randint(2000, 2012, (num_nodes,), generator=gen)
+    node_time[:7] = -1
+    return edge_index, node_time
+
+
+# Implementations as they were before the callers delegated to temporal_weights.
+
+
+def old_gsmp_edge_weights(edge_index, node_time, num_nodes, max_bincount_size=50_000_000):
+    """gsmp.compute_gsmp_edge_weights."""
+    edge_index = edge_index.long()
+    src, dst = edge_index
+    num_edges = edge_index.size(1)
+    edge_b = torch.ones(num_edges, dtype=torch.float32)
+    target_time = node_time[dst]
+    valid = target_time >= 0
+    if valid.any():
+        valid_pos = torch.where(valid)[0]
+        src_valid = src[valid_pos]
+        _, time_group = torch.unique(target_time[valid_pos], sorted=True, return_inverse=True)
+        num_time_groups = int(time_group.max().item()) + 1
+        pair_key = src_valid * num_time_groups + time_group
+        key_space = int(num_nodes) * num_time_groups
+        if key_space <= max_bincount_size:
+            count_per_edge = torch.bincount(pair_key, minlength=key_space)[pair_key]
+        else:
+            _, inverse, counts = torch.unique(pair_key, sorted=False, return_inverse=True, return_counts=True)
+            count_per_edge = counts[inverse]
+        edge_b[valid_pos] = 1.0 / count_per_edge.to(torch.float32).clamp(min=1)
+    outgoing_count = torch.bincount(src, minlength=num_nodes).to(torch.float32)
+    b_sum = torch.zeros(num_nodes, dtype=torch.float32)
+    b_sum.scatter_add_(0, src, edge_b)
+    mu = torch.zeros_like(b_sum)
+    has_outgoing = outgoing_count > 0
+    mu[has_outgoing] = b_sum[has_outgoing] / outgoing_count[has_outgoing]
+    return edge_b / mu[src].clamp(min=1e-12)
+
+
+def old_arxiv_gsmp_weights(edge_index, node_year, num_nodes):
+    """ogbn_arxiv_temporal.edge_preprocessing.compute_gsmp_weights."""
+    src, dst = edge_index
+    unique_years, year_inverse = torch.unique(node_year, sorted=True, return_inverse=True)
+    num_years = int(unique_years.numel())
+    key = dst * num_years + year_inverse[src]
+    group_counts = torch.bincount(key, minlength=num_nodes * num_years).float()
+    base_weight = 1.0 / group_counts[key].clamp_min(1.0)
+    degree = torch.bincount(dst, minlength=num_nodes).float()
+    sum_base = torch.zeros(num_nodes, dtype=torch.float32)
+    sum_base.index_add_(0, dst, base_weight)
+    mean_base = sum_base[dst] / degree[dst].clamp_min(1.0)
+    return base_weight, base_weight / mean_base.clamp_min(torch.finfo(torch.float32).eps)
+
+
+def old_arxiv_smp_raw_weights(edge_index, node_year):
+    """Raw weights of ogbn_arxiv_temporal.edge_preprocessing.compute_smp_weights."""
+    src, dst = edge_index
+    src_time = node_year[src].float()
+    dst_time = node_year[dst].float()
+    t_min = float(node_year.min().item())
+    t_max = float(node_year.max().item())
+    boundary = torch.minimum(
+        torch.full_like(dst_time, t_max) - dst_time,
+        dst_time - torch.full_like(dst_time, t_min),
+    )
+    single_mask = (src_time == dst_time) | ((src_time - dst_time).abs() > boundary)
+    return torch.where(single_mask, torch.full_like(src_time, 2.0), torch.ones_like(src_time))
+
+
+def old_smp_edge_mask(edge_index, time, t_min, t_max):
+    """elliptic_bitcoin_smp / pokec_linkx_smp single-edge mask."""
+    src, dst = edge_index
+    delta = (time[src] - time[dst]).abs()
+    radius = torch.minimum(time[dst] - t_min, t_max - time[dst])
+    return delta > radius
+
+
+def loop_reference_weights(edge_index, node_time, group_by, normalize):
+    """Per-edge Python loop for GSMP with ``missing="unit"``."""
+    src, dst = edge_index.tolist()
+    time = node_time.tolist()
+    anchors, others = (dst, src) if group_by == "dst" else (src, dst)
+    counts = {}
+    for a, o in zip(anchors, others):
+        if time[o] >= 0:
+            counts[(a, time[o])] = counts.get((a, time[o]), 0) + 1
+    raw = [1.0 / counts[(a, time[o])] if time[o] >= 0 else 1.0 for a, o in zip(anchors, others)]
+    totals, degree = {}, {}
+    for a, w in zip(anchors, raw):
+        totals[a] = totals.get(a, 0.0) + w
+        degree[a] = degree.get(a, 0) + 1
+    if normalize == "raw":
+        return torch.tensor(raw)
+    if normalize == "row":
+        return torch.tensor([w / totals[a] for a, w in zip(anchors, raw)])
+    return torch.tensor([w * degree[a] / totals[a] for a, w in zip(anchors, raw)])
+
+
+def test_gsmp_matches_pre_migration_bit_exact():
+    edge_index, node_time = random_graph()
+    for max_bincount_size in (50_000_000, 0):
+        expected = old_gsmp_edge_weights(edge_index, node_time, 300, max_bincount_size)
+        got = compute_gsmp_edge_weights(edge_index, node_time, num_nodes=300, max_bincount_size=max_bincount_size)
+        assert_equal(got, expected, f"gsmp max_bincount_size={max_bincount_size}")
+
+
+def test_arxiv_gsmp_matches_pre_migration_bit_exact():
+    edge_index, node_time = random_graph(seed=1)
+    node_year = node_time.clamp_min(2000)
+    expected_base, expected = old_arxiv_gsmp_weights(edge_index, node_year, 300)
+    base = temporal_edge_weights(
+        edge_index, node_year, scheme="gsmp", group_by="dst", normalize="raw", num_nodes=300, missing="group",
+    )
+    assert_equal(base, expected_base, "arxiv gsmp base weights")
+    assert_equal(normalize_edge_weights(edge_index[1], base, 300, "mean_one"), expected, "arxiv gsmp weights")
+
+
+def test_smp_matches_pre_migration_bit_exact():
+    edge_index, node_time = random_graph(seed=2)
+    node_year = node_time.clamp_min(2000)
+    raw = temporal_edge_weights(
+        edge_index, node_year, scheme="smp", group_by="dst", normalize="raw", num_nodes=300, missing="group",
+        single_on_equal=True, t_min=float(node_year.min()), t_max=float(node_year.max()),
+    )
+    assert_equal(raw, old_arxiv_smp_raw_weights(edge_index, node_year), "arxiv smp raw weights")
+
+    time = node_year.float() + torch.rand(300, generator=torch.Generator().manual_seed(3))
+    t_min, t_max = float(time.min()), float(time.max())
+    src, dst = edge_index
+    mask = smp_single_mask(time[src], time[dst], t_min, t_max, single_on_equal=False)
+    assert_equal(mask, old_smp_edge_mask(edge_index, time, t_min, t_max), "smp single mask")
+
+
+def test_kernels_match_loop_reference():
+    edge_index, node_time = random_graph()
+    for group_by in ("src", "dst"):
+        for normalize in NORMALIZATIONS:
+            expected = loop_reference_weights(edge_index, node_time, group_by, normalize)
+            reference = None
+            for kernel in ("bincount", "unique", "sort"):
+                got = temporal_edge_weights(edge_index, node_time, group_by=group_by, normalize=normalize, kernel=kernel)
+                assert torch.allclose(got, expected, rtol=1e-5, atol=1e-6), (group_by, normalize, kernel)
+                if reference is not None:
+                    assert_equal(got, reference, f"{group_by}/{normalize}/{kernel}")
+                reference = got
+
+
+def test_hetero_fused_matches_threaded():
+    edge_index, node_time = random_graph()
+    gen = torch.Generator().manual_seed(4)
+    time_dict = {"paper": node_time, "author": torch.randint(2000, 2012, (120,), generator=gen)}
+    edges = {
+        ("author", "writes", "paper"): torch.stack([torch.randint(0, 120, (900,), generator=gen), torch.randint(0, 300, (900,), generator=gen)]),
+        ("paper", "cites", "paper"): edge_index,
+    }
+    for normalize in NORMALIZATIONS:
+        fused = hetero_temporal_edge_weights(edges, time_dict, normalize=normalize)
+        threaded = hetero_temporal_edge_weights(edges, time_dict, normalize=normalize, num_threads=2)
+        for edge_type in edges:
+            assert_equal(fused[edge_type], threaded[edge_type], f"{edge_type} {normalize}")
+        assert_equal(fused[("paper", "cites", "paper")], temporal_edge_weights(edge_index, node_time, normalize=normalize), f"cites {normalize}")
+
+
+if __name__ == "__main__":
+    test_gsmp_matches_pre_migration_bit_exact()
+    test_arxiv_gsmp_matches_pre_migration_bit_exact()
+    test_smp_matches_pre_migration_bit_exact()
+    test_kernels_match_loop_reference()
+    test_hetero_fused_matches_threaded()
+    print("temporal weight tests passed")